@@ -53,13 +53,48 @@ class Settings(BaseSettings):
     INSTAGRAM_ACCOUNT_ID: Optional[str] = None
     
     # IA Configurations
-    MAX_TOKENS_PER_REQUEST: int = 8000
+    MAX_TOKENS_PER_REQUEST: int = 8000  # Orçamento do prompt editorial (tokens estimados do Gemini)
+    PROMPT_RAG_SNIPPET_TOKENS: int = 60  # Teto de cada trecho relacionado (~200 caracteres)
+    LONG_EMAIL_SUMMARIZATION: bool = True  # Emails que não cabem no orçamento do prompt são resumidos por partes
+    LONG_EMAIL_CHUNK_TOKENS: int = 1500  # Tamanho de cada parte resumida
+    LONG_EMAIL_MAX_CHUNKS: int = 12  # Acima disso as partes crescem (o texto nunca é descartado)
+    LONG_EMAIL_MAP_CONCURRENCY: int = 4  # Partes resumidas ao mesmo tempo
+    LONG_EMAIL_SUMMARY_TOKENS: int = 1200  # Teto do resumo no prompt editorial
     EMBEDDING_MODEL: str = "text-embedding-004"
+    EMBEDDING_DIMENSIONS: int = 768  # Deve bater com knowledge_base.embedding (vector_search.sql)
+    VECTOR_SEARCH_EF_SEARCH: int = 40  # Candidatos do HNSW por busca (recall x latência)
+    HYBRID_SEARCH_ENABLED: bool = True  # Busca textual (tsvector) + vetorial com RRF
+    HYBRID_SEARCH_CANDIDATES: int = 10  # Resultados de cada etapa antes da fusão
+    RELEVANCE_FILTER_ENABLED: bool = False  # Pré-filtro local antes do Gemini (treinar com scripts/train_relevance_filter.py)
+    RELEVANCE_MODEL_PATH: str = "data/relevance_model.npz"
+    RELEVANCE_FILTER_SKIP_BELOW: float = 0.1  # Abaixo disso o email não vai para a IA
+    RELEVANCE_FILTER_DEPRIORITIZE_BELOW: float = 0.3  # Abaixo disso vai para a IA com prioridade baixa
+    EMBEDDING_CACHE_MAX_BYTES: int = 32 * 1024 * 1024  # ~10 mil vetores de 768 dimensões
+    EMBEDDING_STORE_PATH: Optional[str] = "data/embeddings.sqlite3"  # Vazio desativa o cache em disco
+    LOCAL_VECTOR_INDEX_ENABLED: bool = False  # Busca RAG em memória em vez da RPC match_documents
+    LOCAL_VECTOR_INDEX_REFRESH_SECONDS: int = 300
     GEMINI_MODEL: str = "gemini-2.0-flash-exp"
+    AI_MAX_CONCURRENCY: int = 4  # Emails processados com IA ao mesmo tempo
+    AI_REQUEST_TIMEOUT: int = 60  # Segundos por chamada ao Gemini
+    AI_JOB_TIMEOUT: int = 180  # Segundos por email (contexto + geração + WordPress)
+    GENERATION_CACHE_ENABLED: bool = True  # Cache de respostas do Gemini por prompt
+    GENERATION_CACHE_MAX_ENTRIES: int = 500
+    GENERATION_CACHE_TTL: int = 6 * 3600
+    GENERATION_CACHE_PATH: Optional[str] = "data/generations.sqlite3"  # Vazio mantém o cache só em memória
+    STRUCTURED_OUTPUT_ENABLED: bool = True  # JSON com response_schema (ai_schemas.py) em vez de parse do texto
+    STRUCTURED_OUTPUT_MAX_RETRIES: int = 2  # Novas tentativas, só com os campos inválidos
     
     # Processing
     EMAIL_CHECK_INTERVAL: int = 300
     MAX_EMAILS_PER_BATCH: int = 10
+    GMAIL_INGEST_CONCURRENCY: int = 4
+    NEAR_DUPLICATE_DETECTION: bool = True  # Requer database/schemas/near_duplicates.sql
+    NEAR_DUPLICATE_MIN_SIMILARITY: float = 0.6  # Jaccard estimado; rodapé trocado em release de 300 palavras dá ~0.85
+    NEAR_DUPLICATE_WINDOW_DAYS: int = 14
+    
+    # Gmail push (Pub/Sub) - OPCIONAL
+    GMAIL_PUBSUB_TOPIC: Optional[str] = None  # projects/<projeto>/topics/<tópico>
+    GMAIL_PUSH_TOKEN: Optional[str] = None  # Token exigido na URL do webhook (?token=)
     
     # Cache
     REDIS_URL: str = "redis://localhost:6379"
@@ -71,6 +106,15 @@ class Settings(BaseSettings):
     HTTP_TIMEOUT: int = 30
     CACHE_TTL: int = 3600
     
+    # Quotas das APIs Google (ver modules/rate_limiter.py)
+    GMAIL_QUOTA_UNITS_PER_SECOND: int = 250
+    GEMINI_REQUESTS_PER_MINUTE: int = 60
+    EMBEDDING_REQUESTS_PER_MINUTE: int = 1500
+    GOOGLE_DATA_REQUESTS_PER_MINUTE: int = 600
+    RATE_LIMIT_MAX_RETRIES: int = 5
+    RATE_LIMIT_BASE_BACKOFF: float = 1.0
+    RATE_LIMIT_MAX_BACKOFF: float = 32.0
+    
     # CORS
     CORS_ORIGINS: str = "http://localhost:3000,http://localhost:8001"
     
@@ -2,7 +2,7 @@
 Conexão e utilitários do Supabase
 """
 from supabase import create_client, Client
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import logging
 from datetime import datetime
 
@@ -62,6 +62,34 @@ class SupabaseManager:
             logger.error(f"Erro ao buscar email: {e}")
             return None
     
+    def get_existing_gmail_message_ids(self, message_ids: List[str]) -> set:
+        """Retorna, em uma única consulta, os IDs Gmail que já estão no cache"""
+        if not message_ids:
+            return set()
+        try:
+            result = self.client.table("email_cache")\
+                .select("gmail_message_id")\
+                .in_("gmail_message_id", message_ids)\
+                .execute()
+            return {row["gmail_message_id"] for row in (result.data or [])}
+        except Exception as e:
+            logger.error(f"Erro ao buscar IDs Gmail existentes: {e}")
+            return set()
+    
+    def find_minhash_candidates(self, bands: List[int], since: str, limit: int = 50) -> List[Dict]:
+        """Emails recentes com ao menos uma faixa LSH igual (candidatos a duplicata)"""
+        try:
+            result = self.client.table("email_cache")\
+                .select("id, sender, subject, minhash, duplicate_of")\
+                .ov("minhash_bands", bands)\
+                .gte("received_at", since)\
+                .limit(limit)\
+                .execute()
+            return result.data or []
+        except Exception as e:
+            logger.error(f"Erro ao buscar candidatos a duplicata: {e}")
+            return []
+    
     def update_email_cache(self, email_id: str, update_data: Dict[str, Any]) -> bool:
         """Atualiza dados do email cache"""
         try:
@@ -104,6 +132,26 @@ class SupabaseManager:
             logger.error(f"Erro ao buscar emails: {e}")
             return []
     
+    def get_labeled_emails(self, limit: int = 20000, page_size: int = 1000) -> List[Dict]:
+        """Emails com resultado de IA ou decisão editorial (treino do pré-filtro)"""
+        rows: List[Dict] = []
+        try:
+            while len(rows) < limit:
+                start = len(rows)
+                end = min(start + page_size, limit) - 1
+                result = self.client.table("email_cache")\
+                    .select("sender, subject, content_text, gemini_response, workflow_stage, wordpress_post_id")\
+                    .order("received_at", desc=True)\
+                    .range(start, end)\
+                    .execute()
+                rows.extend(result.data or [])
+                if len(result.data or []) < end - start + 1:
+                    break
+            return rows
+        except Exception as e:
+            logger.error(f"Erro ao buscar emails rotulados: {e}")
+            return rows
+
     def get_system_config(self, key: str) -> Optional[Any]:
         """Busca configuração do sistema"""
         try:
@@ -123,35 +171,78 @@ class SupabaseManager:
             logger.error(f"Erro ao definir configuração: {e}")
             return False
 
-    def search_similar_content(self, embedding: List[float], limit: int = 5) -> List[Dict]:
+    def search_similar_content(self, embedding: List[float], limit: int = 5,
+                               threshold: float = 0.7, ef_search: Optional[int] = None) -> List[Dict]:
         """Busca conteúdo similar usando embeddings (RAG)"""
         try:
+            if len(embedding) != settings.EMBEDDING_DIMENSIONS:
+                logger.error(
+                    f"Embedding com {len(embedding)} dimensões; match_documents espera {settings.EMBEDDING_DIMENSIONS}"
+                )
+                return []
+            
             # Converter embedding para formato compatível com pgvector
             embedding_str = f"[{','.join(map(str, embedding))}]"
             
             # CORREÇÃO: Chamar RPC diretamente no client, não na table
             result = self.client.rpc("match_documents", {
                 "query_embedding": embedding_str,
-                "match_threshold": 0.7,
-                "match_count": limit
+                "match_threshold": threshold,
+                "match_count": limit,
+                "ef_search": ef_search or settings.VECTOR_SEARCH_EF_SEARCH
             }).execute()
             
-            if result.data:
-                return result.data
-            
-            # Fallback: busca simples por tópico se não tiver função RPC ou dados
-            logger.warning("Função match_documents retornou vazio, usando busca simples")
-            result = self.client.table("knowledge_base")\
-                .select("content_text, source_url, topic, category_recifemais, metadata")\
-                .limit(limit)\
-                .execute()
-            
-            return result.data if result.data else []
+            # Sem resultados acima do limiar: melhor nenhum contexto do que linhas sem ranking
+            return result.data or []
             
         except Exception as e:
             logger.error(f"Erro na busca de conteúdo similar: {e}")
             return []
 
+    def search_text_content(self, query_text: str, limit: int = 10) -> List[Dict]:
+        """Busca textual em português na knowledge_base (sintaxe websearch_to_tsquery)"""
+        try:
+            result = self.client.rpc("search_documents_text", {
+                "query_text": query_text,
+                "match_count": limit
+            }).execute()
+            return result.data or []
+        except Exception as e:
+            logger.error(f"Erro na busca textual: {e}")
+            return []
+
+    def get_embedding_dimensions(self) -> Optional[int]:
+        """Dimensão declarada de knowledge_base.embedding (None se indisponível)"""
+        try:
+            result = self.client.rpc("knowledge_base_embedding_dimensions", {}).execute()
+            return int(result.data) if result.data else None
+        except Exception as e:
+            logger.error(f"Erro ao consultar dimensão dos embeddings: {e}")
+            return None
+
+    def get_knowledge_base_changes(self, after: Optional[Tuple[str, str]] = None, limit: int = 500) -> List[Dict]:
+        """Linhas da knowledge_base cujo embedding mudou depois de after
+        
+        after é o (embedding_updated_at, id) da última linha lida. Paginação
+        por chave em ordem (embedding_updated_at, id) com comparação estrita
+        da tupla: linhas com o mesmo timestamp (INSERT em massa) não repetem
+        nem se perdem entre páginas.
+        """
+        try:
+            query = self.client.table("knowledge_base")\
+                .select("id, content_text, source_url, topic, category_recifemais, metadata, embedding, embedding_updated_at")
+            if after:
+                updated_at, row_id = after
+                query = query.or_(
+                    f'embedding_updated_at.gt."{updated_at}",'
+                    f'and(embedding_updated_at.eq."{updated_at}",id.gt.{row_id})'
+                )
+            result = query.order("embedding_updated_at").order("id").limit(limit).execute()
+            return result.data or []
+        except Exception as e:
+            logger.error(f"Erro ao buscar knowledge base: {e}")
+            return []
+
     def get_secure_config(self, key: str) -> Optional[str]:
         """Obter configuração segura do banco de dados"""
         try:
@@ -4,11 +4,15 @@ Aplicação FastAPI principal - RecifeMais Conteúdo
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Form
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, Response
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Dict, Any, List, Optional
 import logging
 import hashlib
+import hmac
+import base64
+import asyncio
+import json
 from datetime import datetime, timedelta
 import httpx
 import os
@@ -25,6 +29,14 @@ try:
     from .modules.google_data_connector import google_connector
     from .modules.auth_manager import auth_manager
     from .modules.email_workflow import email_workflow
+    from .modules.email_ingestion import ingestion_worker, store_gmail_email, STORE_FAILED, STORE_INSERTED
+    from .modules.rate_limiter import rate_limiter
+    from .modules.vector_index import vector_index
+    from .modules.relevance_filter import relevance_filter
+    from .modules.single_flight import single_flight
+    from .modules.ai_pool import ai_pool
+    from .modules.near_duplicates import signature_fields, find_near_duplicate, duplicate_fields
+    from .modules.minhash import minhash
 except ImportError:
     # Fallback para imports absolutos (desenvolvimento)
     import sys
@@ -40,6 +52,14 @@ except ImportError:
     from modules.google_data_connector import google_connector
     from modules.auth_manager import auth_manager
     from modules.email_workflow import email_workflow
+    from modules.email_ingestion import ingestion_worker, store_gmail_email, STORE_FAILED, STORE_INSERTED
+    from modules.rate_limiter import rate_limiter
+    from modules.vector_index import vector_index
+    from modules.relevance_filter import relevance_filter
+    from modules.single_flight import single_flight
+    from modules.ai_pool import ai_pool
+    from modules.near_duplicates import signature_fields, find_near_duplicate, duplicate_fields
+    from modules.minhash import minhash
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -1205,57 +1225,152 @@ async def gmail_status():
         return {"authenticated": False, "message": f"Erro: {str(e)}"}
 
 @app.post("/gmail/fetch-emails")
-async def fetch_emails_from_gmail():
+async def fetch_emails_from_gmail(incremental: bool = True):
     """Busca emails de assessorias do Gmail"""
     try:
         if not gmail_client.authenticate():
             raise HTTPException(status_code=401, detail="Gmail não autenticado")
         
-        emails = gmail_client.get_emails_from_assessorias(days_back=7)
+        sync_state = {}
+        if incremental:
+            emails = gmail_client.sync_emails_from_assessorias(days_back=7, sync_state=sync_state)
+        else:
+            # Streaming: cada página é inserida antes da próxima ser baixada
+            emails = gmail_client.iter_emails_from_assessorias(days_back=7, skip_known=True)
         
-        processed_count = 0
+        total_found = 0
+        processed_ids = []
         for email in emails:
-            # Processar cada email automaticamente
-            email_data = EmailInput(
-                sender=email['sender'],
-                subject=email['subject'],
-                content=email['body'],
-                received_at=email['received_at']
-            )
-            
+            total_found += 1
             # Usar a mesma lógica do process_email
-            email_content = f"{email_data.sender}{email_data.subject}{email_data.content}"
-            email_hash = hashlib.md5(email_content.encode()).hexdigest()
-            
-            # Verificar se já foi processado
-            existing_email = db.get_email_by_hash(email_hash)
-            if not existing_email:
-                # Inserir no cache
-                email_cache_data = {
-                    "email_hash": email_hash,
-                    "sender": email_data.sender,
-                    "subject": email_data.subject,
-                    "content_text": email_data.content,
-                    "received_at": email_data.received_at or datetime.now(),
-                    "status": "pending"
-                }
-                
-                cached_email = db.insert_email_cache(email_cache_data)
-                if cached_email:
-                    processed_count += 1
-                    # Marcar como processado no Gmail
-                    gmail_client.mark_as_processed(email['id'])
+            status, _ = store_gmail_email(email)
+            if status == STORE_INSERTED:
+                processed_ids.append(email['id'])
+            elif status == STORE_FAILED:
+                # Email não gravado: o historyId não pode passar por ele
+                sync_state["errors"] = sync_state.get("errors", 0) + 1
+        
+        # Marcar como processados no Gmail em uma única chamada
+        gmail_client.mark_many_as_processed(processed_ids)
+        processed_count = len(processed_ids)
+        
+        # historyId só avança depois de todos os emails gravados, sem falhas de download nem de gravação
+        if incremental:
+            gmail_client.commit_history_id(sync_state)
         
         return {
-            "total_found": len(emails),
+            "total_found": total_found,
             "new_processed": processed_count,
-            "message": f"Processados {processed_count} novos emails de {len(emails)} encontrados"
+            "message": f"Processados {processed_count} novos emails de {total_found} encontrados"
         }
         
     except Exception as e:
         logger.error(f"Erro ao buscar emails do Gmail: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/gmail/watch")
+async def register_gmail_watch(current_user: Dict = Depends(auth_manager.require_admin())):
+    """Registra (ou renova) as notificações push do Gmail no tópico Pub/Sub"""
+    if not settings.GMAIL_PUBSUB_TOPIC:
+        raise HTTPException(status_code=400, detail="GMAIL_PUBSUB_TOPIC não configurado")
+    
+    if not gmail_client.authenticate():
+        raise HTTPException(status_code=401, detail="Gmail não autenticado")
+    
+    result = gmail_client.watch(settings.GMAIL_PUBSUB_TOPIC)
+    if not result:
+        raise HTTPException(status_code=500, detail="Erro ao registrar push do Gmail")
+    
+    return {"success": True, "history_id": result.get("historyId"), "expiration": result.get("expiration")}
+
+@app.post("/gmail/push", status_code=204)
+async def gmail_push_notification(notification: Dict[str, Any], token: Optional[str] = None):
+    """Webhook de notificações push do Gmail (formato push do Pub/Sub)
+    
+    O corpo é {"message": {"data": base64({"emailAddress", "historyId"}), ...},
+    "subscription": ...}. Dispara uma ingestão incremental e responde logo
+    com 204 para o Pub/Sub não reenviar a mensagem.
+    """
+    if settings.GMAIL_PUSH_TOKEN and not hmac.compare_digest((token or "").encode(), settings.GMAIL_PUSH_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Token de push inválido")
+    
+    try:
+        data = notification.get("message", {}).get("data", "")
+        payload = json.loads(base64.b64decode(data + "=" * (-len(data) % 4)))
+        history_id = payload["historyId"]
+    except (ValueError, KeyError, TypeError) as e:
+        # Mensagem malformada: confirmar mesmo assim para não entrar em loop de reenvio
+        logger.warning(f"Notificação push inválida ignorada: {e}")
+        return Response(status_code=204)
+    
+    logger.info(f"📨 Push Gmail: {payload.get('emailAddress')} historyId={history_id}")
+    
+    # authenticate() pode renovar o token via HTTP: fora do event loop
+    if not gmail_client.service and not await asyncio.to_thread(gmail_client.authenticate):
+        logger.error("Push recebido, mas Gmail não autenticado")
+        return Response(status_code=204)
+    
+    ingestion_worker.start_job(incremental=True, trigger="push", rerun_if_running=True)
+    return Response(status_code=204)
+
+@app.post("/gmail/ingest")
+async def start_gmail_ingestion(days_back: int = 7, incremental: bool = True):
+    """Inicia a ingestão assíncrona de emails e retorna imediatamente"""
+    try:
+        if not await asyncio.to_thread(gmail_client.authenticate):
+            raise HTTPException(status_code=401, detail="Gmail não autenticado")
+        
+        job = ingestion_worker.start_job(days_back=days_back, incremental=incremental)
+        return {"success": True, "job": job}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao iniciar ingestão do Gmail: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/gmail/ingest")
+async def list_gmail_ingestion_jobs():
+    """Lista os jobs de ingestão recentes"""
+    jobs = ingestion_worker.list_jobs()
+    return {"jobs": jobs, "total": len(jobs)}
+
+@app.get("/gmail/ingest/{job_id}")
+async def get_gmail_ingestion_job(job_id: str):
+    """Progresso de um job de ingestão"""
+    job = ingestion_worker.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job de ingestão não encontrado")
+    return job
+
+def _register_email(email_data: EmailInput, email_hash: str) -> Dict[str, Any]:
+    """Verifica duplicatas e insere o email no cache (uma execução por hash)"""
+    # Verificar se já foi processado
+    existing_email = db.get_email_by_hash(email_hash)
+    if existing_email:
+        return {"email": existing_email, "existing": True, "original": None}
+    
+    # Inserir email no cache
+    email_cache_data = {
+        "email_hash": email_hash,
+        "sender": email_data.sender,
+        "subject": email_data.subject,
+        "content_text": email_data.content,
+        "received_at": email_data.received_at or datetime.now(),
+        "status": "processing"
+    }
+    
+    # Quase duplicata (mesmo release por outra assessoria, rodapé diferente)
+    original = None
+    if settings.NEAR_DUPLICATE_DETECTION:
+        signature = minhash(email_data.content)
+        email_cache_data.update(signature_fields(signature))
+        original = find_near_duplicate(signature)
+        if original:
+            email_cache_data.update(duplicate_fields(original))
+    
+    return {"email": db.insert_email_cache(email_cache_data), "existing": False, "original": original}
+
 @app.post("/process-email", response_model=ProcessEmailResponse)
 async def process_email(email_data: EmailInput, background_tasks: BackgroundTasks):
     """Processa um email de assessoria"""
@@ -1264,32 +1379,40 @@ async def process_email(email_data: EmailInput, background_tasks: BackgroundTask
         email_content = f"{email_data.sender}{email_data.subject}{email_data.content}"
         email_hash = hashlib.md5(email_content.encode()).hexdigest()
         
-        # Verificar se já foi processado
-        existing_email = db.get_email_by_hash(email_hash)
-        if existing_email:
+        # Requisições simultâneas do mesmo email compartilham verificação e inserção
+        registration, shared = await asyncio.to_thread(
+            single_flight.do, f"email:{email_hash}", _register_email, email_data, email_hash
+        )
+        cached_email = registration["email"]
+        original = registration["original"]
+        
+        if not cached_email:
+            raise HTTPException(status_code=500, detail="Erro ao salvar email")
+        
+        if registration["existing"] or shared:
             return ProcessEmailResponse(
                 success=True,
-                message="Email já foi processado anteriormente",
-                email_id=existing_email["id"],
-                wordpress_post_id=existing_email.get("wordpress_post_id")
+                message="Email já foi processado anteriormente" if registration["existing"] else "Email já está em processamento",
+                email_id=cached_email["id"],
+                wordpress_post_id=cached_email.get("wordpress_post_id")
             )
         
-        # Inserir email no cache
-        email_cache_data = {
-            "email_hash": email_hash,
-            "sender": email_data.sender,
-            "subject": email_data.subject,
-            "content_text": email_data.content,
-            "received_at": email_data.received_at or datetime.now(),
-            "status": "processing"
-        }
+        if original:
+            return ProcessEmailResponse(
+                success=True,
+                message=f"Email é quase duplicata de {original['id']}; vinculado ao original sem novo processamento",
+                email_id=cached_email["id"]
+            )
         
-        cached_email = db.insert_email_cache(email_cache_data)
-        if not cached_email:
-            raise HTTPException(status_code=500, detail="Erro ao salvar email")
+        # Pré-filtro local: emails pouco relevantes vão para a fila de baixa
+        # prioridade do pool e só rodam quando não há outros esperando
+        decision, prefilter_score = relevance_filter.decide(email_data.sender, email_data.subject, email_data.content)
         
-        # Processar com IA em background
-        background_tasks.add_task(process_email_with_ai, cached_email["id"], email_data.content, email_hash)
+        # Processar com IA no pool assíncrono (concorrência limitada)
+        ai_pool.submit(
+            process_email_with_ai, cached_email["id"], email_data.content, email_hash,
+            decision, prefilter_score, low_priority=decision == "deprioritize"
+        )
         
         return ProcessEmailResponse(
             success=True,
@@ -1301,14 +1424,37 @@ async def process_email(email_data: EmailInput, background_tasks: BackgroundTask
         logger.error(f"Erro ao processar email: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-def process_email_with_ai(email_id: str, email_content: str, email_hash: str):
-    """Processa email com IA (função background)"""
-    try:
+async def process_email_with_ai(email_id: str, email_content: str, email_hash: str,
+                                decision: str = "process", prefilter_score: Optional[float] = None):
+    """Processa email com IA (job do pool assíncrono)
+    
+    Execuções simultâneas para o mesmo email_hash aguardam a que já está em
+    andamento, evitando chamadas duplicadas ao Gemini e ao WordPress.
+    """
+    await single_flight.do_async(
+        f"ai:{email_hash}", _process_email_with_ai,
+        email_id, email_content, email_hash, decision, prefilter_score
+    )
+
+async def _process_email_with_ai(email_id: str, email_content: str, email_hash: str,
+                                 decision: str = "process", prefilter_score: Optional[float] = None):
+    try:
+        # Pré-filtro local: descartar releases obviamente irrelevantes antes de gastar API
+        if decision == "skip":
+            logger.info(f"⏭️ Email {email_id} ignorado pelo pré-filtro (score {prefilter_score:.3f})")
+            await asyncio.to_thread(db.update_email_cache, email_id, {
+                "status": "skipped",
+                "processed_at": datetime.now(),
+                "prefilter_score": prefilter_score,
+                "priority": 3
+            })
+            return
+        
         # Processar com IA
-        ai_result = ai_processor.process_email_content(email_content, email_hash)
+        ai_result = await ai_processor.process_email_content_async(email_content, email_hash)
         
         if not ai_result:
-            db.update_email_cache(email_id, {
+            await asyncio.to_thread(db.update_email_cache, email_id, {
                 "status": "error",
                 "processed_at": datetime.now()
             })
@@ -1325,21 +1471,32 @@ def process_email_with_ai(email_id: str, email_content: str, email_hash: str):
             "processing_cost_usd": ai_result["estimated_cost"],
             "detected_category": ai_result["parsed_response"].get("categoria")
         }
+        if prefilter_score is not None:
+            update_data["prefilter_score"] = prefilter_score
         
         # Criar rascunho no WordPress se o conteúdo for relevante
         relevance_score = ai_result["parsed_response"].get("relevancia_score", 0)
         if relevance_score >= 7.0:  # Threshold de relevância
-            wp_result = wp_publisher.create_draft_post(ai_result["parsed_response"])
+            wp_result = await asyncio.to_thread(wp_publisher.create_draft_post, ai_result["parsed_response"])
             if wp_result:
                 update_data["wordpress_post_id"] = wp_result["id"]
                 update_data["wordpress_status"] = "draft"
                 logger.info(f"Rascunho criado no WordPress: {wp_result['edit_url']}")
         
-        db.update_email_cache(email_id, update_data)
+        await asyncio.to_thread(db.update_email_cache, email_id, update_data)
         
+    except asyncio.CancelledError:
+        # Timeout do job no pool ou desligamento do servidor: a gravação vai
+        # para o threadpool sem await, para não bloquear o event loop nem ser
+        # interrompida por um novo cancelamento
+        asyncio.get_running_loop().run_in_executor(None, db.update_email_cache, email_id, {
+            "status": "error",
+            "processed_at": datetime.now()
+        })
+        raise
     except Exception as e:
         logger.error(f"Erro no processamento background: {e}")
-        db.update_email_cache(email_id, {
+        await asyncio.to_thread(db.update_email_cache, email_id, {
             "status": "error",
             "processed_at": datetime.now()
         })
@@ -1587,17 +1744,18 @@ async def populate_knowledge_base():
         
         populated_count = 0
         
+        # Extrair conteúdo limpo
+        candidates = []
         for post in posts:
+            content = wp_publisher.extract_clean_content(post.get('content', ''))
+            if len(content) >= 100:  # Ignorar posts muito pequenos
+                candidates.append((post, content))
+        
+        # Gerar embeddings em lote
+        embeddings = ai_processor.generate_embeddings([content for _, content in candidates])
+        
+        for (post, content), embedding in zip(candidates, embeddings):
             try:
-                # Extrair conteúdo limpo
-                content = wp_publisher.extract_clean_content(post.get('content', ''))
-                
-                if len(content) < 100:  # Ignorar posts muito pequenos
-                    continue
-                
-                # Gerar embedding
-                embedding = ai_processor.generate_embedding(content)
-                
                 if not embedding:
                     continue
                 
@@ -1637,6 +1795,10 @@ async def populate_knowledge_base():
         logger.error(f"Erro ao popular knowledge base: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Tarefas de segundo plano da startup (o event loop guarda só referências
+# fracas; sem esta, a tarefa pode ser coletada antes de terminar)
+startup_tasks: set = set()
+
 # Inicializar Realtime na startup
 @app.on_event("startup")
 async def startup_event():
@@ -1651,6 +1813,22 @@ async def startup_event():
         
         realtime_manager.subscribe("main_app", log_notification)
         
+        # Conferir se a coluna pgvector tem a dimensão do modelo de embeddings
+        dimensions = await asyncio.to_thread(db.get_embedding_dimensions)
+        if dimensions is None:
+            logger.warning("⚠️ Não foi possível verificar a dimensão de knowledge_base.embedding")
+        elif dimensions != settings.EMBEDDING_DIMENSIONS:
+            logger.error(
+                f"❌ knowledge_base.embedding tem {dimensions} dimensões, mas {settings.EMBEDDING_MODEL} "
+                f"gera {settings.EMBEDDING_DIMENSIONS}: aplique database/schemas/vector_search.sql"
+            )
+        
+        # Carregar índice vetorial local em segundo plano
+        if settings.LOCAL_VECTOR_INDEX_ENABLED:
+            task = asyncio.create_task(asyncio.to_thread(vector_index.refresh))
+            startup_tasks.add(task)
+            task.add_done_callback(startup_tasks.discard)
+        
         logger.info("🚀 Aplicação iniciada com Realtime ativo")
         
     except Exception as e:
@@ -1660,6 +1838,7 @@ async def startup_event():
 async def shutdown_event():
     """Limpeza na finalização"""
     try:
+        await ai_pool.shutdown()
         await realtime_manager.disconnect()
         logger.info("🔌 Aplicação finalizada")
     except Exception as e:
@@ -1675,6 +1854,60 @@ async def get_realtime_stats():
         logger.error(f"Erro ao obter estatísticas realtime: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/admin/stats/embedding-cache")
+async def get_embedding_cache_stats():
+    """Estatísticas do cache de embeddings (hits, misses, evictions)"""
+    store = ai_processor._embedding_store
+    return {
+        **ai_processor._embedding_cache.stats(),
+        "persistent_store": store.stats() if store else None,
+        "local_vector_index": vector_index.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/admin/stats/generation-cache")
+async def get_generation_cache_stats():
+    """Estatísticas do cache de respostas do Gemini (acertos, tokens e custo economizados)"""
+    cache = ai_processor._generation_cache
+    return {
+        "enabled": cache is not None,
+        **(await asyncio.to_thread(cache.stats) if cache else {}),
+        "token_estimator": ai_processor.token_estimator.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/admin/stats/ai-pool")
+async def get_ai_pool_stats():
+    """Fila e vazão do pool assíncrono de processamento com IA"""
+    return {
+        **ai_pool.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/admin/stats/single-flight")
+async def get_single_flight_stats():
+    """Chamadas de IA/ingestão em andamento e quantas foram coalescidas"""
+    return {
+        **single_flight.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/admin/stats/retrieval")
+async def get_retrieval_stats():
+    """Tempos e cache das etapas da busca híbrida (vetorial, textual, fusão)"""
+    return {
+        **ai_processor.retriever.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/admin/stats/rate-limits")
+async def get_rate_limit_stats():
+    """Contadores do controle de taxa das APIs Google"""
+    return {
+        "apis": rate_limiter.get_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
 @app.post("/admin/wordpress/analyze-external-links")
 async def analyze_external_links():
     """Analisa posts com links externos para insights"""
@@ -1746,12 +1979,14 @@ async def analyze_category_content(category_slug: str):
         total_words = 0
         all_keywords = {}
         
-        for post in posts:
-            # Extrair conteúdo limpo
-            content = wp_publisher.extract_clean_content(
-                post.get('content', {}).get('rendered', '')
-            )
-            
+        # Extrair conteúdo limpo e gerar embeddings em lote
+        contents = [
+            wp_publisher.extract_clean_content(post.get('content', {}).get('rendered', ''))
+            for post in posts
+        ]
+        embeddings = ai_processor.generate_embeddings(contents)
+        
+        for post, content, embedding in zip(posts, contents, embeddings):
             word_count = len(content.split())
             total_words += word_count
             
@@ -1759,10 +1994,8 @@ async def analyze_category_content(category_slug: str):
             pub_date = post.get('date', '')[:10]  # YYYY-MM-DD
             analysis["publishing_frequency"][pub_date] = analysis["publishing_frequency"].get(pub_date, 0) + 1
             
-            # Gerar embedding para análise futura
+            # Embedding para análise futura
             try:
-                embedding = ai_processor.generate_embedding(content)
-                
                 post_analysis = {
                     "id": post.get('id'),
                     "title": post.get('title', {}).get('rendered', ''),
@@ -2431,7 +2664,7 @@ async def analyze_workflow_email(
 ):
     """Analisar email com IA (primeira etapa do workflow)"""
     try:
-        result = email_workflow.analyze_email(email_id, current_user["id"])
+        result = await asyncio.to_thread(email_workflow.analyze_email, email_id, current_user["id"])
         
         if result["success"]:
             return result
@@ -2444,6 +2677,88 @@ async def analyze_workflow_email(
         logger.error(f"Erro ao analisar email: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse_event(event: str, data: Any) -> str:
+    """Formata um evento Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@app.get("/workflow/emails/{email_id}/analyze/stream")
+async def stream_workflow_email_analysis(
+    email_id: str,
+    current_user: Dict = Depends(auth_manager.require_permission("content"))
+):
+    """Analisar email com IA em streaming (SSE)
+    
+    Eventos: context, delta (texto parcial do rascunho) e result (campos
+    estruturados, gravados como na análise comum). Erros chegam como evento
+    error, pois o status HTTP já foi enviado. Usa a mesma chave single-flight
+    da análise comum: se uma delas já está em andamento, a outra só aguarda
+    o resultado em vez de chamar o Gemini de novo.
+    """
+    email = await asyncio.to_thread(email_workflow.get_email_details, email_id)
+    if not email:
+        raise HTTPException(status_code=404, detail="Email não encontrado")
+    if email["workflow_stage"] != "received":
+        raise HTTPException(status_code=400, detail="Email já foi analisado")
+    
+    content = f"{email['subject']}\n\n{email['content_text']}"
+    key = f"analyze:{email.get('email_hash') or email_id}"
+    
+    async def events():
+        call, leader = single_flight.begin(key)
+        if not leader:
+            # Análise do mesmo email já em andamento: só o resultado, sem deltas
+            logger.info(f"🔗 Aguardando chamada em andamento: {key}")
+            shared = await single_flight.wait_async(call)
+            if shared.get("success"):
+                yield _sse_event("result", {"success": True, "analysis": shared["analysis"], "cached_response": True})
+            else:
+                yield _sse_event("error", {"detail": shared.get("error", "Falha na análise com IA")})
+            return
+        
+        # Resultado repassado a quem aguarda a chave, no formato de analyze_email
+        shared = {"success": False, "error": "Análise em streaming interrompida"}
+        try:
+            result = None
+            async for event in ai_processor.stream_email_content(content, email.get("email_hash")):
+                if event["event"] == "result":
+                    result = event["data"]
+                else:
+                    yield _sse_event(event["event"], event["data"])
+            
+            if not result:
+                shared = {"success": False, "error": "Resposta vazia do Gemini"}
+                yield _sse_event("error", {"detail": shared["error"]})
+                return
+            
+            ai_analysis = email_workflow.build_ai_analysis(result["parsed_response"])
+            await asyncio.to_thread(email_workflow.save_analysis, email_id, current_user["id"], ai_analysis)
+            shared = {"success": True, "analysis": ai_analysis, "message": "Email analisado com sucesso"}
+            
+            yield _sse_event("result", {
+                "success": True,
+                "analysis": ai_analysis,
+                "tokens_input": result["tokens_input"],
+                "tokens_output": result["tokens_output"],
+                "cached_response": result["cached_response"]
+            })
+        
+        except asyncio.TimeoutError:
+            shared = {"success": False, "error": f"Timeout do Gemini após {settings.AI_REQUEST_TIMEOUT}s"}
+            yield _sse_event("error", {"detail": shared["error"]})
+        except Exception as e:
+            logger.error(f"Erro na análise em streaming: {e}")
+            shared = {"success": False, "error": str(e)}
+            yield _sse_event("error", {"detail": str(e)})
+        finally:
+            single_flight.finish(key, call, shared)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Sem cache e sem buffer do nginx, para os eventos chegarem na hora
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/workflow/emails/{email_id}/approve")
 async def approve_workflow_content(
     email_id: str,
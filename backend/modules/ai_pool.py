@@ -0,0 +1,145 @@
+"""
+Pool assíncrono de processamento com IA
+Limita quantos jobs de IA rodam ao mesmo tempo no event loop, sem ocupar o
+threadpool do servidor enquanto aguardam o Gemini, e expõe a fila
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set
+
+try:
+    from ..config import settings
+except ImportError:
+    from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AIPool:
+    """Executa corrotinas com concorrência máxima e timeout por job
+
+    Jobs acima do limite esperam em fila; queued é a profundidade dessa
+    fila. Uma rajada de emails é processada na vazão permitida pela quota
+    em vez de abrir uma thread por email.
+
+    Há duas filas FIFO: jobs com low_priority=True (ex.: emails que o
+    pré-filtro considerou pouco relevantes) só recebem uma vaga quando não
+    há nenhum job normal esperando.
+    """
+
+    def __init__(self, max_concurrency: int, timeout: Optional[float] = None):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._waiting: Deque[asyncio.Future] = deque()
+        self._waiting_low: Deque[asyncio.Future] = deque()
+        self._tasks: Set[asyncio.Task] = set()
+        self.active = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiting) + len(self._waiting_low)
+
+    async def _acquire(self, low_priority: bool):
+        """Ocupa uma vaga, esperando na fila da prioridade do job se preciso"""
+        if self.active < self.max_concurrency and not self.queued:
+            self.active += 1
+            return
+
+        lane = self._waiting_low if low_priority else self._waiting
+        waiter = asyncio.get_running_loop().create_future()
+        lane.append(waiter)
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # A vaga foi repassada no mesmo instante do cancelamento
+                self._release()
+            else:
+                lane.remove(waiter)
+            raise
+
+    def _release(self):
+        """Repassa a vaga ao próximo da fila normal, depois ao da fila baixa"""
+        for lane in (self._waiting, self._waiting_low):
+            while lane:
+                waiter = lane.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    return
+        self.active -= 1
+
+    async def run(self, fn: Callable[..., Awaitable], *args, timeout: Optional[float] = None,
+                  low_priority: bool = False, **kwargs) -> Any:
+        """Aguarda uma vaga e executa fn(*args, **kwargs) com timeout"""
+        enqueued = time.perf_counter()
+        await self._acquire(low_priority)
+
+        started = time.perf_counter()
+        self._wait_seconds += started - enqueued
+        try:
+            result = await asyncio.wait_for(fn(*args, **kwargs), timeout or self.timeout)
+            self.completed += 1
+            return result
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._run_seconds += time.perf_counter() - started
+            self._release()
+
+    def submit(self, fn: Callable[..., Awaitable], *args, **kwargs) -> asyncio.Task:
+        """Agenda um job em segundo plano (fire-and-forget com log de erros)"""
+        task = asyncio.create_task(self.run(fn, *args, **kwargs))
+        self._tasks.add(task)
+        task.add_done_callback(self._on_done)
+        return task
+
+    def _on_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if isinstance(error, asyncio.TimeoutError):
+            logger.error(f"⏱️ Job de IA excedeu o timeout de {self.timeout}s")
+        elif error:
+            logger.error(f"Erro em job de IA: {error}")
+
+    async def shutdown(self, timeout: float = 30):
+        """Aguarda os jobs pendentes (até timeout) e cancela o restante"""
+        if not self._tasks:
+            return
+        logger.info(f"⏳ Aguardando {len(self._tasks)} jobs de IA")
+        done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed + self.timeouts
+        return {
+            "max_concurrency": self.max_concurrency,
+            "timeout_seconds": self.timeout,
+            "queued": self.queued,
+            "queued_low_priority": len(self._waiting_low),
+            "max_queued": self.max_queued,
+            "active": self.active,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self._wait_seconds / finished * 1000, 1) if finished else None,
+            "avg_run_ms": round(self._run_seconds / finished * 1000, 1) if finished else None
+        }
+
+# Instância global
+ai_pool = AIPool(settings.AI_MAX_CONCURRENCY, settings.AI_JOB_TIMEOUT)
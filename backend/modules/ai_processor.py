@@ -1,23 +1,143 @@
 """
 Processador de IA usando Google Gemini
 """
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import google.generativeai as genai
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple, Type
+from pydantic import BaseModel
 
 # Import com fallback para desenvolvimento e produção
 try:
     from ..config import settings
     from ..database import db
+    from .rate_limiter import rate_limiter
+    from .embedding_cache import EmbeddingCache, PersistentEmbeddingStore
+    from .vector_index import vector_index
+    from .hybrid_search import HybridRetriever, build_text_query
+    from .generation_cache import GenerationCache, generation_key
+    from .single_flight import single_flight
+    from .ai_schemas import EditorialDraft, PartialStringField, TopicSuggestions, gemini_schema, partial_model, repair_prompt, validate_fields
+    from .prompt_budget import TokenEstimator, allocate_budget
+    from .email_summarizer import chunk_summary_prompt, combine_summaries, split_into_chunks
 except ImportError:
     from config import settings
     from database import db
+    from modules.rate_limiter import rate_limiter
+    from modules.embedding_cache import EmbeddingCache, PersistentEmbeddingStore
+    from modules.vector_index import vector_index
+    from modules.hybrid_search import HybridRetriever, build_text_query
+    from modules.generation_cache import GenerationCache, generation_key
+    from modules.single_flight import single_flight
+    from modules.ai_schemas import EditorialDraft, PartialStringField, TopicSuggestions, gemini_schema, partial_model, repair_prompt, validate_fields
+    from modules.prompt_budget import TokenEstimator, allocate_budget
+    from modules.email_summarizer import chunk_summary_prompt, combine_summaries, split_into_chunks
 import logging
 import hashlib
 import json
-import tiktoken
 
 logger = logging.getLogger(__name__)
 
+# Limite de textos por chamada de batchEmbedContents
+EMBEDDING_BATCH_SIZE = 100
+
+# Tipo de tarefa usado em todos os embeddings (parte da chave de cache)
+EMBEDDING_TASK_TYPE = "retrieval_document"
+
+# Configuração de geração (parte da chave do cache de respostas)
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "top_p": 0.8,
+    "top_k": 40,
+    "max_output_tokens": 2048,
+}
+
+# Resumo de partes de emails longos: mais determinístico e curto
+SUMMARY_CONFIG = {
+    **GENERATION_CONFIG,
+    "temperature": 0.2,
+    "max_output_tokens": 512,
+}
+
+# Níveis de reduce antes de cortar o resumo pelo orçamento
+SUMMARY_MAX_LEVELS = 2
+
+# Uso neutro para somar com _add_usage
+NO_USAGE = {"tokens_input": 0, "tokens_output": 0, "cost_usd": 0.0, "cached": True}
+
+# Custo aproximado (valores estimados)
+COST_PER_1K_INPUT = 0.00015  # $0.15 per 1K input tokens
+COST_PER_1K_OUTPUT = 0.0006  # $0.60 per 1K output tokens
+
+def structured_config(schema: Type[BaseModel]) -> Dict[str, Any]:
+    """Configuração de geração com saída JSON no formato do schema Pydantic"""
+    return {
+        **GENERATION_CONFIG,
+        "response_mime_type": "application/json",
+        "response_schema": gemini_schema(schema)
+    }
+
+def _add_usage(generation: Dict[str, Any], retry: Dict[str, Any]) -> Dict[str, Any]:
+    """Soma tokens e custo de uma nova tentativa à geração original"""
+    return {
+        **generation,
+        "tokens_input": generation["tokens_input"] + retry["tokens_input"],
+        "tokens_output": generation["tokens_output"] + retry["tokens_output"],
+        "cost_usd": generation["cost_usd"] + retry["cost_usd"],
+        "cached": generation["cached"] and retry["cached"]
+    }
+
+# Partes fixas do prompt editorial (contagem de tokens em cache)
+EDITORIAL_CONTEXT = """CONTEXTO EDITORIAL RECIFEMAIS:
+
+IDENTIDADE: "Alma e Pulso" - Conectar o Recife à sua essência e energia
+PÚBLICO: "Conectado Recifense" - Pessoas que amam Recife e querem se manter informadas
+
+VALORES FUNDAMENTAIS:
+- Autenticidade recifense
+- Informação útil e confiável
+- Proximidade com a comunidade
+- Valorização da cultura local
+- Responsabilidade social
+
+CATEGORIAS PRINCIPAIS:
+- Notícias: Tom confiável e preciso
+- Cultura: Tom inspirador e apaixonado
+- Gastronomia: Tom acolhedor e descritivo
+- Turismo: Tom convidativo e informativo
+- Economia: Tom analítico mas acessível
+- Eventos: Tom animado e engajador"""
+
+RAG_HEADER = "CONTEÚDO RELACIONADO EXISTENTE:"
+RAG_MAX_SNIPPETS = 3
+
+EDITORIAL_TASK = """TAREFA: Transforme este email de assessoria em um post otimizado para RecifeMais.
+
+EMAIL:"""
+
+EDITORIAL_TASK_SUMMARIZED = """TAREFA: Transforme este email de assessoria em um post otimizado para RecifeMais.
+
+EMAIL (material longo, resumido por partes, na ordem original):"""
+
+EDITORIAL_INSTRUCTIONS = """INSTRUÇÕES RÁPIDAS:
+- Categoria: noticia, cultura, gastronomia, turismo, economia ou evento
+- Título SEO: máx 60 caracteres, com palavra-chave
+- Meta: máx 155 caracteres, atrativa
+- Conteúdo: foco no público recifense, linguagem clara
+- Tags: 3-5 tags relevantes
+- Score: 1-10 (relevância para RecifeMais)
+
+RESPOSTA JSON:
+{
+    "categoria": "categoria",
+    "titulo": "título_seo_60_chars",
+    "meta_descricao": "meta_155_chars",
+    "conteudo": "post_completo_formatado",
+    "tags": ["tag1", "tag2", "tag3"],
+    "relevancia_score": 8.5,
+    "observacoes": "breve_comentario"
+}"""
+
 # Configurar Gemini - será reconfigurado dinamicamente
 # genai.configure(api_key=settings.secure_google_ai_api_key)
 
@@ -28,15 +148,21 @@ class AIProcessor:
         
         self.model = genai.GenerativeModel(
             settings.GEMINI_MODEL,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.7,
-                top_p=0.8,
-                top_k=40,
-                max_output_tokens=2048,
-            )
+            generation_config=genai.types.GenerationConfig(**GENERATION_CONFIG)
+        )
+        self.token_estimator = TokenEstimator()
+        self._embedding_cache = EmbeddingCache(settings.EMBEDDING_CACHE_MAX_BYTES)
+        self._embedding_store = self._open_embedding_store()
+        self._generation_cache = self._open_generation_cache()
+        
+        stages = {"vector": self._vector_stage}
+        if settings.HYBRID_SEARCH_ENABLED:
+            stages["text"] = self._text_stage
+        self.retriever = HybridRetriever(
+            stages,
+            candidates=settings.HYBRID_SEARCH_CANDIDATES,
+            cache_ttl=settings.CACHE_TTL
         )
-        self.encoding = tiktoken.get_encoding("cl100k_base")
-        self._embedding_cache = {}  # Cache simples para embeddings
     
     def _configure_gemini(self):
         """Configura a API key do Gemini dinamicamente"""
@@ -50,34 +176,259 @@ class AIProcessor:
         except Exception as e:
             logger.error(f"Erro ao configurar Gemini: {e}")
     
+    def _open_embedding_store(self) -> Optional[PersistentEmbeddingStore]:
+        """Abre o armazenamento persistente de embeddings, se configurado"""
+        if not settings.EMBEDDING_STORE_PATH:
+            return None
+        try:
+            return PersistentEmbeddingStore(settings.EMBEDDING_STORE_PATH)
+        except Exception as e:
+            logger.error(f"Erro ao abrir armazenamento de embeddings: {e}")
+            return None
+    
+    def _open_generation_cache(self) -> Optional[GenerationCache]:
+        """Cria o cache de respostas do Gemini (persistido se GENERATION_CACHE_PATH)"""
+        if not settings.GENERATION_CACHE_ENABLED:
+            return None
+        try:
+            return GenerationCache(
+                settings.GENERATION_CACHE_MAX_ENTRIES,
+                settings.GENERATION_CACHE_TTL,
+                settings.GENERATION_CACHE_PATH or None
+            )
+        except Exception as e:
+            logger.error(f"Erro ao abrir cache de respostas: {e}")
+            return GenerationCache(settings.GENERATION_CACHE_MAX_ENTRIES, settings.GENERATION_CACHE_TTL)
+    
+    def generate_text(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                      schema: Optional[Type[BaseModel]] = None) -> Dict[str, Any]:
+        """Gera resposta do Gemini com cache por (modelo, configuração, prompt)
+        
+        Retorna text, tokens_input, tokens_output, cost_usd e cached. Em
+        acertos de cache o custo da chamada é zero, assim como para quem
+        aguardou uma chamada idêntica já em andamento. generation_config
+        substitui a configuração padrão (ex.: structured_config); com schema,
+        só respostas que passam em validate_fields vão para o cache.
+        """
+        key = generation_key(settings.GEMINI_MODEL, generation_config or GENERATION_CONFIG, prompt)
+        
+        cached = self._cached_generation(key)
+        if cached:
+            return cached
+        
+        result, shared = single_flight.do(
+            f"prompt:{key}", self._generate_uncached, prompt, key, generation_config, schema
+        )
+        if shared:
+            return {**result, "cost_usd": 0.0, "cached": True}
+        return {**result, "cached": False}
+    
+    def _cached_generation(self, key: str) -> Optional[Dict[str, Any]]:
+        """Resposta do cache de geração (custo zero), se houver"""
+        if not self._generation_cache:
+            return None
+        try:
+            cached = self._generation_cache.get(key)
+        except Exception as e:
+            logger.error(f"Erro ao ler cache de respostas: {e}")
+            return None
+        return {**cached, "cost_usd": 0.0, "cached": True} if cached else None
+    
+    def _generation_cache_on_disk(self) -> bool:
+        return bool(self._generation_cache and self._generation_cache.path)
+    
+    async def _cached_generation_async(self, key: str) -> Optional[Dict[str, Any]]:
+        """Como _cached_generation; a leitura do SQLite roda fora do event loop"""
+        if self._generation_cache_on_disk():
+            return await asyncio.to_thread(self._cached_generation, key)
+        return self._cached_generation(key)
+    
+    def _generate_uncached(self, prompt: str, key: str, generation_config: Optional[Dict[str, Any]] = None,
+                           schema: Optional[Type[BaseModel]] = None) -> Dict[str, Any]:
+        """Chamada ao Gemini; grava a resposta no cache"""
+        response = rate_limiter.call('gemini', self.model.generate_content, prompt, generation_config=generation_config)
+        return self._remember_generation(prompt, key, response.text, getattr(response, "usage_metadata", None), schema)
+    
+    async def generate_text_async(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                                  schema: Optional[Type[BaseModel]] = None) -> Dict[str, Any]:
+        """Versão assíncrona de generate_text (generate_content_async com timeout)"""
+        key = generation_key(settings.GEMINI_MODEL, generation_config or GENERATION_CONFIG, prompt)
+        
+        cached = await self._cached_generation_async(key)
+        if cached:
+            return cached
+        
+        result, shared = await single_flight.do_async(
+            f"prompt:{key}", self._generate_uncached_async, prompt, key, generation_config, schema
+        )
+        if shared:
+            return {**result, "cost_usd": 0.0, "cached": True}
+        return {**result, "cached": False}
+    
+    async def _generate_uncached_async(self, prompt: str, key: str, generation_config: Optional[Dict[str, Any]] = None,
+                                       schema: Optional[Type[BaseModel]] = None) -> Dict[str, Any]:
+        response = await rate_limiter.call_async('gemini', self._generate_content_with_timeout, prompt, generation_config)
+        return await self._remember_generation_async(
+            prompt, key, response.text, getattr(response, "usage_metadata", None), schema
+        )
+    
+    async def _generate_content_with_timeout(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None):
+        return await asyncio.wait_for(
+            self.model.generate_content_async(prompt, generation_config=generation_config),
+            settings.AI_REQUEST_TIMEOUT
+        )
+    
+    def generate_structured(self, prompt: str, schema: Type[BaseModel]) -> Dict[str, Any]:
+        """Gera JSON no formato do schema e valida campo a campo
+        
+        Campos ausentes ou inválidos são pedidos de novo (só eles, com o
+        schema parcial) até STRUCTURED_OUTPUT_MAX_RETRIES vezes. Retorna o
+        mesmo formato de generate_text, com tokens/custo somados, mais
+        parsed (campos válidos) e failed_fields (os que não se resolveram).
+        """
+        generation = self.generate_text(prompt, structured_config(schema), schema)
+        parsed, failed = validate_fields(schema, generation["text"])
+        
+        for attempt in range(1, settings.STRUCTURED_OUTPUT_MAX_RETRIES + 1):
+            if not failed:
+                break
+            logger.warning(f"🔁 Campos inválidos na resposta ({', '.join(failed)}), tentativa {attempt}")
+            subset = partial_model(schema, failed)
+            retry = self.generate_text(repair_prompt(prompt, parsed, failed), structured_config(subset), subset)
+            generation = _add_usage(generation, retry)
+            fixed, failed = validate_fields(subset, retry["text"])
+            parsed.update(fixed)
+        
+        return {**generation, "parsed": parsed, "failed_fields": failed}
+    
+    async def generate_structured_async(self, prompt: str, schema: Type[BaseModel],
+                                        generation: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Versão assíncrona de generate_structured
+        
+        Aceita uma geração já feita (ex.: em streaming) para apenas validar
+        e completar os campos que falharam.
+        """
+        if generation is None:
+            generation = await self.generate_text_async(prompt, structured_config(schema), schema)
+        parsed, failed = validate_fields(schema, generation["text"])
+        
+        for attempt in range(1, settings.STRUCTURED_OUTPUT_MAX_RETRIES + 1):
+            if not failed:
+                break
+            logger.warning(f"🔁 Campos inválidos na resposta ({', '.join(failed)}), tentativa {attempt}")
+            subset = partial_model(schema, failed)
+            retry = await self.generate_text_async(repair_prompt(prompt, parsed, failed), structured_config(subset), subset)
+            generation = _add_usage(generation, retry)
+            fixed, failed = validate_fields(subset, retry["text"])
+            parsed.update(fixed)
+        
+        return {**generation, "parsed": parsed, "failed_fields": failed}
+    
+    def _remember_generation(self, prompt: str, key: str, text: str, usage: Any = None,
+                             schema: Optional[Type[BaseModel]] = None) -> Dict[str, Any]:
+        """Conta tokens e custo da resposta e grava no cache
+        
+        Usa a contagem do próprio Gemini (usage_metadata) quando disponível
+        e calibra com ela o estimador local de tokens. Com schema, respostas
+        inválidas não são gravadas: senão a nova tentativa, com o mesmo
+        prompt de correção, receberia do cache a mesma resposta inválida.
+        """
+        tokens_input = getattr(usage, "prompt_token_count", 0) or 0
+        tokens_output = getattr(usage, "candidates_token_count", 0) or 0
+        if tokens_input:
+            self.token_estimator.calibrate(self.token_estimator.local_count(prompt), tokens_input)
+        else:
+            tokens_input = self.count_tokens(prompt)
+        if not tokens_output:
+            tokens_output = self.count_tokens(text) if text else 0
+        result = {
+            "text": text,
+            "tokens_input": tokens_input,
+            "tokens_output": tokens_output,
+            "cost_usd": tokens_input / 1000 * COST_PER_1K_INPUT + tokens_output / 1000 * COST_PER_1K_OUTPUT
+        }
+        
+        if text and self._generation_cache and (schema is None or not validate_fields(schema, text)[1]):
+            try:
+                self._generation_cache.put(key, result)
+            except Exception as e:
+                logger.error(f"Erro ao gravar cache de respostas: {e}")
+        
+        return result
+    
+    async def _remember_generation_async(self, prompt: str, key: str, text: str, usage: Any = None,
+                                         schema: Optional[Type[BaseModel]] = None) -> Dict[str, Any]:
+        """Como _remember_generation; a gravação no SQLite roda fora do event loop"""
+        if self._generation_cache_on_disk():
+            return await asyncio.to_thread(self._remember_generation, prompt, key, text, usage, schema)
+        return self._remember_generation(prompt, key, text, usage, schema)
+    
+    def _lookup_embeddings(self, text_hashes: List[str]) -> Dict[str, List[float]]:
+        """Busca embeddings no cache em memória e depois no armazenamento em disco"""
+        found: Dict[str, List[float]] = {}
+        missing = []
+        for text_hash in text_hashes:
+            cached = self._embedding_cache.get(text_hash)
+            if cached is not None:
+                found[text_hash] = cached
+            else:
+                missing.append(text_hash)
+        
+        if missing and self._embedding_store:
+            try:
+                stored = self._embedding_store.get_many(settings.EMBEDDING_MODEL, EMBEDDING_TASK_TYPE, missing)
+                for text_hash, embedding in stored.items():
+                    self._embedding_cache.put(text_hash, embedding)
+                found.update(stored)
+            except Exception as e:
+                logger.error(f"Erro ao ler armazenamento de embeddings: {e}")
+        
+        return found
+    
+    def _remember_embeddings(self, embeddings: Dict[str, List[float]]):
+        """Grava embeddings novos na memória e no disco"""
+        for text_hash, embedding in embeddings.items():
+            self._embedding_cache.put(text_hash, embedding)
+        
+        if embeddings and self._embedding_store:
+            try:
+                self._embedding_store.put_many(settings.EMBEDDING_MODEL, EMBEDDING_TASK_TYPE, embeddings)
+            except Exception as e:
+                logger.error(f"Erro ao gravar armazenamento de embeddings: {e}")
+    
     def count_tokens(self, text: str) -> int:
-        """Conta tokens no texto"""
-        return len(self.encoding.encode(text))
+        """Estimativa de tokens do Gemini no texto (cl100k_base calibrado)"""
+        return self.token_estimator.count(text)
+    
+    def _prepare_embedding_text(self, text: str) -> str:
+        """Normaliza o texto enviado para embedding"""
+        # Limitar tamanho do texto para embeddings
+        if len(text) > 2000:
+            text = text[:2000] + "..."
+        return text
     
     def generate_embedding(self, text: str) -> List[float]:
         """Gera embedding do texto com cache"""
         try:
-            # Limitar tamanho do texto para embeddings
-            if len(text) > 2000:
-                text = text[:2000] + "..."
+            text = self._prepare_embedding_text(text)
             
             # Verificar cache
             text_hash = hashlib.md5(text.encode()).hexdigest()
-            if text_hash in self._embedding_cache:
-                return self._embedding_cache[text_hash]
+            cached = self._lookup_embeddings([text_hash])
+            if text_hash in cached:
+                return cached[text_hash]
             
-            result = genai.embed_content(
+            result = rate_limiter.call(
+                'gemini_embedding',
+                genai.embed_content,
                 model=f"models/{settings.EMBEDDING_MODEL}",
                 content=text,
-                task_type="retrieval_document",
+                task_type=EMBEDDING_TASK_TYPE,
                 title="Conteúdo RecifeMais"
             )
             
             embedding = result['embedding']
-            
-            # Salvar no cache (limitado a 1000 entradas)
-            if len(self._embedding_cache) < 1000:
-                self._embedding_cache[text_hash] = embedding
+            self._remember_embeddings({text_hash: embedding})
             
             return embedding
             
@@ -85,151 +436,416 @@ class AIProcessor:
             logger.error(f"Erro ao gerar embedding: {e}")
             return []
     
-    def create_editorial_prompt(self, email_content: str, similar_content: List[Dict] = None) -> str:
-        """Cria prompt editorial para o Gemini"""
-        
-        # Contexto editorial do RecifeMais
-        editorial_context = """
-        CONTEXTO EDITORIAL RECIFEMAIS:
-        
-        IDENTIDADE: "Alma e Pulso" - Conectar o Recife à sua essência e energia
-        PÚBLICO: "Conectado Recifense" - Pessoas que amam Recife e querem se manter informadas
-        
-        VALORES FUNDAMENTAIS:
-        - Autenticidade recifense
-        - Informação útil e confiável  
-        - Proximidade com a comunidade
-        - Valorização da cultura local
-        - Responsabilidade social
-        
-        CATEGORIAS PRINCIPAIS:
-        - Notícias: Tom confiável e preciso
-        - Cultura: Tom inspirador e apaixonado
-        - Gastronomia: Tom acolhedor e descritivo
-        - Turismo: Tom convidativo e informativo
-        - Economia: Tom analítico mas acessível
-        - Eventos: Tom animado e engajador
-        """
+    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Gera embeddings de vários textos via batchEmbedContents
         
-        # Contexto de conteúdo similar (RAG)
-        rag_context = ""
-        if similar_content:
-            rag_context = "\n\nCONTEÚDO RELACIONADO EXISTENTE:\n"
-            for content in similar_content[:3]:  # Limitar a 3 para não sobrecarregar
-                rag_context += f"- {content.get('topic', 'Sem título')}: {content.get('content_text', '')[:200]}...\n"
+        Consulta o cache item a item e envia apenas os textos ausentes, em
+        lotes de até EMBEDDING_BATCH_SIZE. A saída segue a ordem da entrada;
+        itens que falharem retornam lista vazia, como em generate_embedding.
+        """
+        prepared = [self._prepare_embedding_text(text) for text in texts]
+        hashes = [hashlib.md5(text.encode()).hexdigest() for text in prepared]
         
-        prompt = f"""
-        {editorial_context}
+        # Consultar memória e disco uma vez por texto distinto
+        found = self._lookup_embeddings(list(dict.fromkeys(hashes)))
+        misses: Dict[str, str] = {}
+        for text_hash, text in zip(hashes, prepared):
+            if text_hash not in found:
+                misses[text_hash] = text
         
-        {rag_context}
+        cached_count = len(found)
+        miss_items = list(misses.items())
         
-        TAREFA: Transforme este email de assessoria em um post otimizado para RecifeMais.
+        for start in range(0, len(miss_items), EMBEDDING_BATCH_SIZE):
+            chunk = miss_items[start:start + EMBEDDING_BATCH_SIZE]
+            try:
+                result = rate_limiter.call(
+                    'gemini_embedding',
+                    genai.embed_content,
+                    model=f"models/{settings.EMBEDDING_MODEL}",
+                    content=[text for _, text in chunk],
+                    task_type=EMBEDDING_TASK_TYPE,
+                    title="Conteúdo RecifeMais"
+                )
+                
+                generated = {text_hash: embedding for (text_hash, _), embedding in zip(chunk, result['embedding'])}
+                found.update(generated)
+                self._remember_embeddings(generated)
+                    
+            except Exception as e:
+                logger.error(f"Erro ao gerar lote de {len(chunk)} embeddings: {e}")
         
-        EMAIL:
-        {email_content[:1500]}  # Limitar para economizar tokens
+        if miss_items:
+            logger.info(f"Embeddings em lote: {cached_count} do cache, {len(found) - cached_count} de {len(miss_items)} gerados")
         
-        INSTRUÇÕES RÁPIDAS:
-        - Categoria: noticia, cultura, gastronomia, turismo, economia ou evento
-        - Título SEO: máx 60 caracteres, com palavra-chave
-        - Meta: máx 155 caracteres, atrativa
-        - Conteúdo: foco no público recifense, linguagem clara
-        - Tags: 3-5 tags relevantes
-        - Score: 1-10 (relevância para RecifeMais)
+        return [found.get(text_hash, []) for text_hash in hashes]
+    
+    def create_editorial_prompt(self, email_content: str, similar_content: List[Dict] = None,
+                                summarized: bool = False) -> str:
+        """Cria prompt editorial para o Gemini dentro de MAX_TOKENS_PER_REQUEST
         
-        RESPOSTA JSON:
-        {{
-            "categoria": "categoria",
-            "titulo": "título_seo_60_chars",
-            "meta_descricao": "meta_155_chars",
-            "conteudo": "post_completo_formatado",
-            "tags": ["tag1", "tag2", "tag3"],
-            "relevancia_score": 8.5,
-            "observacoes": "breve_comentario"
-        }}
+        As partes fixas (contexto editorial, tarefa, instruções) têm contagem
+        em cache; os trechos relacionados (RAG) entram até
+        PROMPT_RAG_SNIPPET_TOKENS cada e o email, na íntegra, recebe todo o
+        orçamento restante. Emails maiores que isso chegam aqui já resumidos
+        (summarized) e só são cortados se o resumo ainda não couber.
         """
+        estimator = self.token_estimator
+        task = EDITORIAL_TASK_SUMMARIZED if summarized else EDITORIAL_TASK
+        
+        # Contexto de conteúdo similar (RAG), limitado a RAG_MAX_SNIPPETS trechos
+        snippets = [
+            f"- {content.get('topic', 'Sem título')}: {content.get('content_text', '')}"
+            for content in (similar_content or [])[:RAG_MAX_SNIPPETS]
+        ]
+        snippet_tokens = [min(estimator.count(snippet), settings.PROMPT_RAG_SNIPPET_TOKENS) for snippet in snippets]
+        snippet_budget = allocate_budget(
+            self.email_token_budget(rag_tokens=0, summarized=summarized),
+            dict(enumerate(snippet_tokens))
+        )
+        email_budget = self.email_token_budget(rag_tokens=sum(snippet_budget.values()), summarized=summarized)
+        
+        if estimator.count(email_content) > email_budget:
+            logger.warning(f"Email cortado para {email_budget} tokens pelo orçamento do prompt")
+        
+        rag_context = ""
+        if snippets:
+            rag_context = RAG_HEADER + "\n" + "\n".join(
+                estimator.truncate(snippet, snippet_budget[i]) for i, snippet in enumerate(snippets) if snippet_budget[i]
+            )
         
-        return prompt
+        return "\n\n".join([
+            EDITORIAL_CONTEXT,
+            rag_context,
+            task,
+            estimator.truncate(email_content, email_budget),
+            EDITORIAL_INSTRUCTIONS
+        ])
     
     def search_similar_content(self, embedding: List[float], limit: int = 3) -> List[Dict]:
-        """Busca conteúdo similar usando o database"""
+        """Busca conteúdo similar (índice local ou RPC do database)
+        
+        Enquanto o índice local está vazio (carga da startup em andamento ou
+        falha), a busca vai para o RPC.
+        """
         try:
+            if settings.LOCAL_VECTOR_INDEX_ENABLED and vector_index.size > 0:
+                return vector_index.search(embedding, limit)
             return db.search_similar_content(embedding, limit)
         except Exception as e:
             logger.error(f"Erro ao buscar conteúdo similar: {e}")
             return []
     
+    def _vector_stage(self, text: str, limit: int) -> List[Dict]:
+        """Etapa vetorial da recuperação: embedding + busca por similaridade"""
+        embedding = self.generate_embedding(text)
+        return self.search_similar_content(embedding, limit) if embedding else []
+    
+    def _text_stage(self, text: str, limit: int) -> List[Dict]:
+        """Etapa textual da recuperação: tsvector em português"""
+        query = build_text_query(text)
+        return db.search_text_content(query, limit) if query else []
+    
+    def retrieve_context(self, email_content: str, email_hash: Optional[str] = None, limit: int = 3) -> List[Dict]:
+        """Conteúdo relacionado para o prompt (busca híbrida com cache por email)"""
+        return self.retriever.retrieve(email_content, cache_key=email_hash, limit=limit)
+    
+    def email_token_budget(self, rag_tokens: Optional[int] = None, summarized: bool = False) -> int:
+        """Tokens livres para o corpo do email no prompt editorial
+        
+        MAX_TOKENS_PER_REQUEST menos as partes fixas e o contexto RAG; sem
+        rag_tokens, reserva o teto do RAG (RAG_MAX_SNIPPETS trechos de
+        PROMPT_RAG_SNIPPET_TOKENS), que não depende da busca.
+        """
+        if rag_tokens is None:
+            rag_tokens = RAG_MAX_SNIPPETS * settings.PROMPT_RAG_SNIPPET_TOKENS
+        task = EDITORIAL_TASK_SUMMARIZED if summarized else EDITORIAL_TASK
+        fixed_tokens = sum(
+            self.token_estimator.count_static(part)
+            for part in (EDITORIAL_CONTEXT, RAG_HEADER, task, EDITORIAL_INSTRUCTIONS)
+        )
+        return max(settings.MAX_TOKENS_PER_REQUEST - fixed_tokens - rag_tokens, 0)
+    
+    def _needs_summary(self, email_content: str) -> bool:
+        """Só emails que não cabem inteiros no prompt passam pelo resumo map-reduce
+        
+        O orçamento considera o RAG no teto, para a decisão não esperar a
+        busca de contexto (que roda em paralelo com o resumo).
+        """
+        return settings.LONG_EMAIL_SUMMARIZATION and self.count_tokens(email_content) > self.email_token_budget()
+    
+    def _summary_chunks(self, text: str) -> List[str]:
+        """Partes do texto; aumenta o tamanho da parte em vez de descartar texto"""
+        chunk_tokens = max(
+            settings.LONG_EMAIL_CHUNK_TOKENS,
+            -(-self.count_tokens(text) // settings.LONG_EMAIL_MAX_CHUNKS)
+        )
+        return split_into_chunks(text, self.token_estimator, chunk_tokens)
+    
+    def _summarize_chunk(self, chunk: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self.generate_text(chunk_summary_prompt(chunk), SUMMARY_CONFIG)
+        except Exception as e:
+            logger.error(f"Erro ao resumir parte do email: {e}")
+            return None
+    
+    async def _summarize_chunk_async(self, chunk: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.generate_text_async(chunk_summary_prompt(chunk), SUMMARY_CONFIG)
+        except Exception as e:
+            logger.error(f"Erro ao resumir parte do email: {e}")
+            return None
+    
+    def _reduce_summaries(self, chunks: List[str], generations: List[Optional[Dict[str, Any]]],
+                          usage: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """Junta os resumos das partes; parte sem resumo entra cortada, na sua vez"""
+        share = settings.LONG_EMAIL_SUMMARY_TOKENS // len(chunks)
+        summaries = []
+        for chunk, generation in zip(chunks, generations):
+            if generation and generation["text"]:
+                summaries.append(generation["text"])
+                usage = _add_usage(usage, generation)
+            else:
+                summaries.append(self.token_estimator.truncate(chunk, share))
+        return combine_summaries(summaries), usage
+    
+    def summarize_long_email(self, email_content: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        """Resumo map-reduce de emails que não cabem no orçamento do prompt
+        
+        Map: cada parte é resumida em paralelo (até LONG_EMAIL_MAP_CONCURRENCY
+        threads); o prompt de cada parte depende só dela, então o cache de
+        respostas e o single-flight reaproveitam partes repetidas. Reduce: os
+        resumos, na ordem, substituem o corpo do email no prompt editorial;
+        se ainda passarem de LONG_EMAIL_SUMMARY_TOKENS, são resumidos de novo.
+        Retorna (resumo ou None se o email cabe inteiro, tokens/custo gastos).
+        """
+        usage = dict(NO_USAGE)
+        if not self._needs_summary(email_content):
+            return None, usage
+        
+        text = email_content
+        for level in range(SUMMARY_MAX_LEVELS):
+            chunks = self._summary_chunks(text)
+            logger.info(f"📚 Email longo: resumindo {len(chunks)} partes (nível {level + 1})")
+            with ThreadPoolExecutor(max_workers=settings.LONG_EMAIL_MAP_CONCURRENCY) as executor:
+                generations = list(executor.map(self._summarize_chunk, chunks))
+            text, usage = self._reduce_summaries(chunks, generations, usage)
+            if self.count_tokens(text) <= settings.LONG_EMAIL_SUMMARY_TOKENS:
+                break
+        
+        return text, usage
+    
+    async def summarize_long_email_async(self, email_content: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        """Versão assíncrona de summarize_long_email (partes com generate_content_async)"""
+        usage = dict(NO_USAGE)
+        if not self._needs_summary(email_content):
+            return None, usage
+        
+        semaphore = asyncio.Semaphore(settings.LONG_EMAIL_MAP_CONCURRENCY)
+        
+        async def summarize(chunk: str) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                return await self._summarize_chunk_async(chunk)
+        
+        text = email_content
+        for level in range(SUMMARY_MAX_LEVELS):
+            chunks = self._summary_chunks(text)
+            logger.info(f"📚 Email longo: resumindo {len(chunks)} partes (nível {level + 1})")
+            generations = await asyncio.gather(*(summarize(chunk) for chunk in chunks))
+            text, usage = self._reduce_summaries(chunks, generations, usage)
+            if self.count_tokens(text) <= settings.LONG_EMAIL_SUMMARY_TOKENS:
+                break
+        
+        return text, usage
+    
+    def _prepare_email_prompt(self, email_content: str, email_hash: str) -> Tuple[str, List[Dict], Dict[str, Any]]:
+        """Busca contexto relacionado, resume emails longos e monta o prompt editorial"""
+        # Buscar conteúdo relacionado (vetorial + textual) sobre o email completo
+        similar_content = self.retrieve_context(email_content, email_hash, limit=RAG_MAX_SNIPPETS)
+        summary, summary_usage = self.summarize_long_email(email_content)
+        
+        # Criar prompt editorial (já dentro do orçamento de tokens)
+        prompt = self.create_editorial_prompt(summary or email_content, similar_content, summarized=summary is not None)
+        
+        return prompt, similar_content, summary_usage
+    
+    async def _prepare_email_prompt_async(self, email_content: str,
+                                          email_hash: Optional[str]) -> Tuple[str, List[Dict], Dict[str, Any]]:
+        """Como _prepare_email_prompt, com busca de contexto e resumo em paralelo"""
+        similar_content, (summary, summary_usage) = await asyncio.gather(
+            asyncio.to_thread(self.retrieve_context, email_content, email_hash, RAG_MAX_SNIPPETS),
+            self.summarize_long_email_async(email_content)
+        )
+        prompt = self.create_editorial_prompt(summary or email_content, similar_content, summarized=summary is not None)
+        return prompt, similar_content, summary_usage
+    
     def process_email_content(self, email_content: str, email_hash: str) -> Optional[Dict[str, Any]]:
         """Processa conteúdo do email com IA"""
         try:
-            # Gerar embedding para busca de conteúdo similar
-            embedding = self.generate_embedding(email_content)
-            similar_content = []
-            
-            if embedding:
-                similar_content = self.search_similar_content(embedding, limit=3)
-            
-            # Criar prompt editorial
-            prompt = self.create_editorial_prompt(email_content, similar_content)
+            prompt, similar_content, summary_usage = self._prepare_email_prompt(email_content, email_hash)
             
-            # Contar tokens
-            input_tokens = self.count_tokens(prompt)
-            
-            if input_tokens > settings.MAX_TOKENS_PER_REQUEST:
-                logger.warning(f"Prompt muito longo: {input_tokens} tokens")
-                # Truncar email se necessário
-                email_content = email_content[:2000] + "..."
-                prompt = self.create_editorial_prompt(email_content, similar_content)
-                input_tokens = self.count_tokens(prompt)
-            
-            # Gerar resposta
-            response = self.model.generate_content(prompt)
-            
-            if not response.text:
-                logger.error("Resposta vazia do Gemini")
-                return None
-            
-            # Contar tokens de saída
-            output_tokens = self.count_tokens(response.text)
+            # Gerar resposta (ou reaproveitar do cache)
+            if settings.STRUCTURED_OUTPUT_ENABLED:
+                generation = self.generate_structured(prompt, EditorialDraft)
+            else:
+                generation = self.generate_text(prompt)
+            return self._build_email_result(prompt, _add_usage(generation, summary_usage), similar_content)
             
-            # Tentar parsear JSON
-            try:
-                # Limpar resposta se tiver markdown
-                clean_response = response.text.strip()
-                if clean_response.startswith("```json"):
-                    clean_response = clean_response[7:-3]
-                elif clean_response.startswith("```"):
-                    clean_response = clean_response[3:-3]
-                
-                parsed_response = json.loads(clean_response)
-            except json.JSONDecodeError:
-                logger.error("Erro ao parsear JSON da resposta")
-                # Fallback: retornar resposta crua
-                parsed_response = {
-                    "categoria": "indefinida",
-                    "titulo": "Conteúdo processado pela IA",
-                    "conteudo": response.text,
-                    "observacoes": "Resposta não estruturada - necessita revisão manual"
-                }
+        except Exception as e:
+            logger.error(f"Erro no processamento de IA: {e}")
+            return None
+    
+    async def process_email_content_async(self, email_content: str, email_hash: str) -> Optional[Dict[str, Any]]:
+        """Versão assíncrona: busca de contexto em thread, geração com generate_content_async"""
+        try:
+            prompt, similar_content, summary_usage = await self._prepare_email_prompt_async(email_content, email_hash)
+            if settings.STRUCTURED_OUTPUT_ENABLED:
+                generation = await self.generate_structured_async(prompt, EditorialDraft)
+            else:
+                generation = await self.generate_text_async(prompt)
+            return self._build_email_result(prompt, _add_usage(generation, summary_usage), similar_content)
             
-            # Calcular custo aproximado (valores estimados)
-            cost_per_1k_input = 0.00015  # $0.15 per 1K input tokens
-            cost_per_1k_output = 0.0006  # $0.60 per 1K output tokens
+        except asyncio.TimeoutError:
+            logger.error(f"Timeout do Gemini após {settings.AI_REQUEST_TIMEOUT}s")
+            return None
+        except Exception as e:
+            logger.error(f"Erro no processamento de IA: {e}")
+            return None
+    
+    async def stream_email_content(self, email_content: str, email_hash: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Processa o email com saída em streaming do Gemini
+        
+        Emite eventos {"event", "data"}: context (conteúdo relacionado
+        encontrado e se o email foi resumido), delta (texto parcial do
+        rascunho, na ordem) e, ao final, result com o mesmo formato de
+        process_email_content. Com saída estruturada, delta traz só o valor
+        de "conteudo" extraído do JSON parcial, nunca fragmentos de JSON.
+        """
+        prompt, similar_content, summary_usage = await self._prepare_email_prompt_async(email_content, email_hash)
+        yield {"event": "context", "data": {
+            "similar_content_found": len(similar_content),
+            "summarized": self._needs_summary(email_content)
+        }}
+        
+        config = structured_config(EditorialDraft) if settings.STRUCTURED_OUTPUT_ENABLED else None
+        key = generation_key(settings.GEMINI_MODEL, config or GENERATION_CONFIG, prompt)
+        generation = await self._cached_generation_async(key)
+        draft = PartialStringField("conteudo") if config else None
+        
+        def draft_text(text: str) -> str:
+            return draft.feed(text) if draft else text
+        
+        if generation:
+            text = draft_text(generation["text"])
+            if text:
+                yield {"event": "delta", "data": {"text": text}}
+        else:
+            await rate_limiter.acquire_async('gemini')
+            response = await asyncio.wait_for(
+                self.model.generate_content_async(prompt, stream=True, generation_config=config),
+                settings.AI_REQUEST_TIMEOUT
+            )
             
-            estimated_cost = (input_tokens / 1000 * cost_per_1k_input) + (output_tokens / 1000 * cost_per_1k_output)
+            parts = []
+            chunks = response.__aiter__()
+            while True:
+                # Timeout entre pedaços, não da resposta inteira
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), settings.AI_REQUEST_TIMEOUT)
+                except StopAsyncIteration:
+                    break
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Pedaço sem texto (ex.: apenas metadados de segurança)
+                    continue
+                if text:
+                    parts.append(text)
+                    delta = draft_text(text)
+                    if delta:
+                        yield {"event": "delta", "data": {"text": delta}}
             
-            return {
-                "parsed_response": parsed_response,
-                "raw_response": response.text,
-                "prompt_used": prompt,
-                "tokens_input": input_tokens,
-                "tokens_output": output_tokens,
-                "estimated_cost": estimated_cost,
-                "similar_content_found": len(similar_content)
+            usage = getattr(response, "usage_metadata", None)
+            generation = {
+                **await self._remember_generation_async(prompt, key, "".join(parts), usage, EditorialDraft if config else None),
+                "cached": False
             }
-            
-        except Exception as e:
-            logger.error(f"Erro no processamento de IA: {e}")
+        
+        if settings.STRUCTURED_OUTPUT_ENABLED:
+            # Validação e nova tentativa dos campos inválidos após o stream
+            generation = await self.generate_structured_async(prompt, EditorialDraft, generation)
+        
+        yield {"event": "result", "data": self._build_email_result(prompt, _add_usage(generation, summary_usage), similar_content)}
+    
+    def _build_email_result(self, prompt: str, generation: Dict[str, Any],
+                            similar_content: List[Dict]) -> Optional[Dict[str, Any]]:
+        """Interpreta a resposta do Gemini no formato gravado no email_cache"""
+        response_text = generation["text"]
+        
+        if not response_text and not generation.get("parsed"):
+            logger.error("Resposta vazia do Gemini")
             return None
+        
+        if "parsed" in generation:
+            parsed_response = self._complete_editorial_fields(generation["parsed"], generation["failed_fields"])
+        else:
+            parsed_response = self._parse_json_response(response_text)
+        
+        return {
+            "parsed_response": parsed_response,
+            "raw_response": response_text,
+            "prompt_used": prompt,
+            "tokens_input": generation["tokens_input"],
+            "tokens_output": generation["tokens_output"],
+            "estimated_cost": generation["cost_usd"],
+            "cached_response": generation["cached"],
+            "similar_content_found": len(similar_content)
+        }
+    
+    @staticmethod
+    def _complete_editorial_fields(parsed: Dict[str, Any], failed_fields: List[str]) -> Dict[str, Any]:
+        """Preenche campos que falharam após as novas tentativas e sinaliza revisão"""
+        if not failed_fields:
+            return parsed
+        
+        logger.error(f"Campos sem resposta válida do Gemini: {', '.join(failed_fields)}")
+        fallback = {
+            "categoria": "indefinida",
+            "titulo": "Conteúdo processado pela IA",
+            "meta_descricao": "",
+            "conteudo": "",
+            "tags": [],
+            "relevancia_score": 0.0,
+            "observacoes": ""
+        }
+        completed = {**fallback, **parsed}
+        note = f"Campos inválidos ({', '.join(failed_fields)}) - necessita revisão manual"
+        completed["observacoes"] = f"{completed['observacoes']} | {note}" if completed["observacoes"] else note
+        return completed
+    
+    @staticmethod
+    def _parse_json_response(response_text: str) -> Dict[str, Any]:
+        """Parse da resposta em texto livre (STRUCTURED_OUTPUT_ENABLED desligado)"""
+        try:
+            # Limpar resposta se tiver markdown
+            clean_response = response_text.strip()
+            if clean_response.startswith("```json"):
+                clean_response = clean_response[7:-3]
+            elif clean_response.startswith("```"):
+                clean_response = clean_response[3:-3]
+            
+            parsed_response = json.loads(clean_response)
+        except json.JSONDecodeError:
+            logger.error("Erro ao parsear JSON da resposta")
+            # Fallback: retornar resposta crua
+            parsed_response = {
+                "categoria": "indefinida",
+                "titulo": "Conteúdo processado pela IA",
+                "conteudo": response_text,
+                "observacoes": "Resposta não estruturada - necessita revisão manual"
+            }
+        
+        return parsed_response
     
     def suggest_proactive_topics(self, seed_topics: List[str] = None) -> List[Dict[str, Any]]:
         """Sugere pautas proativas baseadas em tendências"""
@@ -272,10 +888,14 @@ class AIProcessor:
         """
         
         try:
-            response = self.model.generate_content(prompt)
+            if settings.STRUCTURED_OUTPUT_ENABLED:
+                generation = self.generate_structured(prompt, TopicSuggestions)
+                return generation["parsed"].get("pautas", [])
+            
+            response_text = self.generate_text(prompt)["text"]
             
-            if response.text:
-                clean_response = response.text.strip()
+            if response_text:
+                clean_response = response_text.strip()
                 if clean_response.startswith("```json"):
                     clean_response = clean_response[7:-3]
                 elif clean_response.startswith("```"):
@@ -0,0 +1,202 @@
+"""
+Schemas das respostas estruturadas do Gemini
+Modelos Pydantic que definem o JSON pedido (response_schema) e validam a
+resposta campo a campo, para repetir apenas os campos que falharam
+"""
+import json
+import re
+from typing import Any, Dict, List, Literal, Optional, Tuple, Type
+
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, create_model
+
+
+class EditorialDraft(BaseModel):
+    """Post gerado a partir de um email de assessoria"""
+    categoria: Literal["noticia", "cultura", "gastronomia", "turismo", "economia", "evento"] = Field(
+        description="Categoria editorial do post"
+    )
+    titulo: str = Field(min_length=1, max_length=70, description="Título SEO com palavra-chave, até 60 caracteres")
+    meta_descricao: str = Field(min_length=1, max_length=170, description="Meta descrição atrativa, até 155 caracteres")
+    conteudo: str = Field(min_length=1, description="Post completo, formatado, com foco no público recifense")
+    tags: List[str] = Field(min_length=1, max_length=8, description="3 a 5 tags relevantes")
+    relevancia_score: float = Field(ge=0, le=10, description="Relevância para o RecifeMais, de 1 a 10")
+    observacoes: str = Field(default="", description="Breve comentário para a redação")
+
+
+class TopicSuggestion(BaseModel):
+    """Pauta proativa sugerida"""
+    titulo: str = Field(min_length=1, description="Título da pauta")
+    resumo: str = Field(description="Resumo executivo")
+    categoria: str = Field(description="Categoria sugerida")
+    keywords_seo: List[str] = Field(description="Palavras-chave de SEO")
+    formato_sugerido: str = Field(description="artigo, lista, guia ou video")
+    potencial_engajamento: float = Field(ge=0, le=10, description="Potencial de engajamento, de 0 a 10")
+    justificativa: str = Field(description="Por que essa pauta é relevante")
+
+
+class TopicSuggestions(BaseModel):
+    pautas: List[TopicSuggestion]
+
+
+# Tipos JSON Schema -> tipos do Schema da API do Gemini
+_GEMINI_TYPES = {
+    "string": "STRING",
+    "number": "NUMBER",
+    "integer": "INTEGER",
+    "boolean": "BOOLEAN",
+    "array": "ARRAY",
+    "object": "OBJECT",
+}
+
+
+def gemini_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Converte o JSON Schema do modelo para o subconjunto aceito pelo Gemini
+
+    O Gemini não aceita $ref, title, default nem limites de tamanho: as
+    referências são expandidas e os limites ficam só na validação Pydantic.
+    """
+    schema = model.model_json_schema()
+    definitions = schema.get("$defs", {})
+
+    def convert(node: Dict[str, Any]) -> Dict[str, Any]:
+        if "$ref" in node:
+            return convert({**definitions[node["$ref"].split("/")[-1]], **{
+                key: value for key, value in node.items() if key == "description"
+            }})
+
+        if "anyOf" in node:
+            options = [option for option in node["anyOf"] if option.get("type") != "null"]
+            converted = convert(options[0])
+            if len(options) < len(node["anyOf"]):
+                converted["nullable"] = True
+            if node.get("description"):
+                converted["description"] = node["description"]
+            return converted
+
+        if "enum" in node:
+            converted = {"type": "STRING", "format": "enum", "enum": [str(value) for value in node["enum"]]}
+        else:
+            converted = {"type": _GEMINI_TYPES[node.get("type", "string")]}
+
+        if node.get("description"):
+            converted["description"] = node["description"]
+        if converted["type"] == "ARRAY":
+            converted["items"] = convert(node.get("items", {"type": "string"}))
+        if converted["type"] == "OBJECT":
+            converted["properties"] = {name: convert(child) for name, child in node.get("properties", {}).items()}
+            converted["required"] = list(node.get("required", []))
+        return converted
+
+    return convert(schema)
+
+
+def validate_fields(model: Type[BaseModel], text: str) -> Tuple[Dict[str, Any], List[str]]:
+    """Valida a resposta campo a campo
+
+    Retorna (campos válidos já convertidos, nomes dos campos ausentes ou
+    inválidos). JSON ilegível conta como falha de todos os campos.
+    """
+    fields = model.model_fields
+    try:
+        data = json.loads(text.strip()) if text else None
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return {}, list(fields)
+
+    try:
+        return model.model_validate(data).model_dump(), []
+    except ValidationError as e:
+        failed = {error["loc"][0] for error in e.errors() if error["loc"]}
+
+    valid = {}
+    for name, field in fields.items():
+        if name in failed:
+            continue
+        if name in data:
+            valid[name] = TypeAdapter(field.annotation).validate_python(data[name])
+        elif not field.is_required():
+            valid[name] = field.get_default(call_default_factory=True)
+
+    return valid, [name for name in fields if name in failed]
+
+
+def partial_model(model: Type[BaseModel], field_names: List[str]) -> Type[BaseModel]:
+    """Modelo só com os campos indicados (schema da nova tentativa)"""
+    return create_model(
+        f"{model.__name__}Parcial",
+        **{name: (model.model_fields[name].annotation, model.model_fields[name]) for name in field_names}
+    )
+
+
+def repair_prompt(prompt: str, valid: Dict[str, Any], failed: List[str]) -> str:
+    """Prompt da nova tentativa: apenas os campos que falharam"""
+    return f"""{prompt}
+
+CORREÇÃO: na resposta anterior os campos {", ".join(failed)} vieram ausentes ou inválidos.
+Campos já aceitos (mantenha coerência com eles):
+{json.dumps(valid, ensure_ascii=False)}
+
+Responda APENAS com os campos: {", ".join(failed)}.
+"""
+
+
+_JSON_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class PartialStringField:
+    """Extrai o valor de um campo string de um JSON ainda em streaming
+
+    feed() recebe cada pedaço da resposta e retorna apenas o texto novo do
+    campo, já sem escapes JSON; escapes cortados entre pedaços esperam o
+    próximo. Campos antes e depois (ex.: titulo, tags) são ignorados.
+    """
+
+    def __init__(self, field: str):
+        self._key_re = re.compile(r'(?<!\\)"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._pos: Optional[int] = None
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        self._buffer += chunk
+        if self.done:
+            return ""
+        if self._pos is None:
+            match = self._key_re.search(self._buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+
+        buffer, i, out = self._buffer, self._pos, []
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                self.done = True
+                i += 1
+                break
+            if char != "\\":
+                out.append(char)
+                i += 1
+                continue
+            if i + 1 >= len(buffer):
+                break
+            if buffer[i + 1] != "u":
+                out.append(_JSON_ESCAPES.get(buffer[i + 1], buffer[i + 1]))
+                i += 2
+                continue
+            # \uXXXX, com par substituto (\uD83D\uDE00) decodificado junto
+            if i + 6 > len(buffer):
+                break
+            code = int(buffer[i + 2:i + 6], 16)
+            if 0xD800 <= code < 0xDC00:
+                if i + 12 > len(buffer):
+                    break
+                out.append(json.loads(f'"{buffer[i:i + 12]}"'))
+                i += 12
+            else:
+                out.append(chr(code))
+                i += 6
+
+        self._pos = i
+        return "".join(out)
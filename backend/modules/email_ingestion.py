@@ -0,0 +1,315 @@
+"""
+Worker assíncrono de ingestão de emails do Gmail
+Executa listagem, download e inserção no banco fora do caminho da requisição,
+com um número limitado de requisições simultâneas
+"""
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    from ..config import settings
+    from ..database import db
+    from .gmail_client import gmail_client
+    from .near_duplicates import signature_fields, find_near_duplicate, duplicate_fields
+    from .minhash import minhash
+    from .single_flight import single_flight
+except ImportError:
+    from config import settings
+    from database import db
+    from modules.gmail_client import gmail_client
+    from modules.near_duplicates import signature_fields, find_near_duplicate, duplicate_fields
+    from modules.minhash import minhash
+    from modules.single_flight import single_flight
+
+logger = logging.getLogger(__name__)
+
+
+def compute_email_hash(sender: str, subject: str, content: str) -> str:
+    """Hash de deduplicação usado em todo o sistema"""
+    return hashlib.md5(f"{sender}{subject}{content}".encode()).hexdigest()
+
+
+# Resultados de store_gmail_email
+STORE_INSERTED = "inserted"
+STORE_EXISTS = "exists"
+STORE_FAILED = "failed"
+
+
+def store_gmail_email(email: Dict[str, Any]) -> Tuple[str, Optional[Dict]]:
+    """Insere um email do Gmail no email_cache se ainda não existir
+
+    Retorna (STORE_INSERTED, registro), (STORE_EXISTS, None) ou
+    (STORE_FAILED, None) quando o insert falhou (ex.: schema não aplicado):
+    nesse caso o email não está no banco e o historyId não pode avançar.
+    Quase duplicatas de um email recente são inseridas já vinculadas ao
+    original (status "duplicate"), sem entrar na fila de processamento.
+    """
+    email_hash = compute_email_hash(email['sender'], email['subject'], email['body'])
+
+    # Mesmo email em duas ingestões simultâneas: apenas uma verifica e insere
+    (status, record), shared = single_flight.do(f"email:{email_hash}", _insert_gmail_email, email, email_hash)
+    if shared and status == STORE_INSERTED:
+        return STORE_EXISTS, None
+    return status, record
+
+
+def _insert_gmail_email(email: Dict[str, Any], email_hash: str) -> Tuple[str, Optional[Dict]]:
+    # Verificar se já foi processado
+    if db.get_email_by_hash(email_hash):
+        return STORE_EXISTS, None
+
+    email_cache_data = {
+        "email_hash": email_hash,
+        "gmail_message_id": email['id'],
+        "sender": email['sender'],
+        "subject": email['subject'],
+        "content_text": email['body'],
+        "received_at": email.get('received_at') or datetime.now(),
+        "status": "pending"
+    }
+
+    if settings.NEAR_DUPLICATE_DETECTION:
+        signature = minhash(email['body'])
+        email_cache_data.update(signature_fields(signature))
+
+        original = find_near_duplicate(signature)
+        if original:
+            logger.info(f"♊ '{email['subject']}' é quase duplicata de {original['id']} (similaridade {original['similarity']:.2f})")
+            email_cache_data.update(duplicate_fields(original))
+
+    record = db.insert_email_cache(email_cache_data)
+    if not record:
+        logger.error(f"Falha ao gravar '{email['subject']}' ({email['id']}) no email_cache")
+        return STORE_FAILED, None
+    return STORE_INSERTED, record
+
+
+def replay_source(source, store: bool = True) -> Dict[str, Any]:
+    """Executa uma fonte de emails pelo pipeline de ingestão e mede o tempo
+
+    Com store=False apenas parseia e calcula os hashes (útil em CI sem banco).
+    """
+    stats = {
+        "source": source.name,
+        "messages": 0,
+        "inserted": 0,
+        "duplicates": 0,
+        "store_errors": 0,
+        "empty_bodies": 0,
+        "parse_seconds": 0.0,
+        "store_seconds": 0.0
+    }
+
+    started = time.perf_counter()
+    emails = source.iter_emails()
+
+    while True:
+        parse_started = time.perf_counter()
+        email = next(emails, None)
+        stats["parse_seconds"] += time.perf_counter() - parse_started
+        if email is None:
+            break
+
+        stats["messages"] += 1
+        if not email['body'].strip():
+            stats["empty_bodies"] += 1
+
+        store_started = time.perf_counter()
+        if store:
+            status, _ = store_gmail_email(email)
+            if status == STORE_INSERTED:
+                stats["inserted"] += 1
+            elif status == STORE_EXISTS:
+                stats["duplicates"] += 1
+            else:
+                stats["store_errors"] += 1
+        else:
+            compute_email_hash(email['sender'], email['subject'], email['body'])
+        stats["store_seconds"] += time.perf_counter() - store_started
+
+    stats["elapsed_seconds"] = time.perf_counter() - started
+    stats["messages_per_second"] = stats["messages"] / stats["elapsed_seconds"] if stats["elapsed_seconds"] else 0.0
+    return stats
+
+
+class EmailIngestionWorker:
+    """Pipeline assíncrono: listagem → download em lote → inserção no banco
+
+    As chamadas ao Gmail e ao Supabase são síncronas e rodam em threads via
+    asyncio.to_thread, então o event loop do uvicorn nunca fica bloqueado.
+    Cada fetcher usa seu próprio serviço Gmail (não são thread-safe).
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None, max_jobs_history: int = 20):
+        self.max_concurrency = max_concurrency or settings.GMAIL_INGEST_CONCURRENCY
+        self.max_jobs_history = max_jobs_history
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._current_job_id: Optional[str] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._rerun_request: Optional[Dict[str, Any]] = None
+
+    def start_job(self, days_back: int = 7, incremental: bool = True,
+                  trigger: str = "manual", rerun_if_running: bool = False) -> Dict[str, Any]:
+        """Agenda um job de ingestão e retorna imediatamente
+
+        Se já houver um job em execução, retorna esse job em vez de iniciar outro.
+        Com rerun_if_running=True (notificações push), um novo job é agendado
+        assim que o atual terminar, para não perder mensagens que chegaram
+        depois da listagem do job em andamento.
+        """
+        current = self.jobs.get(self._current_job_id) if self._current_job_id else None
+        if current and current["status"] in ("queued", "running"):
+            if rerun_if_running:
+                self._rerun_request = {"days_back": days_back, "incremental": incremental, "trigger": trigger}
+            return current
+
+        job = {
+            "id": str(uuid.uuid4()),
+            "status": "queued",
+            "trigger": trigger,
+            "days_back": days_back,
+            "incremental": incremental,
+            "max_concurrency": self.max_concurrency,
+            "pages_listed": 0,
+            "messages_fetched": 0,
+            "new_inserted": 0,
+            "duplicates_skipped": 0,
+            "errors": 0,
+            "in_flight": 0,
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None
+        }
+
+        self.jobs[job["id"]] = job
+        self._current_job_id = job["id"]
+        self._trim_history()
+
+        self._tasks[job["id"]] = asyncio.create_task(self._run_job(job))
+        logger.info(f"📥 Job de ingestão {job['id']} agendado")
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Retorna o progresso de um job"""
+        return self.jobs.get(job_id)
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """Lista os jobs mais recentes (mais novo primeiro)"""
+        return sorted(self.jobs.values(), key=lambda j: j["created_at"], reverse=True)
+
+    def _trim_history(self):
+        """Mantém apenas os últimos max_jobs_history jobs"""
+        if len(self.jobs) <= self.max_jobs_history:
+            return
+        finished = [j for j in self.list_jobs() if j["status"] in ("completed", "failed")]
+        for job in finished[self.max_jobs_history:]:
+            self.jobs.pop(job["id"], None)
+
+    async def _run_job(self, job: Dict[str, Any]):
+        """Executa o pipeline produtor/consumidores de um job"""
+        job["status"] = "running"
+        job["started_at"] = datetime.now().isoformat()
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_concurrency * 2)
+        inserted_ids: List[str] = []
+        sync_state: Dict[str, Any] = {}
+
+        try:
+            fetchers = [
+                asyncio.create_task(self._fetch_worker(job, queue, inserted_ids))
+                for _ in range(self.max_concurrency)
+            ]
+
+            try:
+                await self._produce_pages(job, queue, sync_state)
+            finally:
+                for _ in fetchers:
+                    await queue.put(None)
+                await asyncio.gather(*fetchers)
+
+            # Marcar como processado no Gmail (serviço principal, fora dos fetchers)
+            if inserted_ids:
+                await asyncio.to_thread(gmail_client.mark_many_as_processed, inserted_ids)
+
+            # historyId só avança com todas as páginas baixadas e gravadas sem erro
+            sync_state["errors"] = job["errors"]
+            await asyncio.to_thread(gmail_client.commit_history_id, sync_state)
+
+            job["status"] = "completed"
+            logger.info(
+                f"✅ Job de ingestão {job['id']} concluído: "
+                f"{job['new_inserted']} novos de {job['messages_fetched']} baixados"
+            )
+
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+            logger.error(f"❌ Erro no job de ingestão {job['id']}: {e}")
+
+        finally:
+            job["finished_at"] = datetime.now().isoformat()
+            self._tasks.pop(job["id"], None)
+
+            if self._rerun_request:
+                rerun, self._rerun_request = self._rerun_request, None
+                self.start_job(**rerun)
+
+    async def _produce_pages(self, job: Dict[str, Any], queue: asyncio.Queue, sync_state: Dict[str, Any]):
+        """Lista páginas de IDs novos sem bloquear o event loop"""
+        pages = gmail_client.iter_new_message_ids(
+            days_back=job["days_back"], incremental=job["incremental"], sync_state=sync_state
+        )
+
+        while True:
+            ids = await asyncio.to_thread(next, pages, None)
+            if ids is None:
+                break
+            job["pages_listed"] += 1
+            await queue.put(ids)
+
+    async def _fetch_worker(self, job: Dict[str, Any], queue: asyncio.Queue, inserted_ids: List[str]):
+        """Consome páginas da fila: baixa em lote e insere no banco"""
+        service = None
+
+        while True:
+            ids = await queue.get()
+            if ids is None:
+                break
+
+            job["in_flight"] += 1
+            try:
+                if service is None:
+                    service = await asyncio.to_thread(gmail_client.new_service)
+
+                # Só falhas temporárias contam como erro; 404 (mensagem apagada) é consumida
+                failed: List[str] = []
+                emails = await asyncio.to_thread(gmail_client._get_emails_details_batch, ids, service, failed)
+                job["messages_fetched"] += len(emails)
+                job["errors"] += len(failed)
+
+                for email in emails:
+                    if not gmail_client._matches_assessoria_terms(email):
+                        continue
+                    status, _ = await asyncio.to_thread(store_gmail_email, email)
+                    if status == STORE_INSERTED:
+                        job["new_inserted"] += 1
+                        inserted_ids.append(email['id'])
+                    elif status == STORE_EXISTS:
+                        job["duplicates_skipped"] += 1
+                    else:
+                        job["errors"] += 1
+
+            except Exception as e:
+                job["errors"] += len(ids)
+                logger.error(f"Erro ao processar página de {len(ids)} emails: {e}")
+            finally:
+                job["in_flight"] -= 1
+
+# Instância global
+ingestion_worker = EmailIngestionWorker()
@@ -0,0 +1,152 @@
+"""
+Fontes de ingestão de emails
+Abstrai de onde vêm os emails (Gmail ao vivo ou arquivos locais .eml/.mbox)
+para que todos passem pelo mesmo parsing, hash e inserção no email_cache
+"""
+import base64
+import email
+import hashlib
+import logging
+import mailbox
+import os
+import time
+from abc import ABC, abstractmethod
+from email.header import decode_header, make_header
+from email.message import Message
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+try:
+    from .gmail_client import gmail_client
+except ImportError:
+    from modules.gmail_client import gmail_client
+
+logger = logging.getLogger(__name__)
+
+
+class EmailSource(ABC):
+    """Interface comum das fontes de ingestão
+
+    Cada fonte produz emails no formato de GmailClient._parse_message:
+    id, sender, subject, body, received_at, thread_id e labels.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def iter_emails(self) -> Iterator[Dict[str, Any]]:
+        """Emails da fonte, um por vez"""
+
+
+class GmailSource(EmailSource):
+    """Emails novos de assessorias direto da conta Gmail"""
+
+    name = "gmail"
+
+    def __init__(self, client=None, days_back: int = 7, incremental: bool = True):
+        self.client = client or gmail_client
+        self.days_back = days_back
+        self.incremental = incremental
+
+    def iter_emails(self) -> Iterator[Dict[str, Any]]:
+        return self.client.iter_new_emails(days_back=self.days_back, incremental=self.incremental)
+
+
+class LocalMailboxSource(EmailSource):
+    """Reproduz um diretório de .eml, um arquivo .eml ou um arquivo .mbox
+
+    As mensagens são convertidas para o formato de payload da API Gmail e
+    passam pelo mesmo parsing do GmailClient, sem acesso à rede.
+    rate limita a vazão em mensagens por segundo (None = sem limite).
+    """
+
+    name = "local"
+
+    def __init__(self, path: str, rate: Optional[float] = None, limit: Optional[int] = None):
+        self.path = path
+        self.rate = rate
+        self.limit = limit
+
+    def iter_emails(self) -> Iterator[Dict[str, Any]]:
+        interval = 1.0 / self.rate if self.rate else 0.0
+        next_at = time.monotonic()
+        count = 0
+
+        for message_id, message in self._iter_raw_messages():
+            if self.limit is not None and count >= self.limit:
+                return
+
+            if interval:
+                delay = next_at - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_at = max(next_at, time.monotonic()) + interval
+
+            parsed = gmail_client._parse_message({
+                'id': message_id,
+                'threadId': None,
+                'labelIds': [],
+                'payload': message_to_gmail_payload(message)
+            })
+            if parsed:
+                count += 1
+                yield parsed
+
+    def _iter_raw_messages(self) -> Iterator[Tuple[str, Message]]:
+        """Lê as mensagens do caminho configurado, em ordem estável"""
+        if os.path.isdir(self.path):
+            for filename in sorted(os.listdir(self.path)):
+                if filename.lower().endswith('.eml'):
+                    yield self._read_eml(os.path.join(self.path, filename))
+        elif self.path.lower().endswith('.eml'):
+            yield self._read_eml(self.path)
+        else:
+            box = mailbox.mbox(self.path, create=False)
+            try:
+                for key, message in box.iteritems():
+                    yield _local_message_id(message, f"{self.path}:{key}"), message
+            finally:
+                box.close()
+
+    def _read_eml(self, file_path: str) -> Tuple[str, Message]:
+        with open(file_path, 'rb') as f:
+            message = email.message_from_binary_file(f)
+        return _local_message_id(message, file_path), message
+
+
+def message_to_gmail_payload(message: Message) -> Dict[str, Any]:
+    """Converte uma mensagem do pacote email no payload da API Gmail
+
+    Headers são decodificados (como a API faz) e os corpos das partes folha
+    são codificados em base64url em body.data.
+    """
+    payload = {
+        'mimeType': message.get_content_type(),
+        'filename': message.get_filename() or '',
+        'headers': [{'name': name, 'value': _decode_header_value(value)} for name, value in message.items()],
+        'body': {'size': 0}
+    }
+
+    if message.is_multipart():
+        payload['parts'] = [message_to_gmail_payload(part) for part in message.get_payload()]
+    else:
+        raw = message.get_payload(decode=True) or b''
+        payload['body'] = {
+            'size': len(raw),
+            'data': base64.urlsafe_b64encode(raw).decode('ascii')
+        }
+
+    return payload
+
+
+def _decode_header_value(value) -> str:
+    """Decodifica encoded-words (RFC 2047) de um header"""
+    try:
+        return str(make_header(decode_header(str(value))))
+    except Exception:
+        return str(value)
+
+
+def _local_message_id(message: Message, fallback: str) -> str:
+    """ID estável para mensagens locais, derivado do Message-ID ou do caminho"""
+    key = (message.get('Message-ID') or '').strip() or fallback
+    return "local-" + hashlib.md5(key.encode()).hexdigest()
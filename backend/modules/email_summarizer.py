@@ -0,0 +1,70 @@
+"""
+Resumo map-reduce de emails longos (press kits)
+Divide o email em partes por parágrafo, resume cada parte separadamente e
+junta os resumos no lugar do corpo do email no prompt editorial
+"""
+import re
+from typing import List
+
+try:
+    from .prompt_budget import TokenEstimator
+except ImportError:
+    from modules.prompt_budget import TokenEstimator
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+
+# Instrução fixa: o prompt de cada parte depende só do texto da parte, então
+# o cache de respostas funciona como cache por hash da parte
+CHUNK_SUMMARY_PROMPT = """Você está resumindo uma parte de um material de assessoria de imprensa enviado ao RecifeMais.
+
+Resuma o trecho abaixo em até 120 palavras, em português, preservando todos os fatos
+concretos: nomes, datas, horários, locais, endereços, preços, números, contatos e citações.
+Não invente nada e não comente sobre o trecho. Responda apenas com o resumo.
+
+TRECHO:
+"""
+
+
+def chunk_summary_prompt(chunk: str) -> str:
+    return CHUNK_SUMMARY_PROMPT + chunk.strip()
+
+
+def split_into_chunks(text: str, estimator: TokenEstimator, max_tokens: int) -> List[str]:
+    """Agrupa parágrafos em partes de até max_tokens
+
+    Parágrafos maiores que o limite são divididos em limite de token.
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+
+        tokens = estimator.count(paragraph)
+        if tokens > max_tokens:
+            pieces = estimator.split(paragraph, max_tokens)
+        else:
+            pieces = [paragraph]
+
+        for piece in pieces:
+            piece_tokens = tokens if len(pieces) == 1 else estimator.count(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def combine_summaries(summaries: List[str]) -> str:
+    """Etapa reduce: resumos na ordem do email, identificados por parte"""
+    total = len(summaries)
+    return "\n\n".join(
+        f"[Parte {index}/{total}] {summary.strip()}" for index, summary in enumerate(summaries, 1)
+    )
@@ -22,11 +22,13 @@ try:
     from ..database import db
     from .ai_processor import ai_processor
     from .wordpress_publisher import wp_publisher
+    from .single_flight import single_flight
 except ImportError:
     # Fallback para import absoluto (desenvolvimento)
     from database import db
     from modules.ai_processor import ai_processor
     from modules.wordpress_publisher import wp_publisher
+    from modules.single_flight import single_flight
 
 logger = logging.getLogger(__name__)
 
@@ -159,45 +161,28 @@ class EmailWorkflowManager:
             if email["workflow_stage"] != WorkflowStage.RECEIVED.value:
                 return {"success": False, "error": "Email já foi analisado"}
             
-            # Analisar com IA
-            content = f"{email['subject']}\n\n{email['content_text']}"
-            
-            # Análise de categoria e relevância
-            analysis = ai_processor.analyze_email_content(content)
-            
-            # Gerar conteúdo inicial se relevante
-            generated_content = None
-            if analysis.get("is_relevant", False):
-                generated_content = ai_processor.generate_content_from_email(content)
-            
-            # Preparar dados da análise
-            ai_analysis = {
-                "category": analysis.get("category", "geral"),
-                "confidence": analysis.get("confidence", 0.5),
-                "is_relevant": analysis.get("is_relevant", False),
-                "topics": analysis.get("topics", []),
-                "generated_content": generated_content,
-                "analysis_date": datetime.now().isoformat()
-            }
-            
-            # Atualizar email
-            update_result = self.db.client.from_("email_cache").update({
-                "workflow_stage": WorkflowStage.ANALYZED.value,
-                "ai_analysis": ai_analysis,
-                "updated_at": datetime.now().isoformat()
-            }).eq("id", email_id).execute()
-            
-            # Registrar ação
-            self._log_workflow_action(
-                email_id=email_id,
-                user_id=user_id,
-                action="analyze",
-                from_stage=WorkflowStage.RECEIVED,
-                to_stage=WorkflowStage.ANALYZED,
-                notes="Análise automática por IA concluída"
+            # Pedidos simultâneos de análise do mesmo email recebem o mesmo resultado
+            result, _ = single_flight.do(
+                f"analyze:{email.get('email_hash') or email_id}",
+                self._run_analysis, email, email_id, user_id
             )
+            return result
             
-            logger.info(f"📊 Email {email_id} analisado com sucesso")
+        except Exception as e:
+            logger.error(f"Erro ao analisar email: {e}")
+            return {"success": False, "error": str(e)}
+    
+    def _run_analysis(self, email: Dict, email_id: str, user_id: str) -> Dict:
+        """Executa a análise com IA e avança o email para ANALYZED"""
+        try:
+            # Analisar com IA (mesmo processamento editorial da ingestão)
+            content = f"{email['subject']}\n\n{email['content_text']}"
+            ai_result = ai_processor.process_email_content(content, email.get("email_hash"))
+            if not ai_result:
+                return {"success": False, "error": "Falha na análise com IA"}
+            
+            ai_analysis = self.build_ai_analysis(ai_result["parsed_response"])
+            self.save_analysis(email_id, user_id, ai_analysis)
             
             return {
                 "success": True,
@@ -209,6 +194,44 @@ class EmailWorkflowManager:
             logger.error(f"Erro ao analisar email: {e}")
             return {"success": False, "error": str(e)}
     
+    @staticmethod
+    def build_ai_analysis(parsed_response: Dict) -> Dict:
+        """Converte a resposta editorial do Gemini no formato de ai_analysis"""
+        try:
+            score = float(parsed_response.get("relevancia_score") or 0)
+        except (TypeError, ValueError):
+            score = 0.0
+        
+        return {
+            "category": parsed_response.get("categoria", "geral"),
+            "confidence": round(min(score / 10, 1.0), 2),
+            "is_relevant": score >= 7.0,
+            "topics": parsed_response.get("tags", []),
+            "generated_content": parsed_response,
+            "analysis_date": datetime.now().isoformat()
+        }
+    
+    def save_analysis(self, email_id: str, user_id: str, ai_analysis: Dict):
+        """Grava a análise e avança o email para ANALYZED"""
+        # Atualizar email
+        self.db.client.from_("email_cache").update({
+            "workflow_stage": WorkflowStage.ANALYZED.value,
+            "ai_analysis": ai_analysis,
+            "updated_at": datetime.now().isoformat()
+        }).eq("id", email_id).execute()
+        
+        # Registrar ação
+        self._log_workflow_action(
+            email_id=email_id,
+            user_id=user_id,
+            action="analyze",
+            from_stage=WorkflowStage.RECEIVED,
+            to_stage=WorkflowStage.ANALYZED,
+            notes="Análise automática por IA concluída"
+        )
+        
+        logger.info(f"📊 Email {email_id} analisado com sucesso")
+    
     def approve_content(self, email_id: str, user_id: str, user_feedback: Dict) -> Dict:
         """Aprovar conteúdo gerado (segunda etapa)"""
         try:
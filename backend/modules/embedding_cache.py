@@ -0,0 +1,175 @@
+"""
+Cache de embeddings: LRU em memória com orçamento em bytes e armazenamento
+persistente em SQLite. Vetores são guardados como float32 (array.array) em
+vez de listas de floats Python
+"""
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Sequence
+
+try:
+    from .sqlite_connections import ThreadLocalConnections
+except ImportError:
+    from modules.sqlite_connections import ThreadLocalConnections
+
+
+class EmbeddingCache:
+    """Cache LRU thread-safe limitado por bytes
+
+    Um vetor de 768 dimensões ocupa ~3 KB em float32, contra ~24 KB como
+    lista de floats Python. Ao exceder max_bytes, as entradas menos usadas
+    recentemente são removidas.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, array]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _entry_size(key: str, vector: array) -> int:
+        return sys.getsizeof(key) + sys.getsizeof(vector)
+
+    def get(self, key: str) -> Optional[List[float]]:
+        """Retorna o vetor como lista (ou None) e atualiza a ordem LRU"""
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return vector.tolist()
+
+    def put(self, key: str, embedding: Sequence[float]):
+        """Insere ou atualiza um vetor, removendo os menos usados se preciso"""
+        vector = array('f', embedding)
+        size = self._entry_size(key, vector)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= self._entry_size(key, previous)
+
+            self._entries[key] = vector
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                old_key, old_vector = self._entries.popitem(last=False)
+                self._bytes -= self._entry_size(old_key, old_vector)
+                self.evictions += 1
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores para monitoramento"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class PersistentEmbeddingStore:
+    """Armazenamento de embeddings em SQLite compartilhado entre workers
+
+    Chave: (modelo, task_type, hash do texto). Vetores float32 em BLOB.
+    O modo WAL permite leituras concorrentes de vários processos uvicorn
+    enquanto um deles escreve, e o arquivo sobrevive a deploys/restarts.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = ThreadLocalConnections(path).get
+        self._connection().execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                task_type TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (model, task_type, text_hash)
+            ) WITHOUT ROWID
+            """
+        )
+
+    def get_many(self, model: str, task_type: str, text_hashes: Sequence[str]) -> Dict[str, List[float]]:
+        """Busca vários vetores de uma vez; retorna apenas os encontrados"""
+        found: Dict[str, List[float]] = {}
+        hashes = list(dict.fromkeys(text_hashes))
+
+        # Respeitar o limite de parâmetros do SQLite
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._connection().execute(
+                f"SELECT text_hash, vector FROM embeddings "
+                f"WHERE model = ? AND task_type = ? AND text_hash IN ({placeholders})",
+                [model, task_type, *chunk]
+            ).fetchall()
+            for text_hash, blob in rows:
+                vector = array('f')
+                vector.frombytes(blob)
+                found[text_hash] = vector.tolist()
+
+        return found
+
+    def put_many(self, model: str, task_type: str, embeddings: Dict[str, Sequence[float]]):
+        """Grava vários vetores em uma única transação"""
+        if not embeddings:
+            return
+        now = time.time()
+        rows = []
+        for text_hash, embedding in embeddings.items():
+            vector = array('f', embedding)
+            rows.append((model, task_type, text_hash, len(vector), vector.tobytes(), now))
+
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings "
+                "(model, task_type, text_hash, dimensions, vector, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        """Total de vetores e tamanho do arquivo"""
+        count = self._connection().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {
+            "path": self.path,
+            "entries": count,
+            "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        }
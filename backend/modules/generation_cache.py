@@ -0,0 +1,146 @@
+"""
+Cache de respostas do Gemini
+Chave: (modelo, configuração de geração, hash do prompt normalizado).
+LRU em memória com TTL e, opcionalmente, persistência em SQLite
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    from .sqlite_connections import ThreadLocalConnections
+except ImportError:
+    from modules.sqlite_connections import ThreadLocalConnections
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Colapsa espaços: a indentação dos prompts em f-string não muda a resposta"""
+    return _WHITESPACE_RE.sub(" ", prompt).strip()
+
+
+def generation_key(model: str, generation_config: Dict[str, Any], prompt: str) -> str:
+    """Chave estável entre processos para uma chamada de geração"""
+    prompt_hash = hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+    config = json.dumps(generation_config, sort_keys=True)
+    return hashlib.sha256(f"{model}|{config}|{prompt_hash}".encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """Cache LRU thread-safe de respostas, com TTL e armazenamento opcional em disco
+
+    Cada entrada guarda o texto e os tokens/custo da chamada original, para
+    contabilizar a economia a cada acerto.
+    """
+
+    def __init__(self, max_entries: int, ttl: int, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.tokens_saved = 0
+        self.cost_saved = 0.0
+
+        if path:
+            self._connection = ThreadLocalConnections(path).get
+            self._connection().execute(
+                """
+                CREATE TABLE IF NOT EXISTS generations (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                ) WITHOUT ROWID
+                """
+            )
+
+    def _remember(self, key: str, created_at: float, entry: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (created_at, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _load(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        row = self._connection().execute(
+            "SELECT response, created_at FROM generations WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[1], json.loads(row[0])
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Resposta em cache (memória, depois disco) ou None se ausente/expirada"""
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+
+        if cached is None and self.path:
+            cached = self._load(key)
+            if cached is not None:
+                self._remember(key, *cached)
+
+        if cached is None or time.time() - cached[0] > self.ttl:
+            with self._lock:
+                if cached is not None:
+                    self._entries.pop(key, None)
+                self.misses += 1
+            return None
+
+        entry = cached[1]
+        with self._lock:
+            self.hits += 1
+            self.tokens_saved += entry.get("tokens_input", 0) + entry.get("tokens_output", 0)
+            self.cost_saved += entry.get("cost_usd", 0.0)
+        return entry
+
+    def put(self, key: str, entry: Dict[str, Any]):
+        """Grava uma resposta; no disco, remove periodicamente as expiradas"""
+        now = time.time()
+        self._remember(key, now, entry)
+
+        if self.path:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO generations (key, response, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(entry), now)
+            )
+            self._puts += 1
+            if self._puts % 100 == 0:
+                conn.execute("DELETE FROM generations WHERE created_at < ?", (now - self.ttl,))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.path:
+            self._connection().execute("DELETE FROM generations")
+
+    def stats(self) -> Dict[str, Any]:
+        """Acertos, economia de tokens/custo e ocupação"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "tokens_saved": self.tokens_saved,
+                "cost_saved_usd": round(self.cost_saved, 6)
+            }
+        if self.path:
+            stats["persistent_entries"] = self._connection().execute("SELECT COUNT(*) FROM generations").fetchone()[0]
+        return stats
@@ -4,8 +4,12 @@ Cliente Gmail com OAuth2 para processamento de emails
 import os
 import pickle
 import base64
+import re
+import time
+import unicodedata
+from html import unescape
 from email.mime.text import MIMEText
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 import logging
 from datetime import datetime, timedelta
 
@@ -21,11 +25,64 @@ from googleapiclient.errors import HttpError
 # Import com fallback para desenvolvimento e produção
 try:
     from ..config import settings
+    from .rate_limiter import rate_limiter, error_status, backoff_delay, RETRYABLE_STATUS
 except ImportError:
     from config import settings
+    from modules.rate_limiter import rate_limiter, error_status, backoff_delay, RETRYABLE_STATUS
 
 logger = logging.getLogger(__name__)
 
+# Limite recomendado pela API Gmail para requisições em lote
+GMAIL_BATCH_SIZE = 50
+
+# Limite de IDs por chamada de messages.batchModify
+GMAIL_BATCH_MODIFY_SIZE = 1000
+
+# Custo em unidades de quota de cada método da API Gmail
+GMAIL_QUOTA_COST = {
+    'getProfile': 1,
+    'labels.list': 1,
+    'labels.create': 5,
+    'history.list': 2,
+    'messages.list': 5,
+    'messages.get': 5,
+    'messages.batchModify': 50,
+    'watch': 100
+}
+
+# Label adicionado aos emails já ingeridos
+PROCESSED_LABEL_NAME = "PROCESSED"
+
+# Chave em system_config com o último historyId sincronizado
+GMAIL_HISTORY_CONFIG_KEY = "gmail_last_history_id"
+
+# Termos comuns em emails de assessoria
+ASSESSORIA_TERMS = [
+    "assessoria",
+    "imprensa",
+    "comunicação",
+    "release",
+    "nota à imprensa",
+    "convite para cobertura",
+    "evento",
+    "prefeitura",
+    "governo",
+    "secretaria"
+]
+
+
+def _fold_accents(text: str) -> str:
+    """Remove acentos e normaliza caixa para comparação de termos"""
+    normalized = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in normalized if not unicodedata.combining(c))
+
+
+_FOLDED_ASSESSORIA_TERMS = [_fold_accents(term) for term in ASSESSORIA_TERMS]
+
+_HTML_BLOCK_TAGS = ["p", "div", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "table", "blockquote"]
+
+_CHARSET_RE = re.compile(r'charset\s*=\s*"?([^";\s]+)"?', re.IGNORECASE)
+
 class GmailClient:
     def __init__(self):
         self.service = None
@@ -37,6 +94,8 @@ class GmailClient:
         ]
         self.token_file = 'gmail_token.pickle'
         self.credentials_file = 'gmail_credentials.json'
+        # Cache de labels: nome -> (id, momento da resolução)
+        self._label_cache: Dict[str, Tuple[str, float]] = {}
     
     def get_authorization_url(self) -> str:
         """Gera URL de autorização OAuth"""
@@ -235,7 +294,7 @@ class GmailClient:
             self.service = build('gmail', 'v1', credentials=self.credentials)
             
             # Testar conexão
-            profile = self.service.users().getProfile(userId='me').execute()
+            profile = rate_limiter.execute('gmail', self.service.users().getProfile(userId='me'), cost=GMAIL_QUOTA_COST['getProfile'])
             logger.info(f"Autenticado com Gmail: {profile.get('emailAddress')}")
             return True
             
@@ -243,72 +302,424 @@ class GmailClient:
             logger.error(f"Erro na autenticação Gmail: {e}")
             return False
     
-    def get_recent_emails(self, query: str = "", max_results: int = 50) -> List[Dict[str, Any]]:
-        """Busca emails recentes"""
+    def get_recent_emails(self, query: str = "", max_results: int = 50, use_batch: bool = True) -> List[Dict[str, Any]]:
+        """Busca emails recentes (em lote por padrão)"""
         if not self.service:
             logger.error("Serviço Gmail não autenticado")
             return []
         
+        # Buscar emails dos últimos 7 dias por padrão
+        if not query:
+            week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y/%m/%d')
+            query = f"after:{week_ago}"
+        
+        emails = []
         try:
-            # Buscar emails dos últimos 7 dias por padrão
-            if not query:
-                week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y/%m/%d')
-                query = f"after:{week_ago}"
+            for email_data in self.iter_messages(query, max_results=max_results, use_batch=use_batch):
+                emails.append(email_data)
+        except HttpError as e:
+            logger.error(f"Erro ao buscar emails: {e}")
+        
+        logger.info(f"Encontrados {len(emails)} emails")
+        return emails
+    
+    def iter_message_ids(self, query: str, page_size: int = 100, max_results: Optional[int] = None) -> Iterator[List[str]]:
+        """Percorre todas as páginas de messages().list seguindo nextPageToken
+        
+        Produz uma lista de IDs por página; a próxima página só é requisitada
+        quando o consumidor termina de processar a atual.
+        """
+        page_token = None
+        remaining = max_results
+        
+        while True:
+            if remaining is not None and remaining <= 0:
+                return
             
-            results = self.service.users().messages().list(
+            request_size = page_size if remaining is None else min(page_size, remaining)
+            results = rate_limiter.execute('gmail', self.service.users().messages().list(
                 userId='me',
                 q=query,
-                maxResults=max_results
-            ).execute()
-            
-            messages = results.get('messages', [])
-            emails = []
+                maxResults=request_size,
+                pageToken=page_token
+            ), cost=GMAIL_QUOTA_COST['messages.list'])
             
-            for message in messages:
-                email_data = self._get_email_details(message['id'])
-                if email_data:
-                    emails.append(email_data)
+            ids = [m['id'] for m in results.get('messages', [])]
+            if remaining is not None:
+                ids = ids[:remaining]
+                remaining -= len(ids)
             
-            logger.info(f"Encontrados {len(emails)} emails")
-            return emails
+            if ids:
+                yield ids
             
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return
+    
+    def iter_messages(self, query: str, page_size: int = GMAIL_BATCH_SIZE,
+                      max_results: Optional[int] = None, use_batch: bool = True,
+                      skip_known: bool = False) -> Iterator[Dict[str, Any]]:
+        """Gera emails já parseados, página por página
+        
+        Cada página de IDs é baixada em lote e seus emails são entregues antes
+        da próxima página ser listada, permitindo processar os primeiros
+        resultados enquanto o restante ainda não foi baixado.
+        
+        Com skip_known=True, os IDs de cada página são conferidos no banco em
+        uma única consulta e o corpo completo só é baixado para mensagens novas.
+        """
+        if not self.service:
+            logger.error("Serviço Gmail não autenticado")
+            return
+        
+        for ids in self.iter_message_ids(query, page_size=page_size, max_results=max_results):
+            if skip_known:
+                ids = self._filter_known_message_ids(ids)
+                if not ids:
+                    continue
+            
+            if use_batch:
+                yield from self._get_emails_details_batch(ids)
+            else:
+                for message_id in ids:
+                    email_data = self._get_email_details(message_id)
+                    if email_data:
+                        yield email_data
+    
+    def get_emails_from_assessorias(self, days_back: int = 7, max_results: Optional[int] = 100,
+                                    skip_known: bool = False) -> List[Dict[str, Any]]:
+        """Busca emails específicos de assessorias de imprensa"""
+        if not self.service:
+            logger.error("Serviço Gmail não autenticado")
+            return []
+        
+        emails = []
+        try:
+            emails.extend(self.iter_emails_from_assessorias(days_back, max_results=max_results, skip_known=skip_known))
         except HttpError as e:
             logger.error(f"Erro ao buscar emails: {e}")
+        
+        logger.info(f"Encontrados {len(emails)} emails de assessorias")
+        return emails
+    
+    def iter_emails_from_assessorias(self, days_back: int = 7, max_results: Optional[int] = None,
+                                     skip_known: bool = False) -> Iterator[Dict[str, Any]]:
+        """Versão em streaming de get_emails_from_assessorias (todas as páginas)"""
+        return self.iter_messages(self._assessorias_query(days_back), max_results=max_results, skip_known=skip_known)
+    
+    def _filter_known_message_ids(self, message_ids: List[str]) -> List[str]:
+        """Remove IDs de mensagens que já estão no email_cache"""
+        try:
+            from ..database import db
+        except ImportError:
+            from database import db
+        
+        known = db.get_existing_gmail_message_ids(message_ids)
+        if known:
+            logger.info(f"{len(known)} de {len(message_ids)} emails já estão no cache, ignorando download")
+        return [mid for mid in message_ids if mid not in known]
+    
+    def _assessorias_query(self, days_back: int) -> str:
+        """Monta a query Gmail para emails de assessorias"""
+        date_filter = (datetime.now() - timedelta(days=days_back)).strftime('%Y/%m/%d')
+        terms_query = " OR ".join([f'"{term}"' for term in ASSESSORIA_TERMS])
+        return f"after:{date_filter} AND ({terms_query})"
+    
+    def sync_emails_from_assessorias(self, days_back: int = 7, incremental: bool = True,
+                                     sync_state: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Sincronização incremental de emails de assessorias
+        
+        Usa o último historyId salvo em system_config para buscar apenas as
+        mensagens adicionadas desde a última sincronização. Sem historyId
+        salvo, ou quando ele expirou, faz a varredura completa de days_back dias.
+        
+        O historyId não é salvo aqui: depois de gravar todos os emails, o
+        chamador passa sync_state para commit_history_id.
+        """
+        if not self.service:
+            logger.error("Serviço Gmail não autenticado")
             return []
+        
+        emails = []
+        try:
+            emails.extend(self.iter_new_emails(days_back=days_back, incremental=incremental, sync_state=sync_state))
+        except HttpError as e:
+            logger.error(f"Erro ao sincronizar emails: {e}")
+            if sync_state is not None:
+                sync_state.pop("history_id", None)
+        
+        logger.info(f"Sincronização: {len(emails)} novos emails de assessoria")
+        return emails
     
-    def get_emails_from_assessorias(self, days_back: int = 7) -> List[Dict[str, Any]]:
-        """Busca emails específicos de assessorias de imprensa"""
+    def iter_new_emails(self, days_back: int = 7, incremental: bool = True,
+                        sync_state: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """Versão em streaming de sync_emails_from_assessorias
         
-        # Termos comuns em emails de assessoria
-        assessoria_terms = [
-            "assessoria",
-            "imprensa", 
-            "comunicação",
-            "release",
-            "nota à imprensa",
-            "convite para cobertura",
-            "evento",
-            "prefeitura",
-            "governo",
-            "secretaria"
-        ]
+        Emails com falha temporária no download (429/5xx, erro de rede) são
+        somados em sync_state["errors"]; mensagens apagadas (404) ou
+        ilegíveis contam como consumidas e não seguram o historyId.
+        """
+        if sync_state is not None:
+            sync_state.setdefault("errors", 0)
+        for ids in self.iter_new_message_ids(days_back=days_back, incremental=incremental, sync_state=sync_state):
+            failed: List[str] = []
+            emails = self._get_emails_details_batch(ids, failed=failed)
+            if sync_state is not None:
+                sync_state["errors"] += len(failed)
+            for email in emails:
+                if self._matches_assessoria_terms(email):
+                    yield email
+    
+    def iter_new_message_ids(self, days_back: int = 7, incremental: bool = True,
+                             sync_state: Optional[Dict[str, Any]] = None) -> Iterator[List[str]]:
+        """Gera páginas de IDs de mensagens novas (ainda fora do email_cache)
         
-        # Construir query
-        date_filter = (datetime.now() - timedelta(days=days_back)).strftime('%Y/%m/%d')
-        terms_query = " OR ".join([f'"{term}"' for term in assessoria_terms])
-        query = f"after:{date_filter} AND ({terms_query})"
+        Com incremental=True usa users.history.list a partir do historyId salvo;
+        sem historyId, ou quando ele expirou, lista a query de assessorias.
+        
+        Nada é salvo aqui: ao fim da listagem, o historyId capturado fica em
+        sync_state["history_id"]. As páginas ainda precisam ser baixadas e
+        gravadas, então só o consumidor sabe quando chamar commit_history_id.
+        """
+        try:
+            from ..database import db
+        except ImportError:
+            from database import db
+        
+        start_history_id = db.get_system_config(GMAIL_HISTORY_CONFIG_KEY) if incremental else None
+        
+        if start_history_id:
+            result = self._list_history_message_ids(str(start_history_id))
+            if result is not None:
+                message_ids, latest_history_id = result
+                message_ids = self._filter_known_message_ids(message_ids) if message_ids else []
+                for start in range(0, len(message_ids), GMAIL_BATCH_SIZE):
+                    yield message_ids[start:start + GMAIL_BATCH_SIZE]
+                if latest_history_id and sync_state is not None:
+                    sync_state["history_id"] = latest_history_id
+                return
+            logger.warning("historyId expirado, executando varredura completa")
+        
+        # Capturar o historyId antes da varredura para não perder mensagens
+        # que cheguem durante a busca
+        try:
+            profile = rate_limiter.execute('gmail', self.service.users().getProfile(userId='me'), cost=GMAIL_QUOTA_COST['getProfile'])
+            latest_history_id = profile.get('historyId')
+        except HttpError as e:
+            logger.error(f"Erro ao obter historyId atual: {e}")
+            latest_history_id = None
+        
+        for message_ids in self.iter_message_ids(self._assessorias_query(days_back), page_size=GMAIL_BATCH_SIZE):
+            message_ids = self._filter_known_message_ids(message_ids)
+            if message_ids:
+                yield message_ids
+        
+        if latest_history_id and sync_state is not None:
+            sync_state["history_id"] = str(latest_history_id)
+    
+    def _list_history_message_ids(self, start_history_id: str) -> Optional[Tuple[List[str], Optional[str]]]:
+        """Lista IDs adicionados desde start_history_id via users.history.list
+        
+        Retorna (ids, novo_history_id) ou None se o historyId expirou
+        (HTTP 404), sinalizando que é necessária uma varredura completa.
+        """
+        message_ids: List[str] = []
+        seen = set()
+        latest_history_id = None
+        page_token = None
+        
+        try:
+            while True:
+                response = rate_limiter.execute('gmail', self.service.users().history().list(
+                    userId='me',
+                    startHistoryId=start_history_id,
+                    historyTypes=['messageAdded'],
+                    labelId='INBOX',
+                    pageToken=page_token
+                ), cost=GMAIL_QUOTA_COST['history.list'])
+                
+                for record in response.get('history', []):
+                    for added in record.get('messagesAdded', []):
+                        message_id = added.get('message', {}).get('id')
+                        if message_id and message_id not in seen:
+                            seen.add(message_id)
+                            message_ids.append(message_id)
+                
+                latest_history_id = response.get('historyId', latest_history_id)
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+                
+        except HttpError as e:
+            if e.resp.status == 404:
+                return None
+            logger.error(f"Erro ao buscar histórico do Gmail: {e}")
+            return [], None
         
-        return self.get_recent_emails(query, max_results=100)
+        return message_ids, str(latest_history_id) if latest_history_id else None
+    
+    def commit_history_id(self, sync_state: Dict[str, Any]) -> bool:
+        """Salva o historyId de uma sincronização cujos emails já foram gravados
+        
+        Com qualquer falha temporária (download ou gravação) o historyId não
+        avança: a próxima sincronização lista de novo a partir do anterior e
+        as mensagens já gravadas são descartadas pelo filtro do email_cache.
+        """
+        history_id = sync_state.get("history_id")
+        if not history_id:
+            return False
+        if sync_state.get("errors"):
+            logger.warning(f"historyId mantido: {sync_state['errors']} emails falharam e serão buscados de novo")
+            return False
+        self._save_history_id(history_id)
+        return True
+    
+    def _save_history_id(self, history_id: str):
+        """Persiste o último historyId sincronizado em system_config"""
+        try:
+            from ..database import db
+        except ImportError:
+            from database import db
+        
+        db.set_system_config(GMAIL_HISTORY_CONFIG_KEY, history_id, "Último historyId sincronizado do Gmail")
+    
+    def watch(self, topic_name: str) -> Optional[Dict[str, Any]]:
+        """Registra notificações push do Gmail em um tópico Pub/Sub
+        
+        O registro expira em 7 dias e precisa ser renovado. Se ainda não houver
+        historyId salvo, usa o retornado pelo watch como ponto de partida.
+        """
+        try:
+            from ..database import db
+        except ImportError:
+            from database import db
+        
+        try:
+            response = rate_limiter.execute('gmail', self.service.users().watch(
+                userId='me',
+                body={
+                    'topicName': topic_name,
+                    'labelIds': ['INBOX'],
+                    'labelFilterBehavior': 'include'
+                }
+            ), cost=GMAIL_QUOTA_COST['watch'])
+            
+            if response.get('historyId') and not db.get_system_config(GMAIL_HISTORY_CONFIG_KEY):
+                self._save_history_id(str(response['historyId']))
+            
+            logger.info(f"Push Gmail registrado em {topic_name} até {response.get('expiration')}")
+            return response
+            
+        except Exception as e:
+            logger.error(f"Erro ao registrar push do Gmail: {e}")
+            return None
+    
+    def _matches_assessoria_terms(self, email: Dict[str, Any]) -> bool:
+        """Aplica localmente o mesmo filtro de termos da query de assessorias
+        
+        A comparação ignora acentos e caixa, como a busca do Gmail.
+        """
+        text = _fold_accents(f"{email.get('sender', '')} {email.get('subject', '')} {email.get('body', '')}")
+        return any(term in text for term in _FOLDED_ASSESSORIA_TERMS)
+    
+    def new_service(self):
+        """Cria um serviço Gmail independente para uso em outra thread
+        
+        Os objetos de serviço do googleapiclient não são thread-safe.
+        """
+        return build('gmail', 'v1', credentials=self.credentials, cache_discovery=False)
     
     def _get_email_details(self, message_id: str) -> Optional[Dict[str, Any]]:
         """Extrai detalhes completos de um email"""
         try:
-            message = self.service.users().messages().get(
+            message = rate_limiter.execute('gmail', self.service.users().messages().get(
                 userId='me',
                 id=message_id,
                 format='full'
-            ).execute()
+            ), cost=GMAIL_QUOTA_COST['messages.get'])
+            
+            return self._parse_message(message)
             
+        except Exception as e:
+            logger.error(f"Erro ao extrair detalhes do email {message_id}: {e}")
+            return None
+    
+    def _get_emails_details_batch(self, message_ids: List[str], service=None,
+                                  failed: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Extrai detalhes de vários emails usando o endpoint batch da API Gmail
+        
+        Agrupa até GMAIL_BATCH_SIZE mensagens por requisição HTTP. Falhas são
+        isoladas por item: um email com erro não descarta o restante do lote.
+        A ordem de retorno segue a ordem de message_ids.
+        
+        failed recebe os IDs com falha temporária (429/5xx esgotadas as novas
+        tentativas, erro de rede no lote), que podem ser buscados de novo.
+        Erros definitivos (ex.: 404 de mensagem apagada) e mensagens que não
+        puderam ser lidas são apenas registrados no log.
+        """
+        service = service or self.service
+        results: Dict[str, Dict[str, Any]] = {}
+        retryable: List[str] = []
+        unreachable = set()
+        
+        def _callback(request_id, response, exception):
+            if exception is not None:
+                # 429/5xx por item são refeitos em um novo lote com backoff
+                if error_status(exception) in RETRYABLE_STATUS:
+                    retryable.append(request_id)
+                else:
+                    logger.error(f"Erro ao extrair detalhes do email {request_id}: {exception}")
+                return
+            try:
+                email_data = self._parse_message(response)
+                if email_data:
+                    results[request_id] = email_data
+            except Exception as e:
+                logger.error(f"Erro ao processar email {request_id}: {e}")
+        
+        pending = list(message_ids)
+        attempt = 0
+        
+        while pending:
+            for start in range(0, len(pending), GMAIL_BATCH_SIZE):
+                chunk = pending[start:start + GMAIL_BATCH_SIZE]
+                batch = service.new_batch_http_request(callback=_callback)
+                
+                for message_id in chunk:
+                    batch.add(
+                        service.users().messages().get(
+                            userId='me',
+                            id=message_id,
+                            format='full'
+                        ),
+                        request_id=message_id
+                    )
+                
+                try:
+                    rate_limiter.call('gmail', batch.execute, cost=GMAIL_QUOTA_COST['messages.get'] * len(chunk))
+                except Exception as e:
+                    logger.error(f"Erro ao executar lote de {len(chunk)} emails: {e}")
+                    unreachable.update(mid for mid in chunk if mid not in results and mid not in retryable)
+            
+            if not retryable:
+                break
+            if attempt >= settings.RATE_LIMIT_MAX_RETRIES:
+                logger.error(f"{len(retryable)} emails descartados após {attempt} novas tentativas")
+                unreachable.update(retryable)
+                break
+            
+            pending, retryable[:] = list(retryable), []
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+        
+        if failed is not None:
+            failed.extend(mid for mid in message_ids if mid in unreachable and mid not in results)
+        return [results[mid] for mid in message_ids if mid in results]
+    
+    def _parse_message(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Converte uma mensagem da API Gmail no formato interno"""
+        message_id = message.get('id')
+        try:
             headers = message['payload'].get('headers', [])
             
             # Extrair headers importantes
@@ -337,27 +748,98 @@ class GmailClient:
             return None
     
     def _extract_email_body(self, payload: Dict) -> str:
-        """Extrai o corpo do email"""
-        body = ""
-        
-        if 'parts' in payload:
-            for part in payload['parts']:
-                if part['mimeType'] == 'text/plain':
-                    data = part['body'].get('data', '')
-                    if data:
-                        body = base64.urlsafe_b64decode(data).decode('utf-8')
-                        break
-                elif part['mimeType'] == 'text/html' and not body:
-                    data = part['body'].get('data', '')
-                    if data:
-                        body = base64.urlsafe_b64decode(data).decode('utf-8')
-        else:
-            if payload['mimeType'] == 'text/plain':
-                data = payload['body'].get('data', '')
-                if data:
-                    body = base64.urlsafe_b64decode(data).decode('utf-8')
-        
-        return body
+        """Extrai o corpo do email percorrendo toda a árvore MIME
+        
+        Caminha iterativamente (em profundidade, na ordem do documento) por
+        multiparts aninhados, como multipart/alternative dentro de
+        multipart/mixed. Retorna o primeiro text/plain não vazio; sem ele,
+        converte o primeiro text/html em texto. Anexos não são decodificados.
+        """
+        html_part = None
+        stack = [payload]
+        
+        while stack:
+            part = stack.pop()
+            
+            sub_parts = part.get('parts')
+            if sub_parts:
+                # Empilhar em ordem reversa para visitar na ordem original
+                stack.extend(reversed(sub_parts))
+                continue
+            
+            if self._is_attachment(part):
+                continue
+            
+            mime_type = part.get('mimeType', '')
+            if mime_type == 'text/plain':
+                text = self._decode_part_body(part)
+                if text.strip():
+                    return text
+            elif mime_type == 'text/html' and html_part is None:
+                html_part = part
+        
+        if html_part is not None:
+            return self._html_to_text(self._decode_part_body(html_part))
+        
+        return ""
+    
+    def _is_attachment(self, part: Dict) -> bool:
+        """Verifica se a parte MIME é um anexo"""
+        if part.get('filename'):
+            return True
+        if part.get('body', {}).get('attachmentId'):
+            return True
+        disposition = self._get_part_header(part, 'Content-Disposition')
+        return disposition.lower().startswith('attachment')
+    
+    def _get_part_header(self, part: Dict, name: str) -> str:
+        """Busca um header de uma parte MIME (case-insensitive)"""
+        name = name.lower()
+        for header in part.get('headers', []):
+            if header.get('name', '').lower() == name:
+                return header.get('value', '')
+        return ''
+    
+    def _decode_part_body(self, part: Dict) -> str:
+        """Decodifica o corpo base64url de uma parte respeitando o charset"""
+        data = part.get('body', {}).get('data', '')
+        if not data:
+            return ""
+        
+        raw = base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+        
+        charset = 'utf-8'
+        match = _CHARSET_RE.search(self._get_part_header(part, 'Content-Type'))
+        if match:
+            charset = match.group(1)
+        
+        try:
+            return raw.decode(charset, errors='replace')
+        except LookupError:
+            return raw.decode('utf-8', errors='replace')
+    
+    def _html_to_text(self, html: str) -> str:
+        """Converte HTML em texto preservando quebras de linha"""
+        try:
+            from bs4 import BeautifulSoup
+            
+            soup = BeautifulSoup(html, 'html.parser')
+            for tag in soup(["script", "style", "head"]):
+                tag.decompose()
+            for br in soup.find_all("br"):
+                br.replace_with("\n")
+            for block in soup.find_all(_HTML_BLOCK_TAGS):
+                block.append("\n")
+            text = soup.get_text()
+            
+        except ImportError:
+            # Fallback simples sem BeautifulSoup
+            text = re.sub(r'<(script|style)[^>]*>.*?</\1>', '', html, flags=re.S | re.I)
+            text = re.sub(r'<br\s*/?>|</(?:%s)>' % '|'.join(_HTML_BLOCK_TAGS), '\n', text, flags=re.I)
+            text = unescape(re.sub(r'<[^>]+>', '', text))
+        
+        lines = (line.strip() for line in text.splitlines())
+        return '\n'.join(line for line in lines if line)
     
     def _parse_email_date(self, date_str: str) -> datetime:
         """Converte string de data do email para datetime"""
@@ -369,45 +851,81 @@ class GmailClient:
     
     def mark_as_processed(self, message_id: str) -> bool:
         """Marca email como processado (adiciona label)"""
+        return self.mark_many_as_processed([message_id])
+    
+    def mark_many_as_processed(self, message_ids: List[str]) -> bool:
+        """Marca vários emails como processados com messages.batchModify"""
+        if not message_ids:
+            return True
+        
         try:
             # Criar label "PROCESSED" se não existir
-            self._ensure_processed_label()
+            label_id = self._ensure_processed_label()
+            if not label_id:
+                return False
             
-            self.service.users().messages().modify(
-                userId='me',
-                id=message_id,
-                body={'addLabelIds': ['PROCESSED']}
-            ).execute()
+            for start in range(0, len(message_ids), GMAIL_BATCH_MODIFY_SIZE):
+                rate_limiter.execute('gmail', self.service.users().messages().batchModify(
+                    userId='me',
+                    body={
+                        'ids': message_ids[start:start + GMAIL_BATCH_MODIFY_SIZE],
+                        'addLabelIds': [label_id]
+                    }
+                ), cost=GMAIL_QUOTA_COST['messages.batchModify'])
             
             return True
             
+        except HttpError as e:
+            # Label pode ter sido removido no Gmail; resolver de novo na próxima vez
+            self._label_cache.pop(PROCESSED_LABEL_NAME, None)
+            logger.error(f"Erro ao marcar {len(message_ids)} emails como processados: {e}")
+            return False
         except Exception as e:
-            logger.error(f"Erro ao marcar email como processado: {e}")
+            logger.error(f"Erro ao marcar {len(message_ids)} emails como processados: {e}")
             return False
     
-    def _ensure_processed_label(self):
-        """Garante que o label PROCESSED existe"""
+    def _ensure_processed_label(self) -> Optional[str]:
+        """Garante que o label PROCESSED existe e retorna seu ID"""
+        return self._get_label_id(PROCESSED_LABEL_NAME, create=True)
+    
+    def _get_label_id(self, name: str, create: bool = False) -> Optional[str]:
+        """Resolve o ID de um label pelo nome, com cache por CACHE_TTL segundos"""
+        cached = self._label_cache.get(name)
+        if cached and time.monotonic() - cached[1] < settings.CACHE_TTL:
+            return cached[0]
+        
         try:
-            labels = self.service.users().labels().list(userId='me').execute()
+            labels = rate_limiter.execute('gmail', self.service.users().labels().list(userId='me'), cost=GMAIL_QUOTA_COST['labels.list'])
             
+            # Aproveitar a listagem para atualizar todos os labels conhecidos
+            now = time.monotonic()
             for label in labels.get('labels', []):
-                if label['name'] == 'PROCESSED':
-                    return
+                self._label_cache[label['name']] = (label['id'], now)
+            
+            if name in self._label_cache:
+                return self._label_cache[name][0]
+            
+            if not create:
+                return None
             
             # Criar label
             label_object = {
-                'name': 'PROCESSED',
+                'name': name,
                 'messageListVisibility': 'hide',
                 'labelListVisibility': 'labelShow'
             }
             
-            self.service.users().labels().create(
+            label = rate_limiter.execute('gmail', self.service.users().labels().create(
                 userId='me',
                 body=label_object
-            ).execute()
+            ), cost=GMAIL_QUOTA_COST['labels.create'])
+            
+            self._label_cache[name] = (label['id'], time.monotonic())
+            return label['id']
             
         except Exception as e:
-            logger.error(f"Erro ao criar label PROCESSED: {e}")
+            logger.error(f"Erro ao resolver label {name}: {e}")
+            return None
 
 # Instância global
 gmail_client = GmailClient() 
\ No newline at end of file
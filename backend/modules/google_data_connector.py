@@ -18,9 +18,11 @@ from googleapiclient.errors import HttpError
 try:
     from ..config import settings
     from ..database import db
+    from .rate_limiter import rate_limiter
 except ImportError:
     from config import settings
     from database import db
+    from modules.rate_limiter import rate_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -201,10 +203,10 @@ class GoogleDataConnector:
                 'startRow': 0
             }
             
-            response = self.gsc_service.searchanalytics().query(
+            response = rate_limiter.execute('google_data', self.gsc_service.searchanalytics().query(
                 siteUrl=site_url,
                 body=request_body
-            ).execute()
+            ))
             
             # Processar dados
             rows = response.get('rows', [])
@@ -285,10 +287,10 @@ class GoogleDataConnector:
                 'limit': limit
             }
             
-            response = self.ga4_service.properties().runReport(
+            response = rate_limiter.execute('google_data', self.ga4_service.properties().runReport(
                 property=f"properties/{property_id}",
                 body=request_body
-            ).execute()
+            ))
             
             # Processar dados
             rows = response.get('rows', [])
@@ -429,7 +431,7 @@ class GoogleDataConnector:
                 # Testar GSC
                 if self.gsc_service:
                     try:
-                        sites = self.gsc_service.sites().list().execute()
+                        sites = rate_limiter.execute('google_data', self.gsc_service.sites().list())
                         status['gsc_connected'] = len(sites.get('siteEntry', [])) > 0
                     except:
                         status['gsc_connected'] = False
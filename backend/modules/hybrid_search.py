@@ -0,0 +1,210 @@
+"""
+Recuperação híbrida para o contexto RAG
+Combina a busca vetorial com a busca textual (tsvector em português) por
+Reciprocal Rank Fusion, com tempo medido e cache por email em cada etapa
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Constante k do RRF (valor usual da literatura; reduz o peso do topo de cada lista)
+RRF_K = 60
+
+# Sequências de palavras capitalizadas, aceitando conectivos ("Paço do Frevo")
+_PROPER_NOUN_RE = re.compile(
+    r"\b[A-ZÀ-Ý][\wÀ-ÿ'-]+(?:\s+(?:(?:d[aeo]s?|e)\s+)?[A-ZÀ-Ý][\wÀ-ÿ'-]+)*"
+)
+_WORD_RE = re.compile(r"[a-zà-ÿ]{6,}")
+
+# Palavras capitalizadas por início de frase ou cortesia, sem valor de busca
+_STOPWORDS = {
+    "para", "como", "mais", "sobre", "entre", "este", "esta", "esse", "essa",
+    "nesta", "neste", "nessa", "nesse", "pela", "pelo", "com", "uma", "que",
+    "atenciosamente", "olá", "prezados", "prezado", "prezada", "caro", "cara",
+    "assessoria", "imprensa", "release", "segunda", "terça", "quarta", "quinta",
+    "sexta", "sábado", "domingo", "janeiro", "fevereiro", "março", "abril",
+    "maio", "junho", "julho", "agosto", "setembro", "outubro", "novembro", "dezembro",
+}
+
+
+def build_text_query(text: str, max_terms: int = 12) -> Optional[str]:
+    """Monta uma consulta websearch_to_tsquery (termos unidos por OR)
+
+    Prioriza nomes próprios (locais, eventos, instituições) e completa com as
+    palavras longas mais frequentes. Unir por AND exigiria que todo termo do
+    email aparecesse no documento.
+    """
+    phrases = Counter()
+    for match in _PROPER_NOUN_RE.finditer(text):
+        phrase = " ".join(match.group(0).split())
+        if len(phrase) < 4 or phrase.lower() in _STOPWORDS:
+            continue
+        phrases[phrase] += 1
+
+    terms = [phrase for phrase, _ in phrases.most_common(max_terms)]
+
+    if len(terms) < max_terms:
+        words = Counter(
+            word for word in _WORD_RE.findall(text.lower())
+            if word not in _STOPWORDS
+        )
+        known = {term.lower() for term in terms}
+        for word, _ in words.most_common():
+            if len(terms) >= max_terms:
+                break
+            if word not in known:
+                terms.append(word)
+
+    if not terms:
+        return None
+
+    # Aspas viram frase exata; removê-las dos termos evita consultas malformadas
+    return " OR ".join(
+        f'"{term}"' if " " in term else term
+        for term in (term.replace('"', "") for term in terms)
+    )
+
+
+def _document_key(document: Dict[str, Any]) -> str:
+    """Identifica o documento nas duas listas (id, ou hash do conteúdo)"""
+    if document.get("id"):
+        return str(document["id"])
+    content = f"{document.get('source_url')}|{document.get('content_text')}"
+    return hashlib.md5(content.encode("utf-8")).hexdigest()
+
+
+def reciprocal_rank_fusion(result_lists: Dict[str, List[Dict[str, Any]]], limit: int,
+                           k: int = RRF_K) -> List[Dict[str, Any]]:
+    """Funde listas ranqueadas: score(d) = soma de 1 / (k + posição)
+
+    Só usa as posições, então similaridade de cosseno e ts_rank não
+    precisam estar na mesma escala.
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Dict[str, Any]] = {}
+
+    for source, results in result_lists.items():
+        for position, document in enumerate(results, start=1):
+            key = _document_key(document)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + position)
+            merged = documents.setdefault(key, {**document, "sources": []})
+            merged["sources"].append(source)
+            for field, value in document.items():
+                merged.setdefault(field, value)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)[:limit]
+    return [{**documents[key], "rrf_score": round(scores[key], 6)} for key in ranked]
+
+
+class RetrievalCache:
+    """Cache LRU com TTL para resultados de uma etapa, por hash do email"""
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, List[Dict]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, stage: str, key: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get((stage, key))
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._entries[(stage, key)]
+                return None
+            self._entries.move_to_end((stage, key))
+            return entry[1]
+
+    def put(self, stage: str, key: str, results: List[Dict[str, Any]]):
+        with self._lock:
+            self._entries[(stage, key)] = (time.monotonic(), results)
+            self._entries.move_to_end((stage, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class HybridRetriever:
+    """Executa as etapas de recuperação, mede cada uma e funde os resultados
+
+    Cada etapa é uma função (texto, limite) -> lista de documentos. O
+    resultado de cada etapa fica em cache pelo hash do email, então
+    reprocessar um email não gera de novo embedding nem consultas.
+    """
+
+    def __init__(self, stages: Dict[str, Callable[[str, int], List[Dict[str, Any]]]],
+                 candidates: int = 10, cache_size: int = 1000, cache_ttl: int = 3600):
+        self.stages = stages
+        self.candidates = candidates
+        self._cache = RetrievalCache(cache_size, cache_ttl)
+        self._stats: Dict[str, Dict[str, Any]] = {
+            name: {"calls": 0, "cache_hits": 0, "errors": 0, "total_ms": 0.0, "last_ms": None}
+            for name in [*stages, "fusion"]
+        }
+        self._lock = threading.Lock()
+
+    def _record(self, stage: str, elapsed_ms: Optional[float] = None, **increments):
+        with self._lock:
+            stats = self._stats[stage]
+            for field, value in increments.items():
+                stats[field] += value
+            if elapsed_ms is not None:
+                stats["total_ms"] += elapsed_ms
+                stats["last_ms"] = round(elapsed_ms, 2)
+
+    def _run_stage(self, name: str, text: str, cache_key: Optional[str]) -> List[Dict[str, Any]]:
+        if cache_key:
+            cached = self._cache.get(name, cache_key)
+            if cached is not None:
+                self._record(name, cache_hits=1)
+                return cached
+
+        started = time.perf_counter()
+        try:
+            results = self.stages[name](text, self.candidates) or []
+        except Exception as e:
+            self._record(name, (time.perf_counter() - started) * 1000, calls=1, errors=1)
+            logger.error(f"Erro na etapa de busca {name}: {e}")
+            return []
+
+        self._record(name, (time.perf_counter() - started) * 1000, calls=1)
+        if cache_key:
+            self._cache.put(name, cache_key, results)
+        return results
+
+    def retrieve(self, text: str, cache_key: Optional[str] = None, limit: int = 3) -> List[Dict[str, Any]]:
+        """Top-limit documentos fundidos de todas as etapas"""
+        result_lists = {name: self._run_stage(name, text, cache_key) for name in self.stages}
+
+        started = time.perf_counter()
+        fused = reciprocal_rank_fusion(result_lists, limit)
+        self._record("fusion", (time.perf_counter() - started) * 1000, calls=1)
+
+        logger.info(
+            "🔎 Recuperação híbrida: "
+            + ", ".join(f"{name}={len(results)}" for name, results in result_lists.items())
+            + f" → {len(fused)}"
+        )
+        return fused
+
+    def stats(self) -> Dict[str, Any]:
+        """Tempos e acertos de cache por etapa"""
+        with self._lock:
+            stages = {
+                name: {
+                    **stats,
+                    "total_ms": round(stats["total_ms"], 2),
+                    "avg_ms": round(stats["total_ms"] / stats["calls"], 2) if stats["calls"] else None
+                }
+                for name, stats in self._stats.items()
+            }
+        return {"stages": stages, "cached_results": len(self._cache), "candidates": self.candidates}
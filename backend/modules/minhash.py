@@ -0,0 +1,83 @@
+"""
+MinHash com LSH sobre trigramas de palavras
+Funções puras (sem banco nem configuração) usadas por near_duplicates.py
+para achar releases quase duplicados por similaridade de Jaccard
+"""
+import hashlib
+import random
+import re
+from typing import List, Optional, Set
+
+# 128 permutações em 32 faixas de 4 linhas: o limiar do LSH fica em
+# (1/32)^(1/4) ≈ 0.42 de Jaccard, abaixo do limiar de duplicata (0.6), então
+# pares a 0.6 viram candidatos com ~99% de chance e pares a 0.85 (rodapé
+# trocado em release de 300 palavras) praticamente sempre
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+
+# Palavras por shingle e mínimo de shingles para a assinatura ser confiável
+SHINGLE_SIZE = 3
+MIN_SHINGLES = 8
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Permutações fixas: a assinatura precisa ser estável entre processos e deploys
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+_URL_RE = re.compile(r"https?://\S+|www\.\S+|\S+@\S+")
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def shingles(text: str) -> Set[str]:
+    """Trigramas de palavras do texto normalizado (sem URLs e emails)"""
+    words = _WORD_RE.findall(_URL_RE.sub(" ", text.lower()))
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _hash64(value: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), "big")
+
+
+def _to_int32(value: int) -> int:
+    """Converte para o intervalo do INTEGER do Postgres"""
+    return value - (1 << 32) if value >= 1 << 31 else value
+
+
+def minhash(text: str) -> Optional[List[int]]:
+    """Assinatura MinHash (NUM_PERMUTATIONS inteiros de 32 bits com sinal)
+
+    Retorna None para textos curtos demais para comparar.
+    """
+    hashes = [_hash64(shingle.encode("utf-8")) for shingle in shingles(text)]
+    if len(hashes) < MIN_SHINGLES:
+        return None
+
+    return [
+        _to_int32(min(((a * value + b) % _MERSENNE_PRIME) & _MAX_HASH for value in hashes))
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def similarity(a: List[int], b: List[int]) -> float:
+    """Estimativa da similaridade de Jaccard entre dois textos"""
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERMUTATIONS
+
+
+def lsh_bands(signature: List[int]) -> List[int]:
+    """Hash de cada faixa de LSH_ROWS valores (coluna minhash_bands)
+
+    O índice da faixa entra no hash: valores iguais em faixas diferentes
+    não geram candidatos.
+    """
+    bands = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        key = f"{band}:" + ",".join(str(value) for value in rows)
+        bands.append(_to_int32(_hash64(key.encode("ascii")) & _MAX_HASH))
+    return bands
@@ -0,0 +1,69 @@
+"""
+Detecção de releases quase duplicados com MinHash LSH
+O mesmo release enviado por duas assessorias, ou com rodapé diferente, tem
+hash MD5 distinto mas trigramas quase todos em comum (Jaccard alto)
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+try:
+    from ..config import settings
+    from ..database import db
+    from .minhash import similarity, lsh_bands
+except ImportError:
+    from config import settings
+    from database import db
+    from modules.minhash import similarity, lsh_bands
+
+logger = logging.getLogger(__name__)
+
+
+def signature_fields(signature: Optional[List[int]]) -> Dict[str, Any]:
+    """Colunas do email_cache para a assinatura (vazio se não houver)"""
+    if signature is None:
+        return {}
+    return {"minhash": signature, "minhash_bands": lsh_bands(signature)}
+
+
+def find_near_duplicate(signature: Optional[List[int]], exclude_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Email recente mais parecido com a assinatura, acima da similaridade mínima
+
+    Candidatos são os emails que coincidem em ao menos uma faixa LSH; a
+    similaridade estimada de cada um decide. Retorna o original da cadeia
+    (se o candidato já é duplicata de outro email, o vínculo aponta para
+    esse outro), com a similaridade.
+    """
+    if signature is None or not settings.NEAR_DUPLICATE_DETECTION:
+        return None
+
+    since = (datetime.now() - timedelta(days=settings.NEAR_DUPLICATE_WINDOW_DAYS)).isoformat()
+    candidates = db.find_minhash_candidates(lsh_bands(signature), since)
+
+    best = None
+    for candidate in candidates:
+        if not candidate.get("minhash") or candidate["id"] == exclude_id:
+            continue
+        score = similarity(signature, candidate["minhash"])
+        if score >= settings.NEAR_DUPLICATE_MIN_SIMILARITY and (best is None or score > best["similarity"]):
+            best = {**candidate, "similarity": score}
+
+    if best is None:
+        return None
+
+    return {
+        "id": best.get("duplicate_of") or best["id"],
+        "subject": best.get("subject"),
+        "sender": best.get("sender"),
+        "similarity": best["similarity"]
+    }
+
+
+def duplicate_fields(original: Dict[str, Any]) -> Dict[str, Any]:
+    """Colunas que vinculam um email ao original em vez de processá-lo"""
+    return {
+        "status": "duplicate",
+        "duplicate_of": original["id"],
+        "duplicate_similarity": round(original["similarity"], 4),
+        "processed_at": datetime.now()
+    }
@@ -0,0 +1,124 @@
+"""
+Orçamento de tokens para prompts
+Estimador de tokens calibrado pela contagem real do Gemini e divisão do
+orçamento entre as seções do prompt, com truncamento em limite de token
+"""
+import math
+import threading
+from typing import Dict, Any, List, Optional
+
+import tiktoken
+
+# Marcador de texto cortado pelo orçamento
+TRUNCATION_MARK = " [...]"
+
+
+class TokenEstimator:
+    """Conta tokens localmente (tiktoken) corrigidos pela razão observada no Gemini
+
+    O tokenizador do Gemini não é o cl100k_base; a cada resposta, o
+    prompt_token_count do usage_metadata calibra a razão tokens_gemini /
+    tokens_locais (média móvel), sem chamadas extras à API. Contagens de
+    textos estáticos (contexto editorial) ficam em cache sem a razão
+    aplicada, para continuarem válidas quando ela muda.
+    """
+
+    def __init__(self, encoding_name: str = "cl100k_base", ratio: float = 1.0,
+                 smoothing: float = 0.1, min_ratio: float = 0.5, max_ratio: float = 2.0):
+        self.encoding = tiktoken.get_encoding(encoding_name)
+        self.ratio = ratio
+        self.smoothing = smoothing
+        self.min_ratio = min_ratio
+        self.max_ratio = max_ratio
+        self.samples = 0
+        self._static_counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _encode(self, text: str):
+        # Emails podem conter "<|endoftext|>"; é texto comum, não token especial
+        return self.encoding.encode(text, disallowed_special=())
+
+    def local_count(self, text: str) -> int:
+        """Tokens no cl100k_base, sem calibração"""
+        return len(self._encode(text)) if text else 0
+
+    def count(self, text: str) -> int:
+        """Estimativa de tokens do Gemini"""
+        return math.ceil(self.local_count(text) * self.ratio)
+
+    def count_static(self, text: str) -> int:
+        """Como count(), com a contagem local em cache (para textos fixos)"""
+        local = self._static_counts.get(text)
+        if local is None:
+            local = self.local_count(text)
+            self._static_counts[text] = local
+        return math.ceil(local * self.ratio)
+
+    def calibrate(self, local_tokens: int, model_tokens: int):
+        """Ajusta a razão com uma contagem real do Gemini"""
+        if local_tokens <= 0 or model_tokens <= 0:
+            return
+        observed = min(max(model_tokens / local_tokens, self.min_ratio), self.max_ratio)
+        with self._lock:
+            if self.samples == 0:
+                self.ratio = observed
+            else:
+                self.ratio += self.smoothing * (observed - self.ratio)
+            self.samples += 1
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Corta o texto em limite de token para caber em max_tokens (estimados)"""
+        tokens = self._encode(text)
+        if math.ceil(len(tokens) * self.ratio) <= max_tokens:
+            return text
+        if max_tokens <= 0:
+            return ""
+
+        mark_tokens = len(self._encode(TRUNCATION_MARK))
+        keep = max(int((max_tokens - mark_tokens * self.ratio) / self.ratio), 0)
+        # Um corte no meio de um caractere multibyte decodifica como U+FFFD
+        return self.encoding.decode(tokens[:keep]).rstrip("\ufffd") + TRUNCATION_MARK
+
+    def split(self, text: str, max_tokens: int) -> List[str]:
+        """Divide o texto em pedaços de até max_tokens (estimados), em limite de token"""
+        tokens = self._encode(text)
+        step = max(int(max_tokens / self.ratio), 1)
+        return [self.encoding.decode(tokens[start:start + step]) for start in range(0, len(tokens), step)]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ratio": round(self.ratio, 4),
+            "calibration_samples": self.samples,
+            "static_texts_cached": len(self._static_counts)
+        }
+
+
+def allocate_budget(budget: int, demands: Dict[str, int],
+                    weights: Optional[Dict[str, float]] = None) -> Dict[str, int]:
+    """Divide budget tokens entre seções proporcionalmente aos pesos
+
+    Nenhuma seção recebe mais do que pede (demands); a sobra das seções
+    que cabem inteiras é redistribuída entre as demais.
+    """
+    weights = weights or {}
+    allocation = {name: 0 for name in demands}
+    pending = {name for name, demand in demands.items() if demand > 0}
+    remaining = max(budget, 0)
+
+    while pending and remaining > 0:
+        total_weight = sum(weights.get(name, 1.0) for name in pending)
+        shares = {name: int(remaining * weights.get(name, 1.0) / total_weight) for name in pending}
+        satisfied = {name for name in pending if demands[name] <= shares[name]}
+
+        if not satisfied:
+            # Ninguém cabe inteiro: cada seção fica com sua parte
+            for name in pending:
+                allocation[name] = shares[name]
+            break
+
+        for name in satisfied:
+            allocation[name] = demands[name]
+            remaining -= demands[name]
+        pending -= satisfied
+
+    return allocation
@@ -0,0 +1,214 @@
+"""
+Controle de taxa compartilhado pelos clientes de APIs Google
+Token bucket por API, com retry e backoff exponencial com jitter em 429/5xx
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Dict, Any, Awaitable, Callable, Optional
+
+try:
+    from ..config import settings
+except ImportError:
+    from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Status HTTP que justificam nova tentativa
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Token bucket thread-safe
+
+    rate é a reposição em tokens por segundo e capacity o tamanho da rajada.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Reserva tokens e retorna quantos segundos esperar antes de usá-los
+
+        A reserva é imediata (o saldo pode ficar negativo), então chamadas
+        concorrentes são enfileiradas de forma justa sem busy-wait.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= min(tokens, self.capacity)
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens: float = 1) -> float:
+        """Bloqueia até haver tokens; retorna o tempo esperado"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class RateLimiter:
+    """Registro de token buckets por API com retry e contadores"""
+
+    def __init__(self):
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _quota_for(self, api: str) -> Dict[str, float]:
+        """Quotas configuradas (tokens por segundo e rajada) para cada API"""
+        quotas = {
+            # Gmail: unidades de quota por usuário por segundo
+            "gmail": {"rate": settings.GMAIL_QUOTA_UNITS_PER_SECOND, "capacity": settings.GMAIL_QUOTA_UNITS_PER_SECOND},
+            "gemini": {"rate": settings.GEMINI_REQUESTS_PER_MINUTE / 60, "capacity": max(1, settings.GEMINI_REQUESTS_PER_MINUTE / 60)},
+            "gemini_embedding": {"rate": settings.EMBEDDING_REQUESTS_PER_MINUTE / 60, "capacity": max(1, settings.EMBEDDING_REQUESTS_PER_MINUTE / 60)},
+            "google_data": {"rate": settings.GOOGLE_DATA_REQUESTS_PER_MINUTE / 60, "capacity": max(1, settings.GOOGLE_DATA_REQUESTS_PER_MINUTE / 60)},
+        }
+        return quotas.get(api, {"rate": 10, "capacity": 10})
+
+    def bucket(self, api: str) -> TokenBucket:
+        """Retorna (criando se necessário) o bucket de uma API"""
+        with self._lock:
+            if api not in self._buckets:
+                quota = self._quota_for(api)
+                self._buckets[api] = TokenBucket(quota["rate"], quota["capacity"])
+                self._stats[api] = {
+                    "requests": 0,
+                    "successes": 0,
+                    "retries": 0,
+                    "failures": 0,
+                    "throttled": 0,
+                    "wait_seconds": 0.0,
+                    "tokens_used": 0.0,
+                    "last_error": None
+                }
+            return self._buckets[api]
+
+    def _record(self, api: str, **increments):
+        with self._lock:
+            stats = self._stats[api]
+            for key, value in increments.items():
+                if key == "last_error":
+                    stats[key] = value
+                else:
+                    stats[key] += value
+
+    def acquire(self, api: str, cost: float = 1):
+        """Aguarda quota disponível sem executar nada (para chamadas em lote)"""
+        wait = self.bucket(api).acquire(cost)
+        self._record(api, tokens_used=cost, wait_seconds=wait, throttled=1 if wait > 0 else 0)
+
+    def call(self, api: str, fn: Callable, *args, cost: float = 1,
+             max_retries: Optional[int] = None, **kwargs):
+        """Executa fn respeitando a quota da API, com retry em 429/5xx
+
+        O backoff é exponencial com jitter completo (entre 0 e base * 2^n),
+        evitando que clientes concorrentes tentem de novo em sincronia.
+        """
+        max_retries = settings.RATE_LIMIT_MAX_RETRIES if max_retries is None else max_retries
+        attempt = 0
+
+        while True:
+            self.acquire(api, cost)
+            self._record(api, requests=1)
+
+            try:
+                result = fn(*args, **kwargs)
+                self._record(api, successes=1)
+                return result
+
+            except Exception as e:
+                status = error_status(e)
+                if status not in RETRYABLE_STATUS or attempt >= max_retries:
+                    self._record(api, failures=1, last_error=f"{status or type(e).__name__}: {e}")
+                    raise
+
+                delay = backoff_delay(attempt)
+                self._record(api, retries=1, last_error=f"{status}: {e}")
+                logger.warning(f"⏳ {api}: status {status}, nova tentativa em {delay:.1f}s ({attempt + 1}/{max_retries})")
+                time.sleep(delay)
+                attempt += 1
+
+    async def acquire_async(self, api: str, cost: float = 1):
+        """Versão assíncrona de acquire: espera com asyncio.sleep, sem ocupar thread"""
+        wait = self.bucket(api).reserve(cost)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self._record(api, tokens_used=cost, wait_seconds=wait, throttled=1 if wait > 0 else 0)
+
+    async def call_async(self, api: str, fn: Callable[..., Awaitable], *args, cost: float = 1,
+                         max_retries: Optional[int] = None, **kwargs):
+        """Versão assíncrona de call para corrotinas (ex.: generate_content_async)"""
+        max_retries = settings.RATE_LIMIT_MAX_RETRIES if max_retries is None else max_retries
+        attempt = 0
+
+        while True:
+            await self.acquire_async(api, cost)
+            self._record(api, requests=1)
+
+            try:
+                result = await fn(*args, **kwargs)
+                self._record(api, successes=1)
+                return result
+
+            except Exception as e:
+                status = error_status(e)
+                if status not in RETRYABLE_STATUS or attempt >= max_retries:
+                    self._record(api, failures=1, last_error=f"{status or type(e).__name__}: {e}")
+                    raise
+
+                delay = backoff_delay(attempt)
+                self._record(api, retries=1, last_error=f"{status}: {e}")
+                logger.warning(f"⏳ {api}: status {status}, nova tentativa em {delay:.1f}s ({attempt + 1}/{max_retries})")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def execute(self, api: str, request, cost: float = 1, **kwargs):
+        """Atalho para requisições do googleapiclient (request.execute())"""
+        return self.call(api, request.execute, cost=cost, **kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores por API para monitoramento"""
+        with self._lock:
+            return {
+                api: {
+                    **stats,
+                    "wait_seconds": round(stats["wait_seconds"], 3),
+                    "rate_per_second": self._buckets[api].rate,
+                    "burst": self._buckets[api].capacity
+                }
+                for api, stats in self._stats.items()
+            }
+
+
+def error_status(error: Exception) -> Optional[int]:
+    """Extrai o status HTTP de exceções do googleapiclient e do google-api-core"""
+    resp = getattr(error, "resp", None)
+    status = getattr(resp, "status", None) if resp is not None else None
+    if status is None:
+        status = getattr(error, "code", None) or getattr(error, "status_code", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int) -> float:
+    """Backoff exponencial com jitter completo, limitado por RATE_LIMIT_MAX_BACKOFF"""
+    ceiling = min(settings.RATE_LIMIT_MAX_BACKOFF, settings.RATE_LIMIT_BASE_BACKOFF * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+# Instância global
+rate_limiter = RateLimiter()
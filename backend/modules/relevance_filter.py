@@ -0,0 +1,272 @@
+"""
+Pré-filtro local de relevância de emails
+Classificador linear (regressão logística) sobre n-gramas com hashing,
+treinado com o histórico do email_cache. Pontua um email em microssegundos,
+antes de qualquer chamada de embedding ou Gemini
+"""
+import json
+import logging
+import os
+import random
+import re
+import time
+import zlib
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from ..config import settings
+    from ..database import db
+except ImportError:
+    from config import settings
+    from database import db
+
+logger = logging.getLogger(__name__)
+
+# Espaço de features do hashing trick (2^18 pesos float32 = 1 MB)
+N_FEATURES = 2 ** 18
+
+# Mesmo limiar usado para criar rascunhos no WordPress
+RELEVANCE_THRESHOLD = 7.0
+
+# Estágios do workflow que indicam decisão editorial
+POSITIVE_STAGES = {"approved_content", "ready_publish", "published"}
+NEGATIVE_STAGES = {"rejected"}
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(text: str) -> List[str]:
+    return [token for token in _TOKEN_RE.findall(text.lower()) if not token.isdigit()]
+
+
+def extract_features(sender: str, subject: str, content: str,
+                     n_features: int = N_FEATURES) -> Tuple[np.ndarray, np.ndarray]:
+    """Features esparsas (índices, valores) de unigramas e bigramas
+
+    O hash (crc32, estável entre processos) define o índice e o sinal de
+    cada n-grama; frequências em escala log e vetor com norma L2 = 1.
+    """
+    counts: Dict[str, int] = {}
+
+    def add(feature: str):
+        counts[feature] = counts.get(feature, 0) + 1
+
+    body = _tokens(content[:20000])
+    for i, token in enumerate(body):
+        add(token)
+        if i:
+            add(f"{body[i - 1]} {token}")
+
+    for token in _tokens(subject):
+        add(f"s:{token}")
+
+    domain = sender.rsplit("@", 1)[-1].strip(" >").lower() if "@" in sender else ""
+    if domain:
+        add(f"d:{domain}")
+
+    features: Dict[int, float] = {}
+    for feature, count in counts.items():
+        hashed = zlib.crc32(feature.encode("utf-8"))
+        sign = 1.0 if hashed & 0x80000000 else -1.0
+        index = hashed % n_features
+        features[index] = features.get(index, 0.0) + sign * (1.0 + np.log(count))
+
+    if not features:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+    indices = np.fromiter(features.keys(), dtype=np.int64, count=len(features))
+    values = np.fromiter(features.values(), dtype=np.float32, count=len(features))
+    norm = np.linalg.norm(values)
+    return indices, values / norm if norm else values
+
+
+def label_from_row(row: Dict[str, Any]) -> Optional[int]:
+    """Rótulo de treino de uma linha do email_cache (None = sem sinal)
+
+    Decisão editorial (workflow, rascunho no WordPress) tem precedência
+    sobre o relevancia_score atribuído pelo Gemini.
+    """
+    if row.get("workflow_stage") in POSITIVE_STAGES or row.get("wordpress_post_id"):
+        return 1
+    if row.get("workflow_stage") in NEGATIVE_STAGES:
+        return 0
+
+    response = row.get("gemini_response")
+    if not isinstance(response, dict) or response.get("relevancia_score") is None:
+        return None
+    try:
+        return 1 if float(response["relevancia_score"]) >= RELEVANCE_THRESHOLD else 0
+    except (TypeError, ValueError):
+        return None
+
+
+class RelevanceClassifier:
+    """Regressão logística esparsa treinada por SGD"""
+
+    def __init__(self, n_features: int = N_FEATURES):
+        self.n_features = n_features
+        self.weights = np.zeros(n_features, dtype=np.float32)
+        self.bias = 0.0
+        self.metadata: Dict[str, Any] = {}
+
+    def predict(self, features: Tuple[np.ndarray, np.ndarray]) -> float:
+        """Probabilidade de o email ser relevante"""
+        indices, values = features
+        z = float(self.weights[indices] @ values) + self.bias
+        return 1.0 / (1.0 + np.exp(-max(min(z, 35.0), -35.0)))
+
+    def fit(self, samples: List[Tuple[np.ndarray, np.ndarray]], labels: List[int],
+            epochs: int = 8, learning_rate: float = 0.5, l2: float = 1e-5, seed: int = 42):
+        """Treina com pesos de classe balanceados (poucos releases viram pauta)"""
+        positives = sum(labels)
+        negatives = len(labels) - positives
+        if not positives or not negatives:
+            raise ValueError("Treino requer exemplos relevantes e irrelevantes")
+
+        class_weight = {1: len(labels) / (2 * positives), 0: len(labels) / (2 * negatives)}
+        order = list(range(len(samples)))
+        rng = random.Random(seed)
+
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            rate = learning_rate / (1 + epoch)
+            for i in order:
+                indices, values = samples[i]
+                error = (self.predict(samples[i]) - labels[i]) * class_weight[labels[i]]
+                self.weights[indices] -= rate * (error * values + l2 * self.weights[indices])
+                self.bias -= rate * error
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                weights=self.weights,
+                bias=np.float32(self.bias),
+                metadata=np.array(json.dumps(self.metadata))
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "RelevanceClassifier":
+        data = np.load(path)
+        classifier = cls(n_features=data["weights"].shape[0])
+        classifier.weights = data["weights"]
+        classifier.bias = float(data["bias"])
+        classifier.metadata = json.loads(str(data["metadata"]))
+        return classifier
+
+
+def evaluate(classifier: RelevanceClassifier, samples: List[Tuple[np.ndarray, np.ndarray]],
+             labels: List[int], thresholds: List[float]) -> List[Dict[str, Any]]:
+    """Precisão/recall da classe relevante e taxa de emails descartados por limiar"""
+    scores = [classifier.predict(sample) for sample in samples]
+    report = []
+
+    for threshold in thresholds:
+        tp = sum(1 for s, y in zip(scores, labels) if s >= threshold and y == 1)
+        fp = sum(1 for s, y in zip(scores, labels) if s >= threshold and y == 0)
+        fn = sum(1 for s, y in zip(scores, labels) if s < threshold and y == 1)
+        skipped = sum(1 for s in scores if s < threshold)
+        report.append({
+            "threshold": threshold,
+            "precision": round(tp / (tp + fp), 4) if tp + fp else None,
+            "recall": round(tp / (tp + fn), 4) if tp + fn else None,
+            "skip_rate": round(skipped / len(scores), 4) if scores else 0.0,
+            "relevant_skipped": fn
+        })
+
+    return report
+
+
+def train_from_email_cache(holdout: float = 0.2, seed: int = 42, limit: int = 20000) -> Dict[str, Any]:
+    """Treina com o histórico do email_cache e avalia numa amostra separada"""
+    rows = db.get_labeled_emails(limit)
+
+    samples, labels = [], []
+    for row in rows:
+        label = label_from_row(row)
+        if label is None:
+            continue
+        samples.append(extract_features(row.get("sender") or "", row.get("subject") or "", row.get("content_text") or ""))
+        labels.append(label)
+
+    if len(samples) < 20:
+        raise ValueError(f"Apenas {len(samples)} emails rotulados; são necessários ao menos 20")
+
+    order = list(range(len(samples)))
+    random.Random(seed).shuffle(order)
+    cut = max(1, int(len(order) * holdout))
+    test_idx, train_idx = order[:cut], order[cut:]
+
+    classifier = RelevanceClassifier()
+    classifier.fit([samples[i] for i in train_idx], [labels[i] for i in train_idx], seed=seed)
+
+    test_samples = [samples[i] for i in test_idx]
+    test_labels = [labels[i] for i in test_idx]
+    thresholds = sorted({0.1, 0.2, 0.3, 0.5, 0.7,
+                         settings.RELEVANCE_FILTER_SKIP_BELOW,
+                         settings.RELEVANCE_FILTER_DEPRIORITIZE_BELOW})
+
+    started = time.perf_counter()
+    report = evaluate(classifier, test_samples, test_labels, thresholds)
+    scoring_us = (time.perf_counter() - started) / (len(test_samples) * len(thresholds)) * 1e6 if test_samples else 0
+
+    classifier.metadata = {
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "train_size": len(train_idx),
+        "holdout_size": len(test_idx),
+        "positive_rate": round(sum(labels) / len(labels), 4),
+        "holdout": report
+    }
+
+    return {"classifier": classifier, **classifier.metadata, "scoring_microseconds": round(scoring_us, 1)}
+
+
+class RelevanceFilter:
+    """Modelo treinado carregado do disco, usado antes do processamento com IA"""
+
+    def __init__(self, model_path: Optional[str] = None):
+        self.model_path = model_path or settings.RELEVANCE_MODEL_PATH
+        self._classifier: Optional[RelevanceClassifier] = None
+        self._loaded_mtime: Optional[float] = None
+
+    def _current_classifier(self) -> Optional[RelevanceClassifier]:
+        """Recarrega o modelo quando o arquivo muda (novo treino)"""
+        try:
+            mtime = os.path.getmtime(self.model_path)
+        except OSError:
+            return None
+        if mtime != self._loaded_mtime:
+            try:
+                self._classifier = RelevanceClassifier.load(self.model_path)
+                self._loaded_mtime = mtime
+                logger.info(f"🧮 Modelo do pré-filtro de relevância carregado de {self.model_path}")
+            except Exception as e:
+                logger.error(f"Erro ao carregar modelo de relevância: {e}")
+                return None
+        return self._classifier
+
+    def score(self, sender: str, subject: str, content: str) -> Optional[float]:
+        """Probabilidade de relevância, ou None sem modelo treinado"""
+        classifier = self._current_classifier()
+        if classifier is None:
+            return None
+        return classifier.predict(extract_features(sender, subject, content, classifier.n_features))
+
+    def decide(self, sender: str, subject: str, content: str) -> Tuple[str, Optional[float]]:
+        """'skip', 'deprioritize' ou 'process' segundo os limiares configurados"""
+        if not settings.RELEVANCE_FILTER_ENABLED:
+            return "process", None
+        score = self.score(sender, subject, content)
+        if score is None:
+            return "process", None
+        if score < settings.RELEVANCE_FILTER_SKIP_BELOW:
+            return "skip", score
+        if score < settings.RELEVANCE_FILTER_DEPRIORITIZE_BELOW:
+            return "deprioritize", score
+        return "process", score
+
+# Instância global
+relevance_filter = RelevanceFilter()
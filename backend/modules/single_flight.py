@@ -0,0 +1,136 @@
+"""
+Coalescência de chamadas concorrentes idênticas (single-flight)
+Enquanto uma chamada com a mesma chave está em andamento, as demais
+aguardam e recebem o mesmo resultado em vez de repetir o trabalho
+"""
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "waiters")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Executa fn uma vez por chave entre threads concorrentes
+
+    Não é um cache: assim que a chamada líder termina, a próxima com a
+    mesma chave executa de novo. Para funções síncronas chamadas de código
+    assíncrono, use asyncio.to_thread(do, ...); para corrotinas, do_async.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._async_calls: Dict[str, "asyncio.Future"] = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable, *args, **kwargs) -> Tuple[Any, bool]:
+        """Retorna (resultado, compartilhado)
+
+        compartilhado é True quando o resultado veio da chamada de outro
+        chamador; exceções da chamada líder são repassadas a todos.
+        """
+        call, leader = self.begin(key)
+        if not leader:
+            logger.info(f"🔗 Aguardando chamada em andamento: {key}")
+            return self.wait(call), True
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.finish(key, call, error=e)
+            raise
+        self.finish(key, call, result)
+        return result, False
+
+    def begin(self, key: str) -> Tuple[_Call, bool]:
+        """Registra a chamada sem executá-la; retorna (chamada, líder)
+
+        Para trabalho que não cabe em uma função, como uma resposta em
+        streaming: o líder chama finish() ao terminar e os demais wait()
+        ou wait_async(). Compartilha as chaves com do().
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                return call, True
+            call.waiters += 1
+            self.coalesced += 1
+            return call, False
+
+    def finish(self, key: str, call: _Call, result: Any = None, error: Optional[BaseException] = None):
+        """Publica o resultado (ou a exceção) do líder e libera a chave"""
+        call.result = result
+        call.error = error
+        with self._lock:
+            del self._calls[key]
+        call.event.set()
+
+    def wait(self, call: _Call) -> Any:
+        """Aguarda o líder e retorna seu resultado"""
+        call.event.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    async def wait_async(self, call: _Call) -> Any:
+        """Como wait(), sem bloquear o event loop"""
+        await asyncio.to_thread(call.event.wait)
+        return self.wait(call)
+
+    async def do_async(self, key: str, fn: Callable[..., Awaitable], *args, **kwargs) -> Tuple[Any, bool]:
+        """Como do(), para corrotinas no mesmo event loop"""
+        future = self._async_calls.get(key)
+        if future is not None:
+            with self._lock:
+                self.coalesced += 1
+            logger.info(f"🔗 Aguardando chamada em andamento: {key}")
+            # shield: o cancelamento de um seguidor não cancela a chamada líder
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._async_calls[key] = future
+        with self._lock:
+            self.executions += 1
+
+        try:
+            result = await fn(*args, **kwargs)
+            future.set_result(result)
+            return result, False
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Evita o aviso "exception was never retrieved" quando não há seguidores
+            future.exception()
+            raise
+        finally:
+            del self._async_calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls) + len(self._async_calls),
+                "waiting": sum(call.waiters for call in self._calls.values()),
+                "executions": self.executions,
+                "coalesced": self.coalesced
+            }
+
+# Instância global
+single_flight = SingleFlight()
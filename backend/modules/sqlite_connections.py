@@ -0,0 +1,25 @@
+"""
+Conexões SQLite por thread para os caches persistentes
+(embeddings e respostas do Gemini)
+"""
+import os
+import sqlite3
+import threading
+
+
+class ThreadLocalConnections:
+    """Uma conexão por thread (sqlite3 não compartilha conexões entre threads)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def get(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
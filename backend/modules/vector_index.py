@@ -0,0 +1,210 @@
+"""
+Índice vetorial local (em memória) da knowledge_base
+Alternativa à RPC match_documents: matriz NumPy de vetores float32
+normalizados, com top-k por produto matricial e atualização incremental
+"""
+import json
+import logging
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from ..config import settings
+    from ..database import db
+except ImportError:
+    from config import settings
+    from database import db
+
+logger = logging.getLogger(__name__)
+
+# Colunas devolvidas nas buscas (mesmo formato de match_documents)
+RESULT_FIELDS = ("id", "content_text", "source_url", "topic", "category_recifemais", "metadata")
+
+
+class LocalVectorIndex:
+    """Busca por similaridade de cosseno sobre a knowledge_base em memória
+
+    Os vetores são normalizados na carga, então a similaridade de cosseno
+    vira um único produto matriz × vetor. refresh() busca apenas as linhas
+    cujo embedding mudou depois da última carga (embedding_updated_at,
+    vector_search.sql): linhas novas entram na matriz, embeddings regerados
+    substituem o vetor antigo e embeddings apagados saem do índice.
+    """
+
+    def __init__(self, refresh_interval: Optional[int] = None):
+        self.refresh_interval = refresh_interval if refresh_interval is not None else settings.LOCAL_VECTOR_INDEX_REFRESH_SECONDS
+        self._matrix: Optional[np.ndarray] = None
+        self._rows: List[Dict[str, Any]] = []
+        self._ids: List[str] = []
+        # (embedding_updated_at, id) da última linha lida
+        self._watermark: Optional[Tuple[str, str]] = None
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return len(self._rows)
+
+    @property
+    def matrix(self) -> Optional[np.ndarray]:
+        """Vetores normalizados carregados (uma linha por documento)"""
+        return self._matrix
+
+    def refresh(self, page_size: int = 500) -> int:
+        """Aplica as mudanças de embedding da knowledge_base; retorna quantas linhas mudaram"""
+        # Apenas uma atualização por vez; as demais seguem com o índice atual
+        if not self._refresh_lock.acquire(blocking=False):
+            return 0
+        try:
+            return self._load_changes(page_size)
+        finally:
+            self._refresh_lock.release()
+
+    def _load_changes(self, page_size: int) -> int:
+        # Última versão de cada linha alterada; vetor None = sai do índice
+        vectors: Dict[str, Optional[np.ndarray]] = {}
+        rows: Dict[str, Dict[str, Any]] = {}
+        watermark = self._watermark
+        dimensions = settings.EMBEDDING_DIMENSIONS
+        skipped = 0
+
+        while True:
+            page = db.get_knowledge_base_changes(watermark, limit=page_size)
+            for record in page:
+                vector = _parse_embedding(record.get("embedding"))
+                if vector is not None and vector.shape[0] != dimensions:
+                    skipped += 1
+                    vector = None
+                if vector is None or not np.any(vector):
+                    vectors[record["id"]] = None
+                    continue
+                vectors[record["id"]] = vector / np.linalg.norm(vector)
+                rows[record["id"]] = {field: record.get(field) for field in RESULT_FIELDS}
+
+            if page:
+                watermark = (page[-1]["embedding_updated_at"], page[-1]["id"])
+            if len(page) < page_size:
+                break
+
+        if skipped:
+            logger.warning(f"Índice vetorial local: {skipped} vetores com dimensão diferente de {dimensions} ignorados")
+
+        with self._lock:
+            added, replaced, removed = self._apply_changes(vectors, rows)
+            self._watermark = watermark
+            self._last_refresh = time.monotonic()
+
+        if added or replaced or removed:
+            logger.info(
+                f"🧭 Índice vetorial local: +{added} vetores, {replaced} atualizados, "
+                f"{removed} removidos ({self.size} no total)"
+            )
+        return added + replaced + removed
+
+    def _apply_changes(self, vectors: Dict[str, Optional[np.ndarray]],
+                       rows: Dict[str, Dict[str, Any]]) -> Tuple[int, int, int]:
+        """Monta a nova matriz com as mudanças (chamado com _lock)
+
+        Buscas em andamento seguem com a matriz anterior: nada é alterado
+        no lugar. Retorna (adicionados, atualizados, removidos).
+        """
+        positions = {row_id: index for index, row_id in enumerate(self._ids)}
+        matrix, index_rows, ids = self._matrix, self._rows, self._ids
+
+        replaced = {positions[row_id]: row_id for row_id, vector in vectors.items()
+                    if row_id in positions and vector is not None}
+        removed = {positions[row_id] for row_id, vector in vectors.items()
+                   if row_id in positions and vector is None}
+        added = [row_id for row_id, vector in vectors.items() if row_id not in positions and vector is not None]
+
+        if replaced:
+            matrix, index_rows = matrix.copy(), list(index_rows)
+            for position, row_id in replaced.items():
+                matrix[position] = vectors[row_id]
+                index_rows[position] = rows[row_id]
+
+        if removed:
+            keep = [position for position in range(len(ids)) if position not in removed]
+            matrix = matrix[keep] if keep else None
+            index_rows = [index_rows[position] for position in keep]
+            ids = [ids[position] for position in keep]
+
+        if added:
+            new_matrix = np.vstack([vectors[row_id] for row_id in added]).astype(np.float32)
+            matrix = new_matrix if matrix is None else np.vstack([matrix, new_matrix])
+            index_rows = index_rows + [rows[row_id] for row_id in added]
+            ids = ids + added
+
+        self._matrix, self._rows, self._ids = matrix, index_rows, ids
+        return len(added), len(replaced), len(removed)
+
+    def _maybe_refresh(self):
+        if time.monotonic() - self._last_refresh >= self.refresh_interval:
+            try:
+                self.refresh()
+            except Exception as e:
+                # Seguir com o índice atual se o banco estiver indisponível
+                self._last_refresh = time.monotonic()
+                logger.error(f"Erro ao atualizar índice vetorial local: {e}")
+
+    def search(self, embedding: List[float], limit: int = 5, threshold: float = 0.7) -> List[Dict[str, Any]]:
+        """Top-k por similaridade de cosseno, acima de threshold"""
+        self._maybe_refresh()
+
+        with self._lock:
+            matrix, rows = self._matrix, self._rows
+        if matrix is None or not embedding:
+            return []
+
+        query = np.asarray(embedding, dtype=np.float32)
+        if query.shape[0] != matrix.shape[1]:
+            logger.error(f"Embedding com {query.shape[0]} dimensões, índice tem {matrix.shape[1]}")
+            return []
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+
+        scores = matrix @ (query / norm)
+
+        k = min(limit, scores.shape[0])
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [
+            {**rows[i], "similarity": float(scores[i])}
+            for i in top
+            if scores[i] > threshold
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.LOCAL_VECTOR_INDEX_ENABLED,
+            "vectors": self.size,
+            "dimensions": int(self._matrix.shape[1]) if self._matrix is not None else None,
+            "matrix_bytes": int(self._matrix.nbytes) if self._matrix is not None else 0,
+            "watermark": self._watermark[0] if self._watermark else None
+        }
+
+
+def _parse_embedding(value) -> Optional[np.ndarray]:
+    """Converte o embedding vindo do Supabase (lista ou texto '[...]' do pgvector)"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+    try:
+        return np.asarray(value, dtype=np.float32)
+    except (TypeError, ValueError):
+        return None
+
+# Instância global
+vector_index = LocalVectorIndex()
@@ -0,0 +1,11 @@
+-- Suporte à ingestão incremental do Gmail
+-- Guarda o ID da mensagem Gmail para deduplicação antes de baixar o corpo
+
+ALTER TABLE email_cache ADD COLUMN IF NOT EXISTS gmail_message_id VARCHAR(64);
+
+-- Índice único parcial: emails inseridos manualmente não têm ID Gmail
+CREATE UNIQUE INDEX IF NOT EXISTS idx_email_cache_gmail_message_id
+ON email_cache(gmail_message_id)
+WHERE gmail_message_id IS NOT NULL;
+
+COMMENT ON COLUMN email_cache.gmail_message_id IS 'ID da mensagem no Gmail, usado para deduplicação em lote antes do download completo';
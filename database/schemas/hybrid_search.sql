@@ -0,0 +1,48 @@
+-- Busca textual (full-text) em português na knowledge_base
+-- Complementa match_documents: nomes de locais e eventos ("Marco Zero",
+-- "Paço do Frevo") casam melhor por termo do que por embedding
+
+-- Coluna tsvector gerada a partir do conteúdo
+ALTER TABLE knowledge_base
+ADD COLUMN IF NOT EXISTS content_tsv tsvector
+GENERATED ALWAYS AS (to_tsvector('portuguese', coalesce(content_text, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_knowledge_base_content_tsv ON knowledge_base
+USING gin (content_tsv);
+
+-- Busca textual ranqueada. query_text usa a sintaxe de websearch_to_tsquery
+-- ("frase exata", OR, -exclusão)
+CREATE OR REPLACE FUNCTION search_documents_text(
+  query_text text,
+  match_count int DEFAULT 10
+)
+RETURNS TABLE (
+  id uuid,
+  content_text text,
+  source_url text,
+  topic varchar(100),
+  category_recifemais varchar(50),
+  metadata jsonb,
+  rank float
+)
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT
+    kb.id,
+    kb.content_text,
+    kb.source_url,
+    kb.topic,
+    kb.category_recifemais,
+    kb.metadata,
+    ts_rank_cd(kb.content_tsv, query)::float AS rank
+  FROM knowledge_base kb,
+       websearch_to_tsquery('portuguese', query_text) query
+  WHERE kb.content_tsv @@ query
+  ORDER BY rank DESC
+  LIMIT match_count;
+$$;
+
+-- Comentários para documentação
+COMMENT ON COLUMN knowledge_base.content_tsv IS 'tsvector (português) de content_text para busca textual';
+COMMENT ON FUNCTION search_documents_text IS 'Busca textual ranqueada (ts_rank_cd) na knowledge_base';
@@ -0,0 +1,31 @@
+-- Detecção de releases quase duplicados (MinHash LSH)
+-- Assinatura MinHash de 128 valores e os hashes das suas 32 faixas LSH,
+-- indexados (GIN) para a busca de candidatos; duplicatas apontam para o
+-- email original
+
+ALTER TABLE email_cache ADD COLUMN IF NOT EXISTS minhash INTEGER[];
+ALTER TABLE email_cache ADD COLUMN IF NOT EXISTS minhash_bands INTEGER[];
+ALTER TABLE email_cache ADD COLUMN IF NOT EXISTS duplicate_of UUID REFERENCES email_cache(id) ON DELETE SET NULL;
+ALTER TABLE email_cache ADD COLUMN IF NOT EXISTS duplicate_similarity REAL;
+
+-- Versão anterior (SimHash 4x16 bits): limitada a 3 bits de distância
+DROP INDEX IF EXISTS idx_email_cache_simhash_band0;
+DROP INDEX IF EXISTS idx_email_cache_simhash_band1;
+DROP INDEX IF EXISTS idx_email_cache_simhash_band2;
+DROP INDEX IF EXISTS idx_email_cache_simhash_band3;
+ALTER TABLE email_cache DROP COLUMN IF EXISTS simhash;
+ALTER TABLE email_cache DROP COLUMN IF EXISTS simhash_band0;
+ALTER TABLE email_cache DROP COLUMN IF EXISTS simhash_band1;
+ALTER TABLE email_cache DROP COLUMN IF EXISTS simhash_band2;
+ALTER TABLE email_cache DROP COLUMN IF EXISTS simhash_band3;
+ALTER TABLE email_cache DROP COLUMN IF EXISTS duplicate_distance;
+
+-- Busca por sobreposição (minhash_bands && ARRAY[...]); emails curtos demais
+-- não têm assinatura
+CREATE INDEX IF NOT EXISTS idx_email_cache_minhash_bands ON email_cache USING GIN (minhash_bands) WHERE minhash_bands IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_email_cache_duplicate_of ON email_cache(duplicate_of) WHERE duplicate_of IS NOT NULL;
+
+COMMENT ON COLUMN email_cache.minhash IS 'Assinatura MinHash (128 permutações) dos trigramas do conteúdo';
+COMMENT ON COLUMN email_cache.minhash_bands IS 'Hashes das 32 faixas LSH da assinatura';
+COMMENT ON COLUMN email_cache.duplicate_of IS 'Email original do qual este é uma quase duplicata';
+COMMENT ON COLUMN email_cache.duplicate_similarity IS 'Similaridade de Jaccard estimada com o original';
@@ -0,0 +1,6 @@
+-- Pré-filtro local de relevância
+-- Guarda a probabilidade atribuída pelo classificador local antes da IA
+
+ALTER TABLE email_cache ADD COLUMN IF NOT EXISTS prefilter_score REAL;
+
+COMMENT ON COLUMN email_cache.prefilter_score IS 'Probabilidade de relevância do pré-filtro local (NULL = sem modelo)';
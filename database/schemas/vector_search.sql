@@ -1,16 +1,78 @@
 -- Função para busca de documentos similares usando pgvector
--- Requer extensão pgvector habilitada no Supabase
+-- Requer extensão pgvector (>= 0.5.0 para HNSW) habilitada no Supabase
+-- Dimensão: 768 (text-embedding-004). Deve bater com EMBEDDING_DIMENSIONS no backend
 
 -- Habilitar extensão pgvector (se não estiver habilitada)
 CREATE EXTENSION IF NOT EXISTS vector;
 
--- Função para busca de similaridade
+-- ==========================================
+-- ALTERAÇÕES DE EMBEDDING (índice vetorial local do backend)
+-- ==========================================
+-- embedding_updated_at muda a cada INSERT e a cada UPDATE que altera o
+-- embedding (inclusive para NULL): o backend lê as mudanças paginando por
+-- (embedding_updated_at, id), então vetores regerados substituem os antigos.
+-- clock_timestamp() em vez de now(): linhas do mesmo INSERT em massa ficam
+-- com horários distintos (o id desempata de qualquer forma)
+ALTER TABLE knowledge_base
+ADD COLUMN IF NOT EXISTS embedding_updated_at TIMESTAMPTZ;
+
+UPDATE knowledge_base
+SET embedding_updated_at = created_at
+WHERE embedding_updated_at IS NULL;
+
+ALTER TABLE knowledge_base
+ALTER COLUMN embedding_updated_at SET DEFAULT now(),
+ALTER COLUMN embedding_updated_at SET NOT NULL;
+
+CREATE OR REPLACE FUNCTION touch_knowledge_base_embedding()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF TG_OP = 'INSERT' OR NEW.embedding IS DISTINCT FROM OLD.embedding THEN
+    NEW.embedding_updated_at := clock_timestamp();
+  END IF;
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_knowledge_base_embedding_updated ON knowledge_base;
+CREATE TRIGGER trg_knowledge_base_embedding_updated
+BEFORE INSERT OR UPDATE OF embedding ON knowledge_base
+FOR EACH ROW EXECUTE FUNCTION touch_knowledge_base_embedding();
+
+CREATE INDEX IF NOT EXISTS idx_knowledge_base_embedding_updated ON knowledge_base (embedding_updated_at, id);
+
+-- ==========================================
+-- MIGRAÇÃO: vector(1536) -> vector(768)
+-- ==========================================
+-- Vetores com outra dimensão não são comparáveis com os do modelo atual:
+-- são apagados e devem ser regerados via /admin/populate-knowledge-base
+DROP INDEX IF EXISTS idx_knowledge_base_embedding;
+
+UPDATE knowledge_base
+SET embedding = NULL
+WHERE embedding IS NOT NULL AND vector_dims(embedding) <> 768;
+
+ALTER TABLE knowledge_base
+ALTER COLUMN embedding TYPE vector(768);
+
+-- Assinatura antiga (vector(1536), sem ef_search)
+DROP FUNCTION IF EXISTS match_documents(vector, float, int);
+
+-- ==========================================
+-- BUSCA POR SIMILARIDADE
+-- ==========================================
+-- ef_search controla o tamanho da lista de candidatos do HNSW:
+-- maior = mais recall, mais latência. Vale só para esta transação
 CREATE OR REPLACE FUNCTION match_documents(
-  query_embedding vector(1536),
+  query_embedding vector(768),
   match_threshold float DEFAULT 0.7,
-  match_count int DEFAULT 5
+  match_count int DEFAULT 5,
+  ef_search int DEFAULT 40
 )
 RETURNS TABLE (
+  id uuid,
   content_text text,
   source_url text,
   topic varchar(100),
@@ -21,26 +83,57 @@ RETURNS TABLE (
 LANGUAGE plpgsql
 AS $$
 BEGIN
+  PERFORM set_config('hnsw.ef_search', ef_search::text, true);
+
+  -- ORDER BY distância + LIMIT na subconsulta para usar o índice HNSW;
+  -- o limiar é aplicado depois, sobre os candidatos
   RETURN QUERY
   SELECT
-    kb.content_text,
-    kb.source_url,
-    kb.topic,
-    kb.category_recifemais,
-    kb.metadata,
-    1 - (kb.embedding <=> query_embedding) AS similarity
-  FROM knowledge_base kb
-  WHERE 1 - (kb.embedding <=> query_embedding) > match_threshold
-  ORDER BY kb.embedding <=> query_embedding
-  LIMIT match_count;
+    nearest.id,
+    nearest.content_text,
+    nearest.source_url,
+    nearest.topic,
+    nearest.category_recifemais,
+    nearest.metadata,
+    1 - nearest.distance AS similarity
+  FROM (
+    SELECT
+      kb.id,
+      kb.content_text,
+      kb.source_url,
+      kb.topic,
+      kb.category_recifemais,
+      kb.metadata,
+      kb.embedding <=> query_embedding AS distance
+    FROM knowledge_base kb
+    WHERE kb.embedding IS NOT NULL
+    ORDER BY kb.embedding <=> query_embedding
+    LIMIT match_count
+  ) nearest
+  WHERE 1 - nearest.distance > match_threshold
+  ORDER BY nearest.distance;
 END;
 $$;
 
--- Índice para otimizar busca por similaridade
-CREATE INDEX IF NOT EXISTS idx_knowledge_base_embedding ON knowledge_base 
-USING ivfflat (embedding vector_cosine_ops)
-WITH (lists = 100);
+-- Dimensão declarada da coluna embedding (verificada na inicialização do backend)
+CREATE OR REPLACE FUNCTION knowledge_base_embedding_dimensions()
+RETURNS int
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT atttypmod
+  FROM pg_attribute
+  WHERE attrelid = 'knowledge_base'::regclass
+    AND attname = 'embedding';
+$$;
+
+-- Índice HNSW para busca aproximada por cosseno
+CREATE INDEX IF NOT EXISTS idx_knowledge_base_embedding_hnsw ON knowledge_base
+USING hnsw (embedding vector_cosine_ops)
+WITH (m = 16, ef_construction = 64);
 
 -- Comentários para documentação
-COMMENT ON FUNCTION match_documents IS 'Busca documentos similares usando embeddings com pgvector';
-COMMENT ON INDEX idx_knowledge_base_embedding IS 'Índice otimizado para busca por similaridade de embeddings'; 
\ No newline at end of file
+COMMENT ON FUNCTION match_documents IS 'Busca documentos similares usando embeddings com pgvector (HNSW, ef_search ajustável)';
+COMMENT ON FUNCTION knowledge_base_embedding_dimensions IS 'Dimensão declarada de knowledge_base.embedding';
+COMMENT ON INDEX idx_knowledge_base_embedding_hnsw IS 'Índice HNSW para busca por similaridade de embeddings';
+COMMENT ON COLUMN knowledge_base.embedding_updated_at IS 'Última alteração do embedding (atualização incremental do índice vetorial local)';
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Calibração da detecção de quase duplicatas (MinHash LSH)
+Gera releases sintéticos, troca o rodapé e mede a similaridade estimada e
+a taxa de detecção com o limiar NEAR_DUPLICATE_MIN_SIMILARITY; releases
+diferentes com o mesmo rodapé medem os falsos positivos
+"""
+import random
+import statistics
+import sys
+from pathlib import Path
+
+# Adicionar o diretório raiz ao path
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
+
+from backend.modules.minhash import lsh_bands, minhash, similarity
+
+# (palavras do corpo, palavras do rodapé)
+CASES = [(300, 15), (300, 25), (400, 20), (1000, 30), (150, 40), (120, 60)]
+
+def detected(a: list, b: list, min_similarity: float) -> bool:
+    return bool(set(lsh_bands(a)) & set(lsh_bands(b))) and similarity(a, b) >= min_similarity
+
+def benchmark(trials: int = 200, min_similarity: float = 0.6, seed: int = 42):
+    rng = random.Random(seed)
+    # Vocabulário com frequências de Zipf, como em texto corrido
+    vocab = ["".join(rng.choice("abcdefghilmnoprstuv") for _ in range(rng.randint(2, 10))) for _ in range(3000)]
+    weights = [1 / (rank + 1) for rank in range(len(vocab))]
+
+    def words(count: int) -> str:
+        return " ".join(rng.choices(vocab, weights=weights, k=count))
+
+    print(f"Limiar: {min_similarity}  |  {trials} tentativas por caso\n")
+    print("corpo  rodapé  detecção  sim. mínima  sim. mediana")
+    for body_words, footer_words in CASES:
+        hits, scores = 0, []
+        for _ in range(trials):
+            body = words(body_words)
+            a, b = minhash(body + "\n\n" + words(footer_words)), minhash(body + "\n\n" + words(footer_words))
+            scores.append(similarity(a, b))
+            hits += detected(a, b, min_similarity)
+        print(f"{body_words:>5}  {footer_words:>6}  {hits / trials:>8.1%}  {min(scores):>11.3f}  {statistics.median(scores):>12.3f}")
+
+    false_positives, scores = 0, []
+    for _ in range(trials):
+        footer = words(40)
+        a, b = minhash(words(300) + "\n\n" + footer), minhash(words(300) + "\n\n" + footer)
+        scores.append(similarity(a, b))
+        false_positives += detected(a, b, min_similarity)
+    print(f"\nReleases diferentes, mesmo rodapé de 40 palavras: {false_positives} falsos positivos, "
+          f"similaridade máxima {max(scores):.3f}")
+
+if __name__ == "__main__":
+    benchmark(min_similarity=float(sys.argv[1]) if len(sys.argv) > 1 else 0.6)
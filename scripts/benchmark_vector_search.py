@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark da busca vetorial (match_documents/HNSW) contra busca exata
+Mede recall@k e latência para vários valores de ef_search, usando como
+referência o top-k por força bruta (NumPy) sobre toda a knowledge_base
+"""
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Adicionar o diretório raiz ao path
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
+
+# Importar módulos do backend
+from backend.database import db
+from backend.modules.vector_index import LocalVectorIndex
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def benchmark(queries: int = 50, k: int = 5, ef_values: list = None, noise: float = 0.05, seed: int = 42):
+    """Compara a RPC match_documents com o top-k exato para cada ef_search"""
+
+    ef_values = ef_values or [10, 20, 40, 80, 160]
+
+    print("📥 Carregando knowledge_base...")
+    index = LocalVectorIndex(refresh_interval=10 ** 9)
+    index.refresh()
+    if index.size == 0:
+        print("❌ Nenhum embedding com a dimensão configurada na knowledge_base")
+        return
+
+    # Consultas: documentos sorteados com ruído, para não serem o próprio vizinho exato
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(index.size, size=min(queries, index.size), replace=False)
+    query_vectors = index.matrix[sample] + rng.normal(0, noise, (len(sample), index.matrix.shape[1]))
+    query_vectors = [vector.astype(np.float32).tolist() for vector in query_vectors]
+
+    print(f"🔎 {len(query_vectors)} consultas, k={k}, {index.size} vetores de {index.matrix.shape[1]} dimensões\n")
+
+    # Referência exata (limiar -1: apenas o top-k, sem corte por similaridade)
+    exact_ids = []
+    exact_latencies = []
+    for vector in query_vectors:
+        started = time.perf_counter()
+        results = index.search(vector, limit=k, threshold=-1.0)
+        exact_latencies.append((time.perf_counter() - started) * 1000)
+        exact_ids.append({row["id"] for row in results})
+
+    print(f"{'busca':>16} | {'recall@k':>8} | {'p50 ms':>8} | {'p95 ms':>8}")
+    print("-" * 50)
+    print(f"{'exata (NumPy)':>16} | {1.0:>8.3f} | {statistics.median(exact_latencies):>8.2f} | {percentile(exact_latencies, 95):>8.2f}")
+
+    for ef_search in ef_values:
+        recalls = []
+        latencies = []
+        for vector, expected in zip(query_vectors, exact_ids):
+            started = time.perf_counter()
+            results = db.search_similar_content(vector, limit=k, threshold=-1.0, ef_search=ef_search)
+            latencies.append((time.perf_counter() - started) * 1000)
+            found = {row.get("id") for row in results}
+            recalls.append(len(found & expected) / len(expected) if expected else 1.0)
+
+        print(f"{f'hnsw ef={ef_search}':>16} | {statistics.mean(recalls):>8.3f} | "
+              f"{statistics.median(latencies):>8.2f} | {percentile(latencies, 95):>8.2f}")
+
+    print("\nℹ️  Latência da RPC inclui a ida e volta HTTP ao Supabase")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark de recall e latência da busca vetorial")
+    parser.add_argument("--queries", type=int, default=50, help="Número de consultas")
+    parser.add_argument("-k", type=int, default=5, help="Resultados por consulta")
+    parser.add_argument("--ef", type=int, nargs="+", default=None, help="Valores de ef_search (padrão: 10 20 40 80 160)")
+    parser.add_argument("--noise", type=float, default=0.05, help="Desvio do ruído gaussiano aplicado às consultas")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do sorteio das consultas")
+
+    args = parser.parse_args()
+
+    benchmark(args.queries, args.k, args.ef, args.noise, args.seed)
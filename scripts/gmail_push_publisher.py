@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Publicador local que simula as notificações push do Gmail via Pub/Sub
+Envia para o webhook /gmail/push mensagens no mesmo formato do Pub/Sub push
+"""
+import base64
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+
+import requests
+
+def build_notification(email_address: str, history_id: int, subscription: str) -> dict:
+    """Monta o corpo de uma mensagem push do Pub/Sub com o payload do Gmail"""
+    data = json.dumps({"emailAddress": email_address, "historyId": history_id})
+
+    return {
+        "message": {
+            "data": base64.b64encode(data.encode()).decode(),
+            "messageId": str(uuid.uuid4().int)[:16],
+            "publishTime": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "attributes": {}
+        },
+        "subscription": subscription
+    }
+
+def publish(url: str, email_address: str, history_id: int, count: int, interval: float,
+            token: str = None, subscription: str = "projects/local/subscriptions/gmail-push"):
+    """Envia count notificações, incrementando o historyId a cada envio"""
+
+    params = {"token": token} if token else None
+
+    for i in range(count):
+        notification = build_notification(email_address, history_id + i, subscription)
+
+        started = time.perf_counter()
+        response = requests.post(url, json=notification, params=params, timeout=10)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        status = "✅" if response.status_code < 300 else "❌"
+        print(f"{status} historyId={history_id + i} → HTTP {response.status_code} em {elapsed_ms:.0f}ms")
+
+        if i < count - 1:
+            time.sleep(interval)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simular notificações push do Gmail (Pub/Sub)")
+    parser.add_argument("--url", default="http://localhost:8001/gmail/push", help="URL do webhook")
+    parser.add_argument("--email", default="redacao@recifemais.com.br", help="emailAddress da notificação")
+    parser.add_argument("--history-id", type=int, default=int(time.time()), help="historyId inicial")
+    parser.add_argument("--count", type=int, default=1, help="Número de notificações")
+    parser.add_argument("--interval", type=float, default=1.0, help="Segundos entre notificações")
+    parser.add_argument("--token", default=None, help="Token do webhook (GMAIL_PUSH_TOKEN)")
+
+    args = parser.parse_args()
+
+    publish(args.url, args.email, args.history_id, args.count, args.interval, args.token)
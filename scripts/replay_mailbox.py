@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Script para reproduzir uma caixa de emails local (.eml/.mbox) pelo pipeline de ingestão
+Permite medir e perfilar o caminho de parsing/hash/inserção sem uma conta Gmail
+"""
+import sys
+from pathlib import Path
+
+# Adicionar o diretório raiz ao path
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
+
+# Importar módulos do backend
+from backend.modules.email_sources import LocalMailboxSource
+from backend.modules.email_ingestion import replay_source
+
+def replay_mailbox(path: str, rate: float = None, limit: int = None, store: bool = False):
+    """Reproduz a caixa local e imprime as estatísticas"""
+
+    print(f"📬 Reproduzindo {path}...")
+
+    source = LocalMailboxSource(path, rate=rate, limit=limit)
+    stats = replay_source(source, store=store)
+
+    print(f"\n📊 {stats['messages']} emails em {stats['elapsed_seconds']:.2f}s ({stats['messages_per_second']:.1f}/s)")
+    print(f"   Parsing: {stats['parse_seconds']:.3f}s")
+    print(f"   {'Inserção' if store else 'Hash'}: {stats['store_seconds']:.3f}s")
+    print(f"   Corpos vazios: {stats['empty_bodies']}")
+    if store:
+        print(f"   Inseridos: {stats['inserted']} | Duplicados: {stats['duplicates']} | Erros: {stats['store_errors']}")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Reproduzir emails locais pelo pipeline de ingestão")
+    parser.add_argument("path", help="Diretório com .eml, arquivo .eml ou arquivo .mbox")
+    parser.add_argument("--rate", type=float, default=None, help="Limite de emails por segundo")
+    parser.add_argument("--limit", type=int, default=None, help="Número máximo de emails")
+    parser.add_argument("--store", action="store_true", help="Inserir no email_cache (padrão: apenas parsing e hash)")
+    parser.add_argument("--profile", action="store_true", help="Executar com cProfile e mostrar as funções mais caras")
+
+    args = parser.parse_args()
+
+    if args.profile:
+        import cProfile
+        import pstats
+
+        profiler = cProfile.Profile()
+        profiler.runcall(replay_mailbox, args.path, args.rate, args.limit, args.store)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+    else:
+        replay_mailbox(args.path, args.rate, args.limit, args.store)
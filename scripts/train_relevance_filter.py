@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Script para treinar o pré-filtro local de relevância com o histórico do email_cache
+Reporta precisão/recall numa amostra separada (holdout) e salva o modelo
+"""
+import sys
+from pathlib import Path
+
+# Adicionar o diretório raiz ao path
+root_path = Path(__file__).parent.parent
+sys.path.insert(0, str(root_path))
+
+# Importar módulos do backend
+from backend.config import settings
+from backend.modules.relevance_filter import train_from_email_cache
+
+def train(holdout: float = 0.2, seed: int = 42, limit: int = 20000, output: str = None, dry_run: bool = False):
+    """Treina, imprime o relatório do holdout e salva o modelo"""
+
+    print("📚 Carregando emails rotulados do email_cache...")
+    result = train_from_email_cache(holdout=holdout, seed=seed, limit=limit)
+
+    print(f"\n🧮 Treino: {result['train_size']} | Holdout: {result['holdout_size']} | "
+          f"Relevantes: {result['positive_rate']:.1%}")
+    print(f"⚡ Pontuação: {result['scoring_microseconds']:.0f} µs por email\n")
+
+    print(f"{'limiar':>7} | {'precisão':>8} | {'recall':>7} | {'descartados':>11} | {'relevantes perdidos':>19}")
+    print("-" * 66)
+    for row in result["holdout"]:
+        precision = f"{row['precision']:.3f}" if row["precision"] is not None else "-"
+        recall = f"{row['recall']:.3f}" if row["recall"] is not None else "-"
+        marker = " ← skip" if row["threshold"] == settings.RELEVANCE_FILTER_SKIP_BELOW else ""
+        print(f"{row['threshold']:>7.2f} | {precision:>8} | {recall:>7} | "
+              f"{row['skip_rate']:>11.1%} | {row['relevant_skipped']:>19}{marker}")
+
+    if dry_run:
+        print("\nℹ️  Modelo não salvo (--dry-run)")
+        return
+
+    path = output or settings.RELEVANCE_MODEL_PATH
+    result["classifier"].save(path)
+    print(f"\n💾 Modelo salvo em {path}")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Treinar o pré-filtro local de relevância")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Fração reservada para avaliação")
+    parser.add_argument("--seed", type=int, default=42, help="Semente da divisão treino/holdout")
+    parser.add_argument("--limit", type=int, default=20000, help="Máximo de emails carregados")
+    parser.add_argument("--output", default=None, help="Caminho do modelo (padrão: RELEVANCE_MODEL_PATH)")
+    parser.add_argument("--dry-run", action="store_true", help="Apenas avaliar, sem salvar o modelo")
+
+    args = parser.parse_args()
+
+    train(args.holdout, args.seed, args.limit, args.output, args.dry_run)
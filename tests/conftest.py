@@ -0,0 +1,15 @@
+"""
+Configuração comum dos testes: backend no sys.path e credenciais fictícias
+para config.Settings (os testes não chamam Supabase, Gemini nem Gmail)
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+for name in (
+    "SUPABASE_ANON_KEY", "SUPABASE_SERVICE_KEY", "GOOGLE_AI_API_KEY",
+    "GMAIL_CLIENT_ID", "GMAIL_CLIENT_SECRET", "WORDPRESS_USERNAME", "WORDPRESS_PASSWORD"
+):
+    os.environ.setdefault(name, "test")
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
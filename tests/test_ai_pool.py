@@ -0,0 +1,79 @@
+"""
+Pool assíncrono de IA: concorrência máxima, filas de prioridade e timeout
+"""
+import asyncio
+
+import pytest
+
+from modules.ai_pool import AIPool
+
+
+async def _job(order, name, release):
+    order.append(name)
+    await release.wait()
+    return name
+
+
+def test_concurrency_limit_and_low_priority_lane():
+    async def scenario():
+        pool = AIPool(max_concurrency=1, timeout=5)
+        order = []
+        release = asyncio.Event()
+
+        tasks = [asyncio.create_task(pool.run(_job, order, "n0", release))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(pool.run(_job, order, "low1", release, low_priority=True)))
+        tasks.append(asyncio.create_task(pool.run(_job, order, "n2", release)))
+        tasks.append(asyncio.create_task(pool.run(_job, order, "low3", release, low_priority=True)))
+        tasks.append(asyncio.create_task(pool.run(_job, order, "n4", release)))
+        await asyncio.sleep(0)
+
+        assert pool.active == 1 and pool.queued == 4
+        assert pool.stats()["queued_low_priority"] == 2
+
+        release.set()
+        await asyncio.gather(*tasks)
+        return pool, order
+
+    pool, order = asyncio.run(scenario())
+
+    # Jobs normais passam à frente dos de baixa prioridade, cada fila em FIFO
+    assert order == ["n0", "n2", "n4", "low1", "low3"]
+    assert pool.active == 0 and pool.queued == 0 and pool.completed == 5
+
+
+def test_timeout_frees_the_slot():
+    async def scenario():
+        pool = AIPool(max_concurrency=1, timeout=0.05)
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(asyncio.sleep, 1)
+        assert await pool.run(asyncio.sleep, 0, result="ok") == "ok"
+        return pool
+
+    pool = asyncio.run(scenario())
+    assert pool.timeouts == 1 and pool.completed == 1 and pool.active == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        pool = AIPool(max_concurrency=1, timeout=5)
+        order = []
+        release = asyncio.Event()
+
+        first = asyncio.create_task(pool.run(_job, order, "n0", release))
+        await asyncio.sleep(0)
+        cancelled = asyncio.create_task(pool.run(_job, order, "n1", release))
+        waiting = asyncio.create_task(pool.run(_job, order, "n2", release))
+        await asyncio.sleep(0)
+
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        assert pool.queued == 1
+
+        release.set()
+        await asyncio.gather(first, waiting)
+        return pool, order
+
+    pool, order = asyncio.run(scenario())
+    assert order == ["n0", "n2"]
+    assert pool.active == 0 and pool.queued == 0
@@ -0,0 +1,79 @@
+"""
+Schemas da saída estruturada: validação por campo e streaming do conteúdo
+"""
+import json
+import random
+
+import pytest
+
+pytest.importorskip("pydantic")
+
+from modules.ai_schemas import EditorialDraft, PartialStringField, validate_fields  # noqa: E402
+
+CONTEUDO = 'Frevo no "Paço"\n\tProgramação: 10h–18h\\sábado 🎉 café ☕ e ação ✔'
+
+RESPONSE = json.dumps({
+    "observacoes": 'falso "conteudo": "não é este"',
+    "categoria": "cultura",
+    "titulo": "Paço do Frevo celebra 117 anos",
+    "conteudo": CONTEUDO,
+    "tags": ["frevo", "carnaval"]
+})
+
+
+def _stream(text, field, sizes):
+    parser = PartialStringField(field)
+    out, start = [], 0
+    for size in sizes:
+        out.append(parser.feed(text[start:start + size]))
+        start += size
+    out.append(parser.feed(text[start:]))
+    return "".join(out), parser
+
+
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_partial_field_decodes_any_chunking(ensure_ascii):
+    text = json.dumps(json.loads(RESPONSE), ensure_ascii=ensure_ascii)
+    rng = random.Random(42)
+
+    for _ in range(200):
+        sizes = [rng.randint(1, 7) for _ in range(len(text))]
+        decoded, parser = _stream(text, "conteudo", sizes)
+        assert decoded == CONTEUDO
+        assert parser.done
+
+
+def test_partial_field_char_by_char_with_surrogate_pairs():
+    text = json.dumps({"conteudo": "a😀b"}, ensure_ascii=True)
+    assert "\\ud83d\\ude00" in text
+
+    decoded, parser = _stream(text, "conteudo", [1] * len(text))
+    assert decoded == "a😀b" and parser.done
+
+
+def test_partial_field_waits_for_key_and_stops_at_closing_quote():
+    parser = PartialStringField("conteudo")
+
+    assert parser.feed('{"titulo": "X", "conte') == ""
+    assert parser.feed('udo": "ol') == "ol"
+    assert parser.feed('á", "tags": ["a"') == "á"
+    assert parser.feed(', "conteudo": "de novo"}') == ""
+    assert parser.done
+
+
+def test_validate_fields_keeps_valid_fields():
+    data = json.loads(RESPONSE)
+    data["relevancia_score"] = 42
+
+    valid, failed = validate_fields(EditorialDraft, json.dumps(data))
+
+    assert failed == ["meta_descricao", "relevancia_score"]
+    assert valid["titulo"] == "Paço do Frevo celebra 117 anos"
+    assert valid["conteudo"] == CONTEUDO
+
+
+def test_validate_fields_unreadable_json_fails_every_field():
+    valid, failed = validate_fields(EditorialDraft, '{"titulo": "cortado')
+
+    assert valid == {}
+    assert failed == list(EditorialDraft.model_fields)
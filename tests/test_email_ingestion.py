@@ -0,0 +1,126 @@
+"""
+Ingestão do Gmail: resultado da gravação e avanço do historyId
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("supabase")
+pytest.importorskip("googleapiclient")
+
+from modules import email_ingestion as ingestion_module  # noqa: E402
+from modules.email_ingestion import (  # noqa: E402
+    STORE_EXISTS, STORE_FAILED, STORE_INSERTED, EmailIngestionWorker, store_gmail_email
+)
+from modules.gmail_client import GmailClient  # noqa: E402
+
+
+def _email(message_id):
+    return {
+        "id": message_id,
+        "sender": "imprensa@agencia.com.br",
+        "subject": f"Release {message_id}",
+        "body": f"Corpo do release {message_id}"
+    }
+
+
+class _FakeDB:
+    """email_cache em memória; insert falha para os IDs em failing"""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.by_hash = {}
+
+    def get_email_by_hash(self, email_hash):
+        return self.by_hash.get(email_hash)
+
+    def insert_email_cache(self, data):
+        if data["gmail_message_id"] in self.failing:
+            return None
+        record = {"id": f"cache-{data['gmail_message_id']}", **data}
+        self.by_hash[data["email_hash"]] = record
+        return record
+
+
+class _FakeGmail:
+    """Uma página com message_ids; a mensagem "deleted" devolve 404 (consumida)"""
+
+    def __init__(self, message_ids):
+        self.message_ids = message_ids
+        self.saved_history_ids = []
+        self.marked = []
+
+    def iter_new_message_ids(self, days_back=7, incremental=True, sync_state=None):
+        sync_state["history_id"] = "300"
+        yield self.message_ids
+
+    def new_service(self):
+        return object()
+
+    def _get_emails_details_batch(self, ids, service=None, failed=None):
+        return [_email(message_id) for message_id in ids if message_id != "deleted"]
+
+    def _matches_assessoria_terms(self, email):
+        return True
+
+    def mark_many_as_processed(self, message_ids):
+        self.marked.extend(message_ids)
+
+    def commit_history_id(self, sync_state):
+        return GmailClient.commit_history_id(self, sync_state)
+
+    def _save_history_id(self, history_id):
+        self.saved_history_ids.append(history_id)
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    monkeypatch.setattr(ingestion_module.settings, "NEAR_DUPLICATE_DETECTION", False)
+
+    def install(failing=()):
+        db = _FakeDB(failing)
+        monkeypatch.setattr(ingestion_module, "db", db)
+        return db
+
+    return install
+
+
+def _run_job(monkeypatch, gmail):
+    monkeypatch.setattr(ingestion_module, "gmail_client", gmail)
+    worker = EmailIngestionWorker(max_concurrency=2)
+    job = {
+        "id": "job", "days_back": 7, "incremental": True, "pages_listed": 0, "messages_fetched": 0,
+        "new_inserted": 0, "duplicates_skipped": 0, "errors": 0, "in_flight": 0
+    }
+    asyncio.run(worker._run_job(job))
+    return job
+
+
+def test_store_distinguishes_existing_from_failed(fake_db):
+    fake_db(failing={"broken"})
+
+    status, record = store_gmail_email(_email("m1"))
+    assert status == STORE_INSERTED and record["gmail_message_id"] == "m1"
+    assert store_gmail_email(_email("m1")) == (STORE_EXISTS, None)
+    assert store_gmail_email(_email("broken")) == (STORE_FAILED, None)
+
+
+def test_history_id_advances_when_every_email_is_stored(monkeypatch, fake_db):
+    fake_db()
+    gmail = _FakeGmail(["m1", "m2", "deleted"])
+
+    job = _run_job(monkeypatch, gmail)
+
+    assert job["status"] == "completed" and job["errors"] == 0
+    assert gmail.marked == ["m1", "m2"]
+    assert gmail.saved_history_ids == ["300"]
+
+
+def test_failed_insert_keeps_history_id(monkeypatch, fake_db):
+    fake_db(failing={"m2"})
+    gmail = _FakeGmail(["m1", "m2"])
+
+    job = _run_job(monkeypatch, gmail)
+
+    assert job["new_inserted"] == 1 and job["duplicates_skipped"] == 0 and job["errors"] == 1
+    assert gmail.saved_history_ids == []
@@ -0,0 +1,116 @@
+"""
+Sincronização do Gmail: quais falhas de download seguram o historyId
+"""
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+from modules import gmail_client as gmail_module  # noqa: E402
+from modules.gmail_client import GmailClient  # noqa: E402
+
+
+class _HttpError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.resp = type("Resp", (), {"status": status})()
+
+
+class _FakeBatch:
+    def __init__(self, callback, responses):
+        self.callback = callback
+        self.responses = responses
+        self.ids = []
+
+    def add(self, request, request_id):
+        self.ids.append(request_id)
+
+    def execute(self):
+        for message_id in self.ids:
+            outcome = self.responses[message_id]
+            if isinstance(outcome, Exception):
+                self.callback(message_id, None, outcome)
+            else:
+                self.callback(message_id, outcome, None)
+
+
+class _FakeService:
+    """messages().get() em lote com a resposta configurada por ID"""
+
+    def __init__(self, responses):
+        self.responses = responses
+
+    def new_batch_http_request(self, callback):
+        return _FakeBatch(callback, self.responses)
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def get(self, **kwargs):
+        return None
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(gmail_module.rate_limiter, "call", lambda api, fn, *args, **kwargs: fn(*args))
+    monkeypatch.setattr(gmail_module, "backoff_delay", lambda attempt: 0)
+    monkeypatch.setattr(gmail_module.settings, "RATE_LIMIT_MAX_RETRIES", 1)
+
+    client = GmailClient()
+    client.service = _FakeService({
+        "ok": {"id": "ok"},
+        "deleted": _HttpError(404),
+        "unreadable": {"id": "unreadable"},
+        "busy": _HttpError(503)
+    })
+    client._parse_message = lambda message: None if message["id"] == "unreadable" else {
+        "id": message["id"], "sender": "imprensa@agencia.com.br", "subject": "Release", "body": "assessoria de imprensa"
+    }
+    client.saved_history_ids = []
+    client._save_history_id = client.saved_history_ids.append
+    return client
+
+
+def _sync(client, message_ids):
+    def iter_new_message_ids(days_back=7, incremental=True, sync_state=None):
+        sync_state["history_id"] = "200"
+        yield message_ids
+
+    client.iter_new_message_ids = iter_new_message_ids
+    sync_state = {}
+    emails = list(client.iter_new_emails(sync_state=sync_state))
+    return emails, sync_state
+
+
+def test_deleted_and_unreadable_messages_are_consumed(client):
+    failed = []
+    emails = client._get_emails_details_batch(["ok", "deleted", "unreadable", "busy"], failed=failed)
+
+    assert [email["id"] for email in emails] == ["ok"]
+    assert failed == ["busy"]
+
+
+def test_history_id_advances_past_deleted_messages(client):
+    emails, sync_state = _sync(client, ["ok", "deleted", "unreadable"])
+
+    assert [email["id"] for email in emails] == ["ok"]
+    assert sync_state["errors"] == 0
+    assert client.commit_history_id(sync_state) is True
+    assert client.saved_history_ids == ["200"]
+
+
+def test_history_id_is_kept_after_temporary_failure(client):
+    _, sync_state = _sync(client, ["ok", "busy"])
+
+    assert sync_state["errors"] == 1
+    assert client.commit_history_id(sync_state) is False
+    assert client.saved_history_ids == []
+
+
+def test_history_id_is_kept_when_store_fails(client):
+    _, sync_state = _sync(client, ["ok"])
+    sync_state["errors"] += 1  # gravação no email_cache falhou
+
+    assert client.commit_history_id(sync_state) is False
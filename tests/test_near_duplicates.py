@@ -0,0 +1,89 @@
+"""
+Detecção de releases quase duplicados (MinHash LSH)
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from modules.minhash import lsh_bands, minhash, similarity  # noqa: E402
+
+# Mesmo valor padrão de NEAR_DUPLICATE_MIN_SIMILARITY (config.py)
+MIN_SIMILARITY = 0.6
+
+RELEASE = """
+O Paço do Frevo anuncia a programação especial de janeiro, que celebra os 117 anos do frevo
+com uma série de atividades gratuitas abertas ao público no Bairro do Recife. A partir do dia
+10, o museu recebe a exposição "Passos que Contam Histórias", com fotografias inéditas de
+agremiações tradicionais como o Clube Vassourinhas, o Lenhadores e o Bloco da Saudade,
+registradas ao longo de quatro décadas de carnaval pelo fotógrafo pernambucano Josué Lima.
+
+Além da mostra, o espaço promove oficinas de passo para iniciantes todas as terças e quintas,
+das 15h às 17h, com os mestres do Paço. As inscrições são limitadas a 30 participantes por
+turma e podem ser feitas pelo site oficial do museu ou presencialmente na recepção, mediante
+apresentação de documento com foto. Crianças a partir de oito anos podem participar
+acompanhadas de um responsável.
+
+No dia 18, a orquestra do maestro Spok apresenta o concerto "Frevo de Rua, Frevo de Bloco",
+no pátio externo, às 19h. A apresentação integra o calendário oficial de prévias
+carnavalescas da Prefeitura do Recife e terá tradução em Libras. Segundo a diretora do Paço,
+Ana Beatriz Menezes, a proposta é aproximar o público jovem da história do ritmo. "O frevo é
+patrimônio imaterial da humanidade e precisa ser vivido o ano inteiro, não só no carnaval",
+afirma.
+
+O museu funciona de terça a domingo, das 9h às 17h, na Praça do Arsenal da Marinha. A entrada
+é gratuita às terças-feiras; nos demais dias, o ingresso custa R$ 10, com meia-entrada para
+estudantes, professores e pessoas acima de 60 anos. A programação completa, com horários das
+visitas mediadas e das rodas de conversa com compositores, está disponível nas redes sociais
+do equipamento cultural, que é gerido em parceria com o Instituto de Desenvolvimento e Gestão.
+"""
+
+FOOTER_A = """
+Atendimento à imprensa: Agência Maré Comunicação. Contato com Juliana Rocha pelo telefone
+(81) 99999-0000 ou pelo email imprensa@marecomunicacao.com.br. Siga a agência nas redes
+sociais e receba nossos releases em primeira mão.
+"""
+
+FOOTER_B = """
+Mais informações para jornalistas: Assessoria Frevo Press, com Carlos Albuquerque e equipe,
+de segunda a sexta, em horário comercial. Fotos em alta resolução disponíveis mediante
+solicitação. Esta mensagem foi enviada para a lista de veículos parceiros da assessoria.
+"""
+
+UNRELATED = """
+A Secretaria de Turismo de Pernambuco divulgou o balanço da alta estação: a ocupação média
+da rede hoteleira da Região Metropolitana chegou a 87% em dezembro, o melhor resultado desde
+2019. Porto de Galinhas e o litoral sul concentraram a maior procura, puxada pelos voos
+diretos de Buenos Aires, Lisboa e Santiago inaugurados no segundo semestre.
+
+De acordo com o levantamento, o gasto médio diário do visitante foi de R$ 480, com destaque
+para gastronomia e passeios de catamarã. O secretário Rodrigo Novaes atribui o desempenho à
+ampliação da malha aérea e às campanhas promocionais feitas em parceria com as companhias.
+"Recuperamos o fluxo internacional e agora o desafio é manter o turista por mais dias no
+estado", disse durante a apresentação dos números no Centro de Convenções, em Olinda.
+
+Para o carnaval, a expectativa é de ocupação acima de 95% no Recife e em Olinda. O governo
+prevê reforço no atendimento dos centros de informação turística, novos roteiros pelo
+interior e ações de qualificação para trabalhadores do setor de serviços, com cursos de
+idiomas gratuitos e atendimento ao visitante estrangeiro.
+"""
+
+
+def _is_near_duplicate(a: str, b: str) -> bool:
+    """Mesmo critério de find_near_duplicate: candidato LSH e similaridade mínima"""
+    sig_a, sig_b = minhash(a), minhash(b)
+    is_candidate = bool(set(lsh_bands(sig_a)) & set(lsh_bands(sig_b)))
+    return is_candidate and similarity(sig_a, sig_b) >= MIN_SIMILARITY
+
+
+def test_footer_swap_is_flagged():
+    assert _is_near_duplicate(RELEASE + FOOTER_A, RELEASE + FOOTER_B)
+
+
+def test_unrelated_release_with_same_footer_is_not_flagged():
+    assert not _is_near_duplicate(RELEASE + FOOTER_A, UNRELATED + FOOTER_A)
+
+
+def test_signature_is_stable_and_skips_short_texts():
+    assert minhash(RELEASE) == minhash(RELEASE)
+    assert minhash("Convite para coletiva") is None
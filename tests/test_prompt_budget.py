@@ -0,0 +1,37 @@
+"""
+Divisão do orçamento de tokens do prompt entre seções
+"""
+from modules.prompt_budget import allocate_budget
+
+
+def test_everything_fits():
+    demands = {"email": 300, "exemplos": 200, "contexto": 100}
+    assert allocate_budget(1000, demands) == demands
+
+
+def test_leftover_of_small_sections_goes_to_large_ones():
+    allocation = allocate_budget(1000, {"email": 900, "exemplos": 100, "contexto": 50})
+
+    # exemplos e contexto cabem inteiros; o email fica com todo o resto
+    assert allocation == {"email": 850, "exemplos": 100, "contexto": 50}
+
+
+def test_weights_split_what_nobody_fits_into():
+    allocation = allocate_budget(900, {"email": 5000, "exemplos": 5000}, weights={"email": 2.0})
+
+    assert allocation == {"email": 600, "exemplos": 300}
+    assert sum(allocation.values()) <= 900
+
+
+def test_empty_sections_and_exhausted_budget():
+    assert allocate_budget(500, {"email": 0, "exemplos": 800}) == {"email": 0, "exemplos": 500}
+    assert allocate_budget(0, {"email": 100}) == {"email": 0}
+    assert allocate_budget(-10, {"email": 100}) == {"email": 0}
+
+
+def test_never_exceeds_budget_or_demand():
+    demands = {"a": 7, "b": 130, "c": 55, "d": 1000}
+    for budget in range(0, 1300, 37):
+        allocation = allocate_budget(budget, demands, weights={"d": 0.5, "b": 3.0})
+        assert sum(allocation.values()) <= budget
+        assert all(allocation[name] <= demands[name] for name in demands)
@@ -0,0 +1,104 @@
+"""
+Token bucket e retry com backoff do controle de taxa
+"""
+import asyncio
+
+import pytest
+
+from modules import rate_limiter as rate_limiter_module
+from modules.rate_limiter import RateLimiter, TokenBucket, backoff_delay, error_status
+
+
+class _StatusError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.resp = type("Resp", (), {"status": status})()
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(rate_limiter_module.time, "sleep", sleeps.append)
+    monkeypatch.setattr(rate_limiter_module.settings, "RATE_LIMIT_MAX_RETRIES", 3)
+    return sleeps
+
+
+def test_bucket_allows_burst_then_spaces_requests(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(rate_limiter_module.time, "monotonic", lambda: now[0])
+    bucket = TokenBucket(rate=2, capacity=2)
+
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    # Sem saldo: cada reserva espera 1/rate a mais que a anterior
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+
+    now[0] += 2.0
+    assert bucket.reserve() == 0.0
+
+
+def test_call_retries_retryable_status(no_sleep):
+    limiter = RateLimiter()
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise _StatusError(503)
+        return "ok"
+
+    assert limiter.call("teste", flaky) == "ok"
+    assert len(attempts) == 3
+    stats = limiter.get_stats()["teste"]
+    assert stats["retries"] == 2 and stats["successes"] == 1 and stats["failures"] == 0
+
+
+def test_call_does_not_retry_client_errors(no_sleep):
+    limiter = RateLimiter()
+    attempts = []
+
+    def not_found():
+        attempts.append(1)
+        raise _StatusError(404)
+
+    with pytest.raises(_StatusError):
+        limiter.call("teste", not_found)
+    assert len(attempts) == 1
+    assert limiter.get_stats()["teste"]["failures"] == 1
+
+
+def test_call_gives_up_after_max_retries(no_sleep):
+    limiter = RateLimiter()
+
+    def throttled():
+        raise _StatusError(429)
+
+    with pytest.raises(_StatusError):
+        limiter.call("teste", throttled, max_retries=2)
+    assert limiter.get_stats()["teste"]["retries"] == 2
+
+
+def test_call_async_retries_without_blocking(monkeypatch):
+    monkeypatch.setattr(rate_limiter_module, "backoff_delay", lambda attempt: 0)
+    limiter = RateLimiter()
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise _StatusError(429)
+        return "ok"
+
+    assert asyncio.run(limiter.call_async("teste", flaky)) == "ok"
+    assert len(attempts) == 2
+    assert limiter.get_stats()["teste"]["retries"] == 1
+
+
+def test_backoff_is_capped_and_status_is_extracted(monkeypatch):
+    monkeypatch.setattr(rate_limiter_module.settings, "RATE_LIMIT_BASE_BACKOFF", 1.0)
+    monkeypatch.setattr(rate_limiter_module.settings, "RATE_LIMIT_MAX_BACKOFF", 4.0)
+
+    assert all(0 <= backoff_delay(attempt) <= min(4.0, 2 ** attempt) for attempt in range(8) for _ in range(20))
+    assert error_status(_StatusError(503)) == 503
+    assert error_status(ValueError("sem status")) is None
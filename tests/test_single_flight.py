@@ -0,0 +1,109 @@
+"""
+Coalescência de chamadas concorrentes (single-flight)
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from modules.single_flight import SingleFlight
+
+
+def test_concurrent_threads_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return "resultado"
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do("chave", slow))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    # Libera o líder só depois que os demais estão aguardando
+    while flight.stats()["waiting"] < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert all(result == "resultado" for result, _ in results)
+    assert flight.stats() == {"in_flight": 0, "waiting": 0, "executions": 1, "coalesced": 4}
+
+
+def test_key_is_released_after_each_call():
+    flight = SingleFlight()
+
+    assert flight.do("chave", lambda: 1) == (1, False)
+    assert flight.do("chave", lambda: 2) == (2, False)
+    assert flight.stats()["executions"] == 2
+
+
+def test_leader_exception_reaches_followers():
+    flight = SingleFlight()
+    call, leader = flight.begin("chave")
+    follower, follower_leads = flight.begin("chave")
+    assert leader and not follower_leads and follower is call
+
+    flight.finish("chave", call, error=ValueError("falhou"))
+    with pytest.raises(ValueError):
+        flight.wait(follower)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_begin_shares_keys_with_do():
+    flight = SingleFlight()
+
+    async def scenario():
+        call, leader = flight.begin("stream")
+        assert leader
+        # Um do() concorrente na mesma chave espera o líder do streaming
+        follower = asyncio.ensure_future(asyncio.to_thread(flight.do, "stream", lambda: "não executa"))
+        while flight.stats()["waiting"] < 1:
+            await asyncio.sleep(0)
+        flight.finish("stream", call, "texto completo")
+        return await follower
+
+    assert asyncio.run(scenario()) == ("texto completo", True)
+
+
+def test_do_async_coalesces_coroutines():
+    flight = SingleFlight()
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do_async("chave", generate) for _ in range(3)))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert [shared for _, shared in results] == [False, True, True]
+    assert all(result == "ok" for result, _ in results)
+
+
+def test_do_async_follower_cancel_does_not_cancel_leader():
+    flight = SingleFlight()
+
+    async def generate():
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    async def scenario():
+        leader = asyncio.ensure_future(flight.do_async("chave", generate))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do_async("chave", generate))
+        await asyncio.sleep(0)
+        follower.cancel()
+        return await leader
+
+    assert asyncio.run(scenario()) == ("ok", False)
@@ -0,0 +1,93 @@
+"""
+Saída estruturada: validação campo a campo, novas tentativas e cache de respostas
+"""
+import json
+
+import pytest
+
+pytest.importorskip("google.generativeai")
+pytest.importorskip("supabase")
+
+from modules import ai_processor as ai_module  # noqa: E402
+from modules.ai_processor import AIProcessor  # noqa: E402
+from modules.ai_schemas import EditorialDraft  # noqa: E402
+from modules.generation_cache import GenerationCache  # noqa: E402
+
+VALID_DRAFT = {
+    "categoria": "cultura",
+    "titulo": "Paço do Frevo celebra 117 anos do ritmo",
+    "meta_descricao": "Programação gratuita com exposição, oficinas e concerto no Bairro do Recife.",
+    "conteudo": "O Paço do Frevo anuncia a programação especial de janeiro.",
+    "tags": ["frevo", "recife", "cultura"],
+    "relevancia_score": 8.5,
+    "observacoes": ""
+}
+
+
+class _Usage:
+    prompt_token_count = 100
+    candidates_token_count = 20
+
+
+class _Response:
+    usage_metadata = _Usage()
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _FakeModel:
+    """Modelo que responde sempre o mesmo texto e conta as chamadas"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.calls = 0
+
+    def generate_content(self, prompt, generation_config=None):
+        self.calls += 1
+        return _Response(self.text)
+
+
+class _FakeEstimator:
+    def local_count(self, text: str) -> int:
+        return len(text.split())
+
+    def count(self, text: str) -> int:
+        return self.local_count(text)
+
+    def calibrate(self, local_tokens: int, model_tokens: int):
+        pass
+
+
+def _processor(monkeypatch, text: str) -> AIProcessor:
+    monkeypatch.setattr(ai_module.rate_limiter, "call", lambda api, fn, *args, **kwargs: fn(*args, **kwargs))
+    monkeypatch.setattr(ai_module.settings, "STRUCTURED_OUTPUT_MAX_RETRIES", 2)
+    processor = AIProcessor.__new__(AIProcessor)
+    processor.model = _FakeModel(text)
+    processor.token_estimator = _FakeEstimator()
+    processor._generation_cache = GenerationCache(max_entries=100, ttl=3600)
+    return processor
+
+
+def test_invalid_responses_are_retried_and_never_cached(monkeypatch):
+    processor = _processor(monkeypatch, "not json")
+
+    result = processor.generate_structured("email de teste", EditorialDraft)
+    assert processor.model.calls == 3
+    assert set(result["failed_fields"]) == set(EditorialDraft.model_fields)
+
+    # O mesmo email de novo chama o Gemini de novo, sem servir a resposta inválida do cache
+    processor.generate_structured("email de teste", EditorialDraft)
+    assert processor.model.calls == 6
+    assert processor._generation_cache.stats()["tokens_saved"] == 0
+
+
+def test_valid_response_is_cached(monkeypatch):
+    processor = _processor(monkeypatch, json.dumps(VALID_DRAFT))
+
+    first = processor.generate_structured("email de teste", EditorialDraft)
+    second = processor.generate_structured("email de teste", EditorialDraft)
+
+    assert processor.model.calls == 1
+    assert first["failed_fields"] == [] and second["parsed"] == first["parsed"]
+    assert second["cached"] is True
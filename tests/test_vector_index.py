@@ -0,0 +1,80 @@
+"""
+Índice vetorial local: paginação por (embedding_updated_at, id) e mudanças de embedding
+"""
+import pytest
+
+pytest.importorskip("supabase")
+
+from modules import vector_index as vector_index_module  # noqa: E402
+from modules.vector_index import LocalVectorIndex  # noqa: E402
+
+DIMENSIONS = 4
+BULK_TIMESTAMP = "2024-05-01T12:00:00+00:00"
+
+
+class _FakeKnowledgeBase:
+    """knowledge_base em memória com a mesma paginação de get_knowledge_base_changes"""
+
+    def __init__(self):
+        self.rows = {}
+        self.calls = 0
+
+    def upsert(self, row_id, embedding, updated_at=BULK_TIMESTAMP):
+        self.rows[row_id] = {
+            "id": row_id,
+            "content_text": f"texto {row_id}",
+            "topic": row_id,
+            "embedding": embedding,
+            "embedding_updated_at": updated_at
+        }
+
+    def get_knowledge_base_changes(self, after=None, limit=500):
+        self.calls += 1
+        assert self.calls < 100, "paginação não avança"
+        ordered = sorted(self.rows.values(), key=lambda row: (row["embedding_updated_at"], row["id"]))
+        if after:
+            ordered = [row for row in ordered if (row["embedding_updated_at"], row["id"]) > tuple(after)]
+        return ordered[:limit]
+
+
+@pytest.fixture
+def knowledge_base(monkeypatch):
+    fake = _FakeKnowledgeBase()
+    monkeypatch.setattr(vector_index_module, "db", fake)
+    monkeypatch.setattr(vector_index_module.settings, "EMBEDDING_DIMENSIONS", DIMENSIONS)
+    return fake
+
+
+def _vector(position):
+    vector = [0.0] * DIMENSIONS
+    vector[position] = 1.0
+    return vector
+
+
+def test_bulk_insert_with_same_timestamp_loads_every_row_once(knowledge_base):
+    for i in range(1200):
+        knowledge_base.upsert(f"doc-{i:04d}", _vector(i % DIMENSIONS))
+
+    index = LocalVectorIndex(refresh_interval=3600)
+    assert index.refresh(page_size=500) == 1200
+    assert index.size == 1200
+    assert knowledge_base.calls == 3
+
+    # Nada mudou: a próxima atualização não relê linhas
+    assert index.refresh(page_size=500) == 0
+
+
+def test_reembedded_and_cleared_rows_are_updated(knowledge_base):
+    knowledge_base.upsert("a", _vector(0))
+    knowledge_base.upsert("b", _vector(1))
+    index = LocalVectorIndex(refresh_interval=3600)
+    index.refresh()
+
+    knowledge_base.upsert("a", _vector(2), updated_at="2024-05-02T00:00:00+00:00")
+    knowledge_base.upsert("b", None, updated_at="2024-05-02T00:00:00+00:00")
+    assert index.refresh() == 2
+
+    assert index.size == 1
+    results = index.search(_vector(2), limit=5)
+    assert [row["id"] for row in results] == ["a"]
+    assert index.search(_vector(1), limit=5) == []